@@ -0,0 +1,128 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module adapts the size of the batches indexed into Workplace Search to the health of Enterprise Search.
+
+    The batches of an object type start at the largest size accepted by Workplace Search. A request failing with
+    a server error or timing out halves the next batches, and a 95th percentile of the latencies above the
+    target shrinks them by a quarter. Once enough requests are indexed within the target latency and with few
+    errors, the batches grow back by a quarter, up to the largest size.
+"""
+import collections
+import math
+import threading
+
+# Number of the last requests on which the latency and the error rate are measured
+WINDOW_SIZE = 20
+# Number of successful requests since the last resize from which the batches are resized again
+MIN_SAMPLES = 10
+# Rate of failed requests in the window up to which the batches may grow
+MAX_ERROR_RATE = 0.05
+ERROR_SHRINK_FACTOR = 0.5
+LATENCY_SHRINK_FACTOR = 0.75
+GROWTH_FACTOR = 1.25
+MIN_DOCUMENTS = 1
+MIN_BYTES = 256 * 1024
+
+
+class AdaptiveBatchSize:
+    """This class is the number of documents and of bytes of the batches of an object type, adapted to the
+    latency and the errors of the indexing requests"""
+
+    def __init__(self, max_documents, max_bytes, target_latency):
+        """
+        :param max_documents: Largest number of documents of a batch, which is the initial one
+        :param max_bytes: Largest size in bytes of a batch, which is the initial one
+        :param target_latency: Latency in seconds of the 95th percentile of the requests above which the batches
+            shrink
+        """
+        self.ceiling_documents = max_documents
+        self.ceiling_bytes = max_bytes
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.target_latency = target_latency
+        self.shrinks = 0
+        self.grows = 0
+        self.__latencies = collections.deque(maxlen=WINDOW_SIZE)
+        # Whether each of the last requests failed
+        self.__failures = collections.deque(maxlen=WINDOW_SIZE)
+        self.__lock = threading.Lock()
+
+    def __get_p95_latency(self):
+        """Returns the 95th percentile of the latencies since the last resize, called with the lock held"""
+        if not self.__latencies:
+            return None
+        latencies = sorted(self.__latencies)
+        return latencies[math.ceil(0.95 * len(latencies)) - 1]
+
+    def __get_error_rate(self):
+        """Returns the rate of failed requests in the window, called with the lock held"""
+        return sum(self.__failures) / len(self.__failures) if self.__failures else 0
+
+    def __resize(self, factor):
+        """Multiplies the sizes of the batches by a factor within their bounds, called with the lock held
+        :param factor: Factor of the sizes, below 1 to shrink the batches
+        Returns:
+            resized: Whether the sizes changed
+        """
+        max_documents = int(self.max_documents * factor)
+        max_bytes = int(self.max_bytes * factor)
+        if factor > 1:
+            # Logic to grow the smallest batches, whose sizes would be rounded down to the same values
+            max_documents = max(max_documents, self.max_documents + 1)
+        max_documents = min(max(max_documents, MIN_DOCUMENTS), self.ceiling_documents)
+        max_bytes = min(max(max_bytes, min(MIN_BYTES, self.ceiling_bytes)), self.ceiling_bytes)
+        if (max_documents, max_bytes) == (self.max_documents, self.max_bytes):
+            return False
+        if factor > 1:
+            self.grows += 1
+        else:
+            self.shrinks += 1
+        self.max_documents, self.max_bytes = max_documents, max_bytes
+        # The latencies measured with the previous sizes do not tell about the new ones
+        self.__latencies.clear()
+        return True
+
+    def record_success(self, latency):
+        """Records an indexed batch, and resizes the batches once enough requests are measured
+        :param latency: Duration in seconds of the indexing request
+        Returns:
+            resized: Whether the sizes of the batches changed
+        """
+        with self.__lock:
+            self.__latencies.append(latency)
+            self.__failures.append(False)
+            if len(self.__latencies) < MIN_SAMPLES:
+                return False
+            if self.__get_p95_latency() > self.target_latency:
+                return self.__resize(LATENCY_SHRINK_FACTOR)
+            if self.__get_error_rate() <= MAX_ERROR_RATE:
+                return self.__resize(GROWTH_FACTOR)
+            return False
+
+    def record_failure(self, overloaded):
+        """Records a failed batch, which halves the batches if Enterprise Search is overloaded
+        :param overloaded: Whether the request failed with a server error or timed out
+        Returns:
+            resized: Whether the sizes of the batches changed
+        """
+        with self.__lock:
+            self.__failures.append(True)
+            return self.__resize(ERROR_SHRINK_FACTOR) if overloaded else False
+
+    def get_metrics(self):
+        """Returns the current sizes of the batches along with the measures they are adapted to
+        Returns:
+            metrics: Dictionary of the metrics
+        """
+        with self.__lock:
+            return {
+                "max_documents": self.max_documents,
+                "max_bytes": self.max_bytes,
+                "p95_latency": self.__get_p95_latency(),
+                "error_rate": self.__get_error_rate(),
+                "shrinks": self.shrinks,
+                "grows": self.grows,
+            }
@@ -18,16 +18,29 @@ except ImportError:
 
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import requests
+
 from . import constant
 from .configuration import Configuration
+from .deduplication import DocumentDeduplicator
 from .enterprise_search_wrapper import EnterpriseSearchWrapper
+from .extraction import ExtractionStage
+from .extraction_cache import AttachmentIndex, ExtractionCache
+from .extraction_policy import ExtractionPolicy
 from .local_storage import LocalStorage
+from .mailbox_health import MailboxHealth
 from .microsoft_outlook_calendar import MicrosoftOutlookCalendar
 from .microsoft_outlook_contacts import MicrosoftOutlookContacts
-from .microsoft_outlook_mails import MicrosoftOutlookMails
+from .microsoft_outlook_mails import MAIL_TYPES, MicrosoftOutlookMails
 from .microsoft_outlook_tasks import MicrosoftOutlookTasks
+from .retry_queue import (DelayedRetryQueue, MailboxLimiter, RetryStore,
+                          WorkUnit)
+from .tika_pool import TikaPool
 from .utils import split_date_range_into_chunks
 
+# Seconds after which a work unit of a busy mailbox is taken again from the queue
+MAILBOX_BUSY_DELAY = 0.1
+
 
 class BaseCommand:
     """Base interface for all module commands.
@@ -83,15 +96,107 @@ class BaseCommand:
         """Get the object for local storage to fetch and update ids stored locally"""
         return LocalStorage(self.logger)
 
+    @cached_property
+    def retry_store(self):
+        """Get the object for storing the work units which failed after all the retries"""
+        return RetryStore(self.logger, constant.RETRY_STORE_PATH)
+
+    @cached_property
+    def mailbox_health(self):
+        """Get the object for skipping the mailboxes which failed the health probe in the previous runs"""
+        return MailboxHealth(self.logger, constant.MAILBOX_HEALTH_PATH)
+
+    @cached_property
+    def extraction_stage(self):
+        """Get the object for extracting the attachments on a dedicated pool of threads"""
+        objects = self.config.get_value("objects") or {}
+        extraction_cache = None
+        if self.config.get_value("enable_extraction_cache"):
+            extraction_cache = ExtractionCache(
+                self.logger,
+                self.config.get_value("extraction_cache.path") or constant.EXTRACTION_CACHE_PATH,
+                self.config.get_value("extraction_cache.max_size") * 1024 * 1024,
+            )
+        tika_pool = None
+        if self.config.get_value("tika.endpoints") or self.config.get_value("tika.server_count"):
+            tika_pool = TikaPool(
+                self.logger,
+                self.config.get_value("tika.endpoints"),
+                self.config.get_value("tika.server_count"),
+                self.config.get_value("tika.start_port"),
+                self.config.get_value("extraction_thread_count"),
+            )
+        return ExtractionStage(
+            self.logger,
+            self.config.get_value("extraction_thread_count"),
+            self.config.get_value("extraction_timeout"),
+            extraction_cache,
+            AttachmentIndex(self.logger, constant.ATTACHMENT_INDEX_PATH),
+            self.config.get_value("enable_native_extraction"),
+            {
+                object_type: ExtractionPolicy(
+                    self.logger,
+                    (objects.get(object_type) or {}).get("extraction_policy"),
+                    self.config.get_value("extraction_timeout"),
+                    self.config.get_value("extraction_spool_threshold") * 1024 * 1024,
+                )
+                for object_type in (constant.MAILS_OBJECT.lower(), constant.CALENDARS_OBJECT.lower(), constant.TASKS_OBJECT.lower())
+            },
+            tika_pool,
+        )
+
+    @cached_property
+    def message_deduplicator(self):
+        """Get the object for indexing once the mails present in several mailboxes, if the dedup mode is enabled"""
+        if not self.config.get_value("enable_message_dedup"):
+            return None
+        return DocumentDeduplicator(
+            self.logger,
+            constant.MESSAGE_MEMBERSHIP_PATH,
+            self.config.get_value("enable_document_permission"),
+            constant.MESSAGE_DEDUP_SPILL_PATH,
+        )
+
+    @cached_property
+    def attachment_deduplicator(self):
+        """Get the object for indexing once the attachments held by several mails, if the dedup mode is enabled"""
+        if not self.config.get_value("enable_attachment_dedup"):
+            return None
+        return DocumentDeduplicator(
+            self.logger,
+            constant.ATTACHMENT_MEMBERSHIP_PATH,
+            self.config.get_value("enable_document_permission"),
+            constant.ATTACHMENT_DEDUP_SPILL_PATH,
+        )
+
     @cached_property
     def microsoft_outlook_mail_object(self):
         """Get the object for fetching the mails related data"""
-        return MicrosoftOutlookMails(self.logger, self.config)
+        return MicrosoftOutlookMails(
+            self.logger,
+            self.config,
+            self.extraction_stage,
+            self.message_deduplicator,
+            self.attachment_deduplicator,
+        )
+
+    @cached_property
+    def meeting_deduplicator(self):
+        """Get the object for indexing once the meetings present in the calendars of several attendees, if the
+        dedup mode is enabled"""
+        if not self.config.get_value("enable_meeting_dedup"):
+            return None
+        return DocumentDeduplicator(
+            self.logger,
+            constant.MEETING_MEMBERSHIP_PATH,
+            self.config.get_value("enable_document_permission"),
+            constant.MEETING_DEDUP_SPILL_PATH,
+        )
 
     @cached_property
     def microsoft_outlook_calendar_object(self):
         """Get the object for fetching the calendars related data"""
-        return MicrosoftOutlookCalendar(self.logger, self.config)
+        return MicrosoftOutlookCalendar(self.logger, self.config, self.extraction_stage, self.meeting_deduplicator)
 
     @cached_property
     def microsoft_outlook_contact_object(self):
@@ -101,7 +206,7 @@ class BaseCommand:
     @cached_property
     def microsoft_outlook_task_object(self):
         """Get the object for fetching the tasks related data"""
-        return MicrosoftOutlookTasks(self.logger, self.config)
+        return MicrosoftOutlookTasks(self.logger, self.config, self.extraction_stage)
 
     def create_jobs(self, thread_count, func, args, iterable_list):
         """Creates a thread pool of given number of thread count
@@ -133,6 +238,181 @@ class BaseCommand:
                 for _ in range(thread_count):
                     executor.submit(func)
 
+    def get_work_unit_folders(self, object_type, thread_count, users_accounts):
+        """Returns the folders of each account which are fetched by separate work units, so that the
+        folders of a mailbox are fetched in parallel
+        :param object_type: Object type like mails, calendar, contacts or tasks
+        :param thread_count: Thread count to discover the folders
+        :param users_accounts: List of users account
+        Returns:
+            folders: Dictionary of the email address of an account and the dictionary of the key of a folder and
+                the folder argument of the work unit, or None if the object type is fetched by account
+        """
+        if object_type == constant.MAILS_OBJECT.lower():
+            mail_types = {mail_type["folder"]: mail_type for mail_type in MAIL_TYPES}
+            return {account.primary_smtp_address: mail_types for account in users_accounts}
+        if object_type == constant.CALENDARS_OBJECT.lower():
+            return dict(
+                self.create_jobs(
+                    thread_count,
+                    lambda account: [
+                        (
+                            account.primary_smtp_address,
+                            self.microsoft_outlook_calendar_object.get_calendar_folders(account),
+                        )
+                    ],
+                    (),
+                    [(account,) for account in users_accounts],
+                )
+            )
+        return None
+
+    def get_work_unit_keys(self, object_type, users_accounts, time_range_list, folders=None):
+        """Returns the keys of the work units for fetching an object type. A unit covers a time range of an
+        account, and of a single folder in case the folders of the account are fetched separately. The
+        mailboxes skipped by the mailbox health get a unit of all their folders over the whole time range
+        :param object_type: Object type like mails, calendar, contacts or tasks
+        :param users_accounts: List of users account
+        :param time_range_list: List of time range for fetching the data
+        :param folders: Folders of each account returned by get_work_unit_folders
+        """
+        keys = []
+        if time_range_list:
+            keys.extend(
+                {
+                    "object_type": object_type,
+                    "account": email,
+                    "start_time": time_range_list[0][0],
+                    "end_time": time_range_list[-1][1],
+                }
+                for email in sorted(self.mailbox_health.get_skipped_mailboxes())
+            )
+        for start_time, end_time in time_range_list:
+            for account in users_accounts:
+                key = {
+                    "object_type": object_type,
+                    "account": account.primary_smtp_address,
+                    "start_time": start_time,
+                    "end_time": end_time,
+                }
+                if folders is None:
+                    keys.append(key)
+                else:
+                    keys.extend(
+                        {**key, "folder": folder}
+                        for folder in folders.get(account.primary_smtp_address, {})
+                    )
+        return keys
+
+    def create_work_units(self, keys, func, args, users_accounts, folders=None):
+        """Creates the work units of the given keys. The keys of the mailboxes skipped by the mailbox health
+        are merged into one key of each mailbox, recorded in the retry store instead
+        :param keys: Keys of the work units
+        :param func: The target function called with the arguments, the account, the folder argument
+            in case the folders are fetched separately, and the time range of the unit
+        :param args: Arguments for the targeted function
+        :param users_accounts: List of users account
+        :param folders: Folders of each account returned by get_work_unit_folders
+        """
+        accounts = {account.primary_smtp_address: account for account in users_accounts}
+        skipped_mailboxes = self.mailbox_health.get_skipped_mailboxes()
+        skipped_keys = {}
+        units = []
+        for key in keys:
+            if key["account"] in skipped_mailboxes:
+                # Logic to keep the time range of a skipped mailbox for the run in which it passes the probe again
+                skipped_key = skipped_keys.setdefault(
+                    (key["object_type"], key["account"]),
+                    {name: key[name] for name in ("object_type", "account", "start_time", "end_time")},
+                )
+                skipped_key["start_time"] = min(skipped_key["start_time"], key["start_time"])
+                skipped_key["end_time"] = max(skipped_key["end_time"], key["end_time"])
+                continue
+            folder_keys = [key]
+            if folders is not None and "folder" not in key:
+                # Logic to split the unit of a mailbox skipped in a previous run into the units of its folders
+                folder_keys = [{**key, "folder": folder} for folder in folders.get(key["account"], {})]
+            for folder_key in folder_keys:
+                account = accounts.get(folder_key["account"])
+                folder = (folders or {}).get(folder_key["account"], {}).get(folder_key.get("folder"))
+                if not account or ("folder" in folder_key and folder is None):
+                    self.logger.info(
+                        f"Skipping the work unit {folder_key} as the account or the folder is not available anymore"
+                    )
+                    continue
+                unit_args = [*args, account]
+                if "folder" in folder_key:
+                    unit_args.append(folder)
+                unit_args.extend((folder_key["start_time"], folder_key["end_time"]))
+                units.append(WorkUnit(folder_key, func, unit_args))
+        for skipped_key in skipped_keys.values():
+            self.retry_store.record_failure("fetch", skipped_key["object_type"], skipped_key)
+        return units
+
+    def create_retryable_jobs(self, thread_count, units, retry_store=None):
+        """Processes the work units on a thread pool of given number of thread count. A unit failing with
+        a transient error is put back in a delay queue instead of sleeping, so the threads keep processing
+        the other units until the retry is due
+        :param thread_count: Total number of threads to be spawned
+        :param units: Work units to be processed
+        :param retry_store: Object of RetryStore to record the units failed after all the retries
+        Returns:
+            documents: Documents returned by the work units
+        """
+        documents = []
+
+        def record_failure(unit):
+            if retry_store:
+                retry_store.record_failure("fetch", unit.key["object_type"], unit.key)
+
+        retry_queue = DelayedRetryQueue(
+            self.logger,
+            self.config.get_value("retry_count"),
+            (requests.exceptions.RequestException,),
+            record_failure,
+        )
+        mailbox_limiter = MailboxLimiter(self.config.get_value("per_mailbox_concurrency"))
+        for unit in units:
+            retry_queue.put(unit)
+
+        def process_units():
+            unit = retry_queue.get()
+            while unit:
+                mailbox = unit.key["account"]
+                if mailbox_limiter.acquire(mailbox):
+                    try:
+                        result = retry_queue.process(unit)
+                    finally:
+                        mailbox_limiter.release(mailbox)
+                    if result:
+                        documents.extend(result)
+                else:
+                    # The mailbox is busy with other units, the unit is postponed without counting an attempt
+                    retry_queue.retry(unit, MAILBOX_BUSY_DELAY)
+                unit = retry_queue.get()
+
+        self.create_jobs(thread_count, process_units, (), [])
+        if retry_queue.retried_units or retry_queue.failed_units:
+            self.logger.info(
+                f"Processed {len(units)} work units with {retry_queue.retried_units} retries, "
+                f"{retry_queue.failed_units} work units failed after all the retries"
+            )
+        return documents
+
+    def append_updated_documents(self, queue, object_type, deduplicator, indexing_type, holders=None):
+        """Appends to the queue the documents of the deduplicated items whose mailboxes changed since their first
+        copy was indexed, and saves the mailboxes of the items
+        :param queue: Shared queue for storing the data
+        :param object_type: Type of documents
+        :param deduplicator: Object of DocumentDeduplicator
+        :param indexing_type: The type of the indexing i.e. Full or Incremental
+        :param holders: Object of DocumentDeduplicator of the items holding the items, already flushed
+        """
+        # The documents update the ones appended in this run, so they bypass the filter of the fetched documents
+        for documents in deduplicator.flush(replace_membership=indexing_type == "full", holders=holders):
+            queue.append_to_queue(object_type, documents)
+        deduplicator.save()
+
     def create_jobs_for_mails(
         self,
         indexing_type,
@@ -163,16 +443,46 @@ class BaseCommand:
             self.local_storage, constant.MAIL_DELETION_PATH
         )
         ids_list = storage_with_collection.get("global_keys")
-        self.create_jobs(
+        folders = self.get_work_unit_folders(
+            constant.MAILS_OBJECT.lower(), thread_count, users_accounts
+        )
+        keys = self.get_work_unit_keys(
+            constant.MAILS_OBJECT.lower(), users_accounts, time_range_list, folders
+        )
+        # Logic to fetch again the work units which failed in the previous run
+        keys.extend(self.retry_store.pop_failures("fetch", constant.MAILS_OBJECT.lower()))
+        self.create_retryable_jobs(
             thread_count,
-            sync_microsoft_outlook.fetch_mails,
-            (ids_list, users_accounts, self.microsoft_outlook_mail_object),
-            time_range_list,
+            self.create_work_units(
+                keys,
+                sync_microsoft_outlook.fetch_mails,
+                (ids_list, self.microsoft_outlook_mail_object),
+                users_accounts,
+                folders,
+            ),
+            self.retry_store,
         )
+        self.retry_store.save()
         storage_with_collection["global_keys"] = list(ids_list)
         self.local_storage.update_storage(
             storage_with_collection, constant.MAIL_DELETION_PATH
         )
+        # Logic to append the documents waiting for their attachments before the checkpoint
+        self.extraction_stage.wait()
+        # Logic to index again the mails and the attachments found in other mailboxes after their first copy. The
+        # mails are flushed first, as the mailboxes of the deduplicated mails also hold their attachments
+        if self.message_deduplicator:
+            self.append_updated_documents(
+                queue, constant.MAILS_OBJECT.lower(), self.message_deduplicator, indexing_type
+            )
+        if self.attachment_deduplicator:
+            self.append_updated_documents(
+                queue,
+                constant.MAILS_OBJECT.lower(),
+                self.attachment_deduplicator,
+                indexing_type,
+                self.message_deduplicator,
+            )
         queue.put_checkpoint(constant.MAILS_OBJECT.lower(), end_time, indexing_type)
 
     def create_jobs_for_calendar(
@@ -205,16 +515,37 @@ class BaseCommand:
             self.local_storage, constant.CALENDAR_DELETION_PATH
         )
         ids_list = storage_with_collection.get("global_keys")
-        self.create_jobs(
+        folders = self.get_work_unit_folders(
+            constant.CALENDARS_OBJECT.lower(), thread_count, users_accounts
+        )
+        keys = self.get_work_unit_keys(
+            constant.CALENDARS_OBJECT.lower(), users_accounts, time_range_list, folders
+        )
+        # Logic to fetch again the work units which failed in the previous run
+        keys.extend(self.retry_store.pop_failures("fetch", constant.CALENDARS_OBJECT.lower()))
+        self.create_retryable_jobs(
             thread_count,
-            sync_microsoft_outlook.fetch_calendar,
-            (ids_list, users_accounts, self.microsoft_outlook_calendar_object),
-            time_range_list,
+            self.create_work_units(
+                keys,
+                sync_microsoft_outlook.fetch_calendar,
+                (ids_list, self.microsoft_outlook_calendar_object),
+                users_accounts,
+                folders,
+            ),
+            self.retry_store,
         )
+        self.retry_store.save()
         storage_with_collection["global_keys"] = list(ids_list)
         self.local_storage.update_storage(
             storage_with_collection, constant.CALENDAR_DELETION_PATH
         )
+        # Logic to append the documents waiting for their attachments before the checkpoint
+        self.extraction_stage.wait()
+        # Logic to index again the meetings found in the calendars of other attendees after their first copy
+        if self.meeting_deduplicator:
+            self.append_updated_documents(
+                queue, constant.CALENDARS_OBJECT.lower(), self.meeting_deduplicator, indexing_type
+            )
         queue.put_checkpoint(constant.CALENDARS_OBJECT.lower(), end_time, indexing_type)
 
     def create_jobs_for_contacts(
@@ -247,12 +578,26 @@ class BaseCommand:
             self.local_storage, constant.CONTACT_DELETION_PATH
         )
         ids_list = storage_with_collection.get("global_keys")
-        self.create_jobs(
+        folders = self.get_work_unit_folders(
+            constant.CONTACTS_OBJECT.lower(), thread_count, users_accounts
+        )
+        keys = self.get_work_unit_keys(
+            constant.CONTACTS_OBJECT.lower(), users_accounts, time_range_list, folders
+        )
+        # Logic to fetch again the work units which failed in the previous run
+        keys.extend(self.retry_store.pop_failures("fetch", constant.CONTACTS_OBJECT.lower()))
+        self.create_retryable_jobs(
             thread_count,
-            sync_microsoft_outlook.fetch_contacts,
-            (ids_list, users_accounts, self.microsoft_outlook_contact_object),
-            time_range_list,
+            self.create_work_units(
+                keys,
+                sync_microsoft_outlook.fetch_contacts,
+                (ids_list, self.microsoft_outlook_contact_object),
+                users_accounts,
+                folders,
+            ),
+            self.retry_store,
         )
+        self.retry_store.save()
         storage_with_collection["global_keys"] = list(ids_list)
         self.local_storage.update_storage(
             storage_with_collection, constant.CONTACT_DELETION_PATH
@@ -289,16 +634,32 @@ class BaseCommand:
             self.local_storage, constant.TASK_DELETION_PATH
         )
         ids_list = storage_with_collection.get("global_keys")
-        self.create_jobs(
+        folders = self.get_work_unit_folders(
+            constant.TASKS_OBJECT.lower(), thread_count, users_accounts
+        )
+        keys = self.get_work_unit_keys(
+            constant.TASKS_OBJECT.lower(), users_accounts, time_range_list, folders
+        )
+        # Logic to fetch again the work units which failed in the previous run
+        keys.extend(self.retry_store.pop_failures("fetch", constant.TASKS_OBJECT.lower()))
+        self.create_retryable_jobs(
             thread_count,
-            sync_microsoft_outlook.fetch_tasks,
-            (ids_list, users_accounts, self.microsoft_outlook_task_object),
-            time_range_list,
+            self.create_work_units(
+                keys,
+                sync_microsoft_outlook.fetch_tasks,
+                (ids_list, self.microsoft_outlook_task_object),
+                users_accounts,
+                folders,
+            ),
+            self.retry_store,
         )
+        self.retry_store.save()
         storage_with_collection["global_keys"] = list(ids_list)
         self.local_storage.update_storage(
             storage_with_collection, constant.TASK_DELETION_PATH
         )
+        # Logic to append the documents waiting for their attachments before the checkpoint
+        self.extraction_stage.wait()
         queue.put_checkpoint(constant.TASKS_OBJECT.lower(), end_time, indexing_type)
 
     def get_datetime_iterable_list(self, start_time, end_time):
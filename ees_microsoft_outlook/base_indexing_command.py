@@ -8,10 +8,14 @@ Connector can run multiple commands such as full-sync and incremental-sync.
 This module provides convenience interface defining the shared
 objects and methods that will can be used by commands."""
 
+import threading
+
 from .base_command import BaseCommand
 from .checkpointing import Checkpoint
+from .connector_queue import ConnectorQueue
 from .constant import (CONNECTOR_TYPE_MICROSOFT_EXCHANGE,
-                       CONNECTOR_TYPE_OFFICE365)
+                       CONNECTOR_TYPE_OFFICE365, QUEUE_SPILL_PATH)
+from .document_record import DocumentRecord
 from .microsoft_exchange_server_user import MicrosoftExchangeServerUser
 from .office365_user import Office365User
 from .sync_enterprise_search import SyncEnterpriseSearch
@@ -34,14 +38,16 @@ class BaseIndexingCommand(BaseCommand):
         if CONNECTOR_TYPE_OFFICE365 in platform_type:
             office365_connection = Office365User(self.config)
             users = office365_connection.get_users()
-            users_accounts = office365_connection.get_users_accounts(users)
+            users_accounts = office365_connection.get_users_accounts(
+                users, self.mailbox_health
+            )
         elif CONNECTOR_TYPE_MICROSOFT_EXCHANGE in platform_type:
             microsoft_exchange_server_connection = MicrosoftExchangeServerUser(
                 self.config
             )
             users = microsoft_exchange_server_connection.get_users()
             users_accounts = microsoft_exchange_server_connection.get_users_accounts(
-                users
+                users, self.mailbox_health
             )
 
         if len(users_accounts) >= 0:
@@ -53,6 +59,13 @@ class BaseIndexingCommand(BaseCommand):
             exit()
         return users_accounts
 
+    def requeue_failed_documents(self, queue):
+        """This method puts back into queue the documents which could not be indexed in the previous run
+        :param queue: Shared queue to store the fetched documents
+        """
+        for documents in self.retry_store.pop_failures("index", "documents"):
+            queue.append_to_queue("documents", [DocumentRecord.from_dict(document) for document in documents])
+
     def pass_end_signal(self, queue):
         """This method pass end signal into queue
         :param queue: Shared queue to pass end signal
@@ -71,12 +84,53 @@ class BaseIndexingCommand(BaseCommand):
         checkpoint = Checkpoint(self.logger, self.config)
         thread_count = self.config.get_value("enterprise_search_sync_thread_count")
         sync_es = SyncEnterpriseSearch(
-            self.config, self.logger, self.workplace_search_custom_client, queue
+            self.config,
+            self.logger,
+            self.workplace_search_custom_client,
+            queue,
+            self.retry_store,
         )
         self.create_jobs(thread_count, sync_es.perform_sync, (), [])
+        queue.close()
+        queue.log_metrics()
+        sync_es.log_batch_size_metrics()
+        self.retry_store.save()
         for checkpoint_data in sync_es.checkpoint_list:
             checkpoint.set_checkpoint(
                 checkpoint_data["current_time"],
                 checkpoint_data["index_type"],
                 checkpoint_data["object_type"],
             )
+
+    def create_queue(self):
+        """This method creates the shared queue of the producer and the consumer, bounded as per the configuration
+        Returns:
+            queue: Object of ConnectorQueue
+        """
+        spill_path = None
+        if self.config.get_value("connector_queue.enable_spill"):
+            spill_path = self.config.get_value("connector_queue.spill_path") or QUEUE_SPILL_PATH
+        return ConnectorQueue(
+            self.logger,
+            self.config.get_value("connector_queue.max_items"),
+            self.config.get_value("connector_queue.max_bytes"),
+            spill_path,
+        )
+
+    def start_producer_and_consumer(self, queue):
+        """This method runs the consumer while the producer fetches the documents, as the producer waits for the
+        consumer once the queue is full. The documents which could not be indexed in the previous run are put
+        back into the queue first
+        :param queue: Shared queue to store the fetched documents
+        """
+        consumer = threading.Thread(target=self.start_consumer, args=(queue,))
+        consumer.start()
+        try:
+            self.requeue_failed_documents(queue)
+            self.start_producer(queue)
+        except Exception:
+            # Logic to stop the consumer once the documents fetched so far are indexed
+            self.pass_end_signal(queue)
+            raise
+        finally:
+            consumer.join()
@@ -0,0 +1,94 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module assembles the documents fetched from the queue into the batches indexed into Workplace Search.
+
+    Each document is encoded to JSON once, when it is added to a batch, and its bytes are kept along with the
+    document, so that the size of a batch is the exact size of its request body, and the body is the join of
+    the encoded documents. A checkpoint received while a batch is assembled goes on with the batch, which keeps the batch full, and is
+    released along with the batch, after the documents received before the checkpoint.
+"""
+from .serialization import encode_document, join_encoded_documents
+from .utils import fit_document_to_size
+
+
+class DocumentBatch:
+    """This class is a batch of documents along with the checkpoints released once the batch is indexed"""
+
+    __slots__ = ("documents", "encoded_documents", "size", "checkpoints", "batch_id")
+
+    def __init__(self):
+        self.documents = []
+        self.encoded_documents = []
+        # Size in bytes of the JSON array of the documents, with its brackets and commas
+        self.size = 2
+        self.checkpoints = []
+        # Id of the batch among the unfinished batches of the indexer, once it holds documents
+        self.batch_id = None
+
+    def get_body(self):
+        """Returns the JSON bytes of the documents, which is the body of the indexing request of the batch"""
+        return join_encoded_documents(self.encoded_documents)
+
+
+class DocumentBatcher:
+    """This class assembles the documents into batches bounded in number of documents and in bytes"""
+
+    def __init__(self, max_documents, max_bytes, keep_tail=False, max_document_bytes=None):
+        """
+        :param max_documents: Maximum number of documents of a batch
+        :param max_bytes: Maximum size in bytes of a batch, as it is sent to Workplace Search
+        :param keep_tail: Whether the end of a body truncated to fit in a batch is kept along with its beginning
+        :param max_document_bytes: Maximum size in bytes of a batch holding a single document, above which the
+            body of the document is truncated, or None for the maximum size of a batch
+        """
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.keep_tail = keep_tail
+        self.max_document_bytes = max_document_bytes
+        self.batch = DocumentBatch()
+
+    def add(self, document):
+        """Adds a document to the batch, whose body is truncated if the document does not fit in a request
+        :param document: Document fetched from the queue
+        Returns:
+            batch: The full batch closed by the document, or None
+        """
+        encoded_document = encode_document(document)
+        max_document_bytes = self.max_document_bytes or self.max_bytes
+        # Logic to make room for the brackets of the array of a batch holding the document alone
+        if len(encoded_document) + 2 > max_document_bytes:
+            fit_document_to_size(document, max_document_bytes - 2, self.keep_tail)
+            encoded_document = encode_document(document)
+        closed_batch = None
+        # The document is appended to the body of a batch along with a comma
+        body_size = self.batch.size + len(encoded_document) + 1
+        if self.batch.documents and (len(self.batch.documents) >= self.max_documents or body_size > self.max_bytes):
+            closed_batch = self.flush()
+        if self.batch.documents:
+            self.batch.size += 1
+        self.batch.documents.append(document)
+        self.batch.encoded_documents.append(encoded_document)
+        self.batch.size += len(encoded_document)
+        return closed_batch
+
+    def add_checkpoint(self, checkpoint):
+        """Adds a checkpoint, released along with the documents received before it
+        :param checkpoint: Dictionary of the checkpoint
+        Returns:
+            batch: A batch without documents releasing the checkpoint if no document is waiting, or None
+        """
+        self.batch.checkpoints.append(checkpoint)
+        if not self.batch.documents:
+            return self.flush()
+        return None
+
+    def flush(self):
+        """Closes the batch being assembled
+        Returns:
+            batch: The closed batch, which may have no documents
+        """
+        closed_batch, self.batch = self.batch, DocumentBatch()
+        return closed_batch
@@ -3,19 +3,151 @@
 # or more contributor license agreements. Licensed under the Elastic License 2.0;
 # you may not use this file except in compliance with the Elastic License 2.0.
 #
-import multiprocessing
-from multiprocessing.queues import Queue
+import collections
+import threading
+import time
 
 from .constant import CHECKPOINT, SIGNAL_CLOSE
+from .queue_spill import QueueSpill
+from .serialization import estimate_document_size
 
 
-class ConnectorQueue(Queue):
-    """Class to support additional queue operations specific to the connector"""
+class ConnectorQueue:
+    """Class to support additional queue operations specific to the connector.
 
-    def __init__(self, logger):
-        ctx = multiprocessing.get_context()
-        super(ConnectorQueue, self).__init__(ctx=ctx)
+    The producers and the consumers are threads of the same process, so the items are handed over without being
+    pickled. The queue is bounded by a number of items and a number of bytes of documents, measured by the
+    characters of their text fields so that the documents are encoded once, by the indexer: a producer putting
+    an item in a full queue waits until the consumers catch up, while an item is always accepted by an empty
+    queue, so that a batch larger than the byte limit does not block the producer forever.
+
+    With a spill path, an item which does not fit in the memory of the queue is written to the disk instead, and
+    so are the next items until the consumers read all the items of the disk, which keeps the order of the items.
+    """
+
+    def __init__(self, logger, max_items=None, max_bytes=None, spill_path=None):
+        """
+        :param logger: Logger object
+        :param max_items: Maximum number of items in the queue, or None for no limit
+        :param max_bytes: Maximum size in bytes of the documents in the queue, or None for no limit
+        :param spill_path: Directory where the items not fitting in memory are written, or None to block the
+            producers instead
+        """
         self.logger = logger
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.__spill = QueueSpill(logger, spill_path) if spill_path else None
+        self.__items = collections.deque()
+        self.__bytes = 0
+        self.__lock = threading.Lock()
+        self.__not_empty = threading.Condition(self.__lock)
+        self.__not_full = threading.Condition(self.__lock)
+        self.__closed = False
+        self.max_depth = 0
+        self.max_depth_bytes = 0
+        self.spilled_items = 0
+        self.blocked_puts = 0
+        self.put_wait_time = 0
+        self.get_wait_time = 0
+
+    def __is_full(self, size):
+        """Returns whether an item of given size must wait for the consumers, called with the lock held
+        :param size: Size in bytes of the documents of the item
+        """
+        if not self.__items or self.__closed:
+            return False
+        if self.max_items and len(self.__items) >= self.max_items:
+            return True
+        return bool(self.max_bytes) and self.__bytes + size > self.max_bytes
+
+    def put(self, item, size=0):
+        """Puts an item in the queue, waiting while the queue is full
+        :param item: Item of the queue
+        :param size: Size in bytes of the documents of the item
+        """
+        with self.__not_full:
+            if self.__spill is not None and (len(self.__spill) or self.__is_full(size)):
+                self.__spill.append(item)
+                self.spilled_items += 1
+                self.__not_empty.notify()
+                return
+            if self.__is_full(size):
+                self.blocked_puts += 1
+                start_time = time.perf_counter()
+                while self.__is_full(size):
+                    self.__not_full.wait()
+                self.put_wait_time += time.perf_counter() - start_time
+            self.__items.append((item, size))
+            self.__bytes += size
+            self.max_depth = max(self.max_depth, len(self.__items))
+            self.max_depth_bytes = max(self.max_depth_bytes, self.__bytes)
+            self.__not_empty.notify()
+
+    def get(self):
+        """Removes and returns the first item of the queue, waiting until there is one"""
+        with self.__not_empty:
+            while True:
+                if not self.__items and not self.__spilled_count():
+                    start_time = time.perf_counter()
+                    while not self.__items and not self.__spilled_count():
+                        self.__not_empty.wait()
+                    self.get_wait_time += time.perf_counter() - start_time
+                if not self.__items:
+                    # The items in memory are older than the ones of the disk
+                    recovered = bool(self.__spill.recovered_items)
+                    item = self.__spill.popleft()
+                    if recovered and isinstance(item, dict) and item.get("type") == SIGNAL_CLOSE:
+                        # Logic to skip the end signals of the previous run, whose consumers stopped on them
+                        continue
+                    return item
+                item, size = self.__items.popleft()
+                self.__bytes -= size
+                self.__not_full.notify_all()
+                return item
+
+    def __spilled_count(self):
+        """Returns the number of items written to the disk, called with the lock held"""
+        return len(self.__spill) if self.__spill is not None else 0
+
+    def close(self):
+        """Stops bounding the queue once the consumers are stopped, so that the producers are not blocked forever"""
+        with self.__lock:
+            self.__closed = True
+            self.__not_full.notify_all()
+
+    def qsize(self):
+        """Returns the number of items in the queue"""
+        with self.__lock:
+            return len(self.__items) + self.__spilled_count()
+
+    def get_metrics(self):
+        """Returns the depth of the queue and the time spent by the producers and the consumers waiting on it
+        Returns:
+            metrics: Dictionary of the metrics
+        """
+        with self.__lock:
+            return {
+                "depth": len(self.__items),
+                "depth_bytes": self.__bytes,
+                "spilled_depth": self.__spilled_count(),
+                "spilled_items": self.spilled_items,
+                "spilled_bytes": self.__spill.written_bytes if self.__spill is not None else 0,
+                "max_depth": self.max_depth,
+                "max_depth_bytes": self.max_depth_bytes,
+                "blocked_puts": self.blocked_puts,
+                "put_wait_time": self.put_wait_time,
+                "get_wait_time": self.get_wait_time,
+            }
+
+    def log_metrics(self):
+        """Logs the metrics of the queue"""
+        metrics = self.get_metrics()
+        self.logger.info(
+            f"Connector queue: max depth of {metrics['max_depth']} items and {metrics['max_depth_bytes']} bytes, "
+            f"{metrics['blocked_puts']} puts waited {metrics['put_wait_time']:.2f}s for the consumers, "
+            f"consumers waited {metrics['get_wait_time']:.2f}s for the producers, "
+            f"{metrics['spilled_items']} items spilled to the disk in {metrics['spilled_bytes']} bytes"
+        )
 
     def end_signal(self):
         """Send an terminate signal to indicate the queue can be closed"""
@@ -46,4 +178,4 @@ class ConnectorQueue(Queue):
             self.logger.debug(
                 f"Added list of {len(documents)} documents into the queue"
             )
-            self.put(documents_map)
+            self.put(documents_map, sum(estimate_document_size(document) for document in documents))
@@ -11,6 +11,9 @@ import os
 
 RFC_3339_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 BATCH_SIZE = 100
+# Field of the documents whose body was truncated to the byte budget
+BODY_TRUNCATED_FIELD = "body_truncated"
+TRUNCATION_MARKER = "\n[...]\n"
 CONNECTOR_TYPE_OFFICE365 = "Office365"
 CONNECTOR_TYPE_MICROSOFT_EXCHANGE = "Microsoft Exchange"
 GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
@@ -43,5 +46,28 @@ CALENDAR_ATTACHMENTS_OBJECT = "Calendar Attachments"
 CALENDAR_DELETION_PATH = os.path.join(
     os.path.dirname(__file__), "doc_ids", "microsoft_outlook_calendar_doc_ids.json"
 )
+RETRY_STORE_PATH = os.path.join(
+    os.path.dirname(__file__), "doc_ids", "microsoft_outlook_retry_units.json"
+)
+MAILBOX_HEALTH_PATH = os.path.join(
+    os.path.dirname(__file__), "doc_ids", "microsoft_outlook_mailbox_health.json"
+)
+ATTACHMENT_INDEX_PATH = os.path.join(
+    os.path.dirname(__file__), "doc_ids", "microsoft_outlook_attachment_index.json"
+)
+MESSAGE_MEMBERSHIP_PATH = os.path.join(
+    os.path.dirname(__file__), "doc_ids", "microsoft_outlook_message_membership.json"
+)
+ATTACHMENT_MEMBERSHIP_PATH = os.path.join(
+    os.path.dirname(__file__), "doc_ids", "microsoft_outlook_attachment_membership.json"
+)
+MEETING_MEMBERSHIP_PATH = os.path.join(
+    os.path.dirname(__file__), "doc_ids", "microsoft_outlook_meeting_membership.json"
+)
+EXTRACTION_CACHE_PATH = os.path.join(os.path.dirname(__file__), "extraction_cache")
+QUEUE_SPILL_PATH = os.path.join(os.path.dirname(__file__), "queue_spill")
+MESSAGE_DEDUP_SPILL_PATH = os.path.join(os.path.dirname(__file__), "dedup_spill", "messages")
+ATTACHMENT_DEDUP_SPILL_PATH = os.path.join(os.path.dirname(__file__), "dedup_spill", "attachments")
+MEETING_DEDUP_SPILL_PATH = os.path.join(os.path.dirname(__file__), "dedup_spill", "meetings")
 SIGNAL_CLOSE = "signal_close"
 CHECKPOINT = "checkpoint"
@@ -0,0 +1,317 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module allows to index once the items present in several mailboxes, like a mail sent to many
+colleagues, which has a copy in the Sent folder of the sender and in the Inbox of every recipient.
+
+    The copies of an item share a key, like the internet message id of a mail, which becomes the id of the
+    document. The first copy fetched in a run is converted to documents, which are indexed right away with
+    the permissions of the mailboxes known so far, and the other copies only add their mailbox to the item.
+    A copy of the indexed documents is spilled to the disk, and at the end of the run the documents of the
+    items whose mailboxes changed are read back and indexed again with the permissions of all the mailboxes
+    holding the item, so that only the mailboxes of the items are kept in memory. The mailboxes of each item
+    are kept in a JSON file, so that an incremental sync fetching a single copy keeps the permissions of the
+    copies fetched by the previous runs, and so that the deletion sync forgets the items deleted everywhere.
+
+    An item can also be held by other deduplicated items, like an attachment keyed on its content held by
+    deduplicated mails, so that the mailboxes of the copies of the mails which were not converted also hold
+    the attachment.
+
+    The items claimed by a work unit are released when the unit fails, as its documents are not queued, so
+    that its retry or another copy of the items converts them again.
+
+    The same document can also be fetched twice by the work units of a run, like an event overlapping the
+    time ranges of two work units, or a work unit failed in the previous run and fetched again. Those
+    documents are dropped on their way to the queue, keyed on their type and id.
+"""
+import contextlib
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import Future
+
+from .document_record import to_dict
+from .queue_spill import QueueSpill
+
+
+class DocumentDeduplicator:
+    """This class keeps the mailboxes of the items present in several mailboxes, and the documents of their
+    first copies on the disk.
+
+    The structure of the membership file is {'item_key': ['first@example.com', 'second@example.com']}
+    """
+
+    def __init__(self, logger, membership_path, permission, spill_path=None):
+        """
+        :param logger: Logger object
+        :param membership_path: Path of the JSON file of the mailboxes of each item
+        :param permission: Whether the documents are indexed with the permissions of the mailboxes
+        :param spill_path: Directory of the copies of the indexed documents, which are indexed again with the
+            permissions of all the mailboxes at the end of the run
+        """
+        self.logger = logger
+        self.membership_path = membership_path
+        self.permission = permission
+        self.__lock = threading.Lock()
+        self.__membership = {}
+        self.__mailboxes = {}
+        # Permissions which the first copy of each item of the run was indexed with
+        self.__indexed = {}
+        self.__pending = set()
+        # Keys of the items of another deduplicator holding each item
+        self.__holders = {}
+        # Keys claimed by the work unit running on each thread, if any
+        self.__unit = threading.local()
+        self.__spill = None
+        self.__spill_lock = threading.Lock()
+        self.__spill_condition = threading.Condition()
+        self.__pending_spills = 0
+        if permission and spill_path:
+            # The copies spilled by a stopped run are dropped, as their items are fetched again
+            shutil.rmtree(spill_path, ignore_errors=True)
+            self.__spill = QueueSpill(logger, spill_path)
+        if os.path.exists(membership_path) and os.path.getsize(membership_path) > 0:
+            with open(membership_path, encoding="utf-8") as membership_file:
+                try:
+                    self.__membership = json.load(membership_file)
+                except ValueError as exception:
+                    self.logger.exception(
+                        f"Error while parsing the membership file from path: {membership_path}. Error: {exception}"
+                    )
+
+    def claim(self, key, mailbox):
+        """Adds a mailbox to an item and returns whether the copy is the one converted to documents, which is
+        the first copy of the item fetched in this run
+        :param key: Key shared by the copies of the item
+        :param mailbox: Email address of the mailbox holding the copy
+        """
+        with self.__lock:
+            self.__mailboxes.setdefault(key, set()).add(mailbox)
+            if key in self.__indexed or key in self.__pending:
+                return False
+            self.__pending.add(key)
+        unit_keys = getattr(self.__unit, "keys", None)
+        if unit_keys is not None:
+            unit_keys.append(key)
+        return True
+
+    @contextlib.contextmanager
+    def work_unit(self):
+        """Records the items claimed by the work unit running on the current thread, and releases them if the
+        unit raises, so that the retry of the unit or another copy of the items converts them again"""
+        self.__unit.keys = []
+        try:
+            yield
+        except BaseException:
+            with self.__lock:
+                for key in self.__unit.keys:
+                    self.__pending.discard(key)
+                    self.__indexed.pop(key, None)
+            raise
+        finally:
+            self.__unit.keys = None
+
+    def add_holder(self, key, holder_key):
+        """Records an item of another deduplicator holding an item, whose mailboxes also hold the item
+        :param key: Key shared by the copies of the item
+        :param holder_key: Key of the item holding it, like the internet message id of a mail
+        """
+        with self.__lock:
+            self.__holders.setdefault(key, set()).add(holder_key)
+
+    def get_mailboxes(self, key):
+        """Returns the mailboxes holding an item as of the last flush
+        :param key: Key shared by the copies of the item
+        """
+        with self.__lock:
+            return self.__membership.get(key, [])
+
+    def is_kept(self, key):
+        """Returns whether the documents of an item are kept by this deduplicator in this run
+        :param key: Key shared by the copies of the item
+        """
+        with self.__lock:
+            return key in self.__indexed
+
+    def release(self, key):
+        """Releases an item whose copy failed to be converted, so that the next copy is converted instead
+        :param key: Key shared by the copies of the item
+        """
+        with self.__lock:
+            self.__pending.discard(key)
+
+    def keep(self, key, documents):
+        """Sets the permissions of the mailboxes known so far on the documents of the first copy of an item,
+        which are indexed right away, and spills a copy of them to index them again if other mailboxes hold
+        the item
+        :param key: Key shared by the copies of the item
+        :param documents: Document of the item followed by the documents of its attachments
+        """
+        with self.__lock:
+            self.__pending.discard(key)
+            if not self.permission:
+                self.__indexed[key] = []
+                return
+            permissions = sorted(self.__mailboxes[key].union(self.__membership.get(key, [])))
+            self.__indexed[key] = permissions
+        for document in documents:
+            document["_allow_permissions"] = permissions
+        if self.__spill is not None:
+            self.__spill_documents(key, documents)
+
+    def __spill_documents(self, key, documents):
+        """Writes a copy of the documents of an item to the spill once the text of their attachments is
+        extracted, without waiting for the extraction
+        :param key: Key shared by the copies of the item
+        :param documents: Documents whose bodies may be futures of the extraction
+        """
+        futures = [document["body"] for document in documents if isinstance(document.get("body"), Future)]
+        with self.__spill_condition:
+            self.__pending_spills += 1
+        if not futures:
+            self.__write_documents(key, documents)
+            return
+        lock = threading.Lock()
+        remaining_futures = [len(futures)]
+
+        def on_extracted(_):
+            with lock:
+                remaining_futures[0] -= 1
+                if remaining_futures[0]:
+                    return
+            self.__write_documents(key, documents)
+
+        for future in futures:
+            future.add_done_callback(on_extracted)
+
+    def __write_documents(self, key, documents):
+        """Appends a copy of the documents of an item, with their extracted bodies, to the spill
+        :param key: Key shared by the copies of the item
+        :param documents: Documents whose bodies are extracted
+        """
+        try:
+            spilled_documents = []
+            for document in documents:
+                document = dict(to_dict(document))
+                if isinstance(document.get("body"), Future):
+                    document["body"] = document["body"].result()
+                spilled_documents.append(document)
+            with self.__spill_lock:
+                self.__spill.append((key, spilled_documents))
+        except Exception as exception:
+            self.logger.error(f"Error while spilling the documents of the item {key}. Error: {exception}")
+        finally:
+            with self.__spill_condition:
+                self.__pending_spills -= 1
+                self.__spill_condition.notify_all()
+
+    def flush(self, replace_membership=False, holders=None):
+        """Updates the membership of the items and returns the documents to index again with the permissions
+        of all the mailboxes holding their item, which are the ones whose mailboxes changed since their first
+        copy was indexed
+        :param replace_membership: Whether this run fetched every copy of the items, like a full sync, so that
+            the mailboxes of the previous runs which no longer hold an item are dropped
+        :param holders: Object of DocumentDeduplicator of the items holding the items, already flushed, whose
+            mailboxes are added to the items
+        Returns:
+            documents: Iterator of the lists of documents of each item, read back from the spill
+        """
+        with self.__spill_condition:
+            while self.__pending_spills:
+                self.__spill_condition.wait()
+        outdated_permissions = {}
+        with self.__lock:
+            for key, mailboxes in self.__mailboxes.items():
+                if holders:
+                    for holder_key in self.__holders.get(key, ()):
+                        mailboxes.update(holders.get_mailboxes(holder_key))
+                if not replace_membership:
+                    mailboxes.update(self.__membership.get(key, []))
+                self.__membership[key] = sorted(mailboxes)
+                if self.permission and key in self.__indexed and self.__indexed[key] != self.__membership[key]:
+                    outdated_permissions[key] = self.__membership[key]
+            copy_count = sum(len(mailboxes) for mailboxes in self.__mailboxes.values())
+            self.logger.info(
+                f"Updating the permissions of {len(outdated_permissions)} of {len(self.__mailboxes)} deduplicated "
+                f"items held by {copy_count} mailboxes"
+            )
+            self.__mailboxes = {}
+            self.__indexed = {}
+            self.__holders = {}
+        return self.__read_documents(outdated_permissions)
+
+    def __read_documents(self, outdated_permissions):
+        """Reads back all the spilled documents and yields the ones of the items whose permissions changed
+        :param outdated_permissions: Dictionary of the permissions of the items to index again
+        """
+        if self.__spill is None:
+            return
+        for _ in range(len(self.__spill)):
+            key, documents = self.__spill.popleft()
+            # An item converted again by the retry of a failed work unit is spilled twice
+            permissions = outdated_permissions.pop(key, None)
+            if permissions is None:
+                continue
+            for document in documents:
+                document["_allow_permissions"] = permissions
+            yield documents
+
+    def remove(self, keys):
+        """Forgets the items deleted from all the mailboxes
+        :param keys: Keys of the deleted items
+        """
+        with self.__lock:
+            for key in keys:
+                self.__membership.pop(key, None)
+
+    def save(self):
+        """Writes the membership of the items to the membership file"""
+        os.makedirs(os.path.dirname(self.membership_path), exist_ok=True)
+        with self.__lock:
+            with open(self.membership_path, "w", encoding="utf-8") as membership_file:
+                try:
+                    json.dump(self.__membership, membership_file)
+                except ValueError as exception:
+                    self.logger.exception(
+                        f"Error while updating the membership file. Error: {exception}"
+                    )
+
+
+class DocumentKeyFilter:
+    """This class drops the documents whose type and id were already seen by the filter, across all the work
+    units sharing it"""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__keys = set()
+
+    def filter(self, documents):
+        """Returns the documents not seen before, in their order
+        :param documents: Documents fetched by a work unit
+        Returns:
+            documents: List of the documents whose type and id are seen for the first time
+        """
+        unique_documents = []
+        with self.__lock:
+            keys = self.__keys
+            for document in documents:
+                key = (document["type"], document["id"])
+                if key not in keys:
+                    keys.add(key)
+                    unique_documents.append(document)
+        return unique_documents
+
+
+@contextlib.contextmanager
+def deduplication_unit(*deduplicators):
+    """Runs a work unit whose items claimed from the given deduplicators are released if the unit raises
+    :param deduplicators: Objects of DocumentDeduplicator, or None for the disabled dedup modes
+    """
+    with contextlib.ExitStack() as stack:
+        for deduplicator in deduplicators:
+            if deduplicator:
+                stack.enter_context(deduplicator.work_unit())
+        yield
@@ -11,6 +11,7 @@
 from . import constant
 from .base_command import BaseCommand
 from .connector_queue import ConnectorQueue
+from .deduplication import DocumentDeduplicator
 from .microsoft_exchange_server_user import MicrosoftExchangeServerUser
 from .office365_user import Office365User
 from .sync_enterprise_search import SyncEnterpriseSearch
@@ -19,6 +20,25 @@ from .sync_enterprise_search import SyncEnterpriseSearch
 class DeletionSyncCommand(BaseCommand):
     """This class start executions of deletion feature."""
 
+    # The deletion sync compares the documents of every copy of the items, so that none of them is held
+    message_deduplicator = None
+    attachment_deduplicator = None
+    meeting_deduplicator = None
+    # The deletion sync only compares the ids of the live items, so no extraction pool is started. The converters
+    # still download the attachments, whose content keys them in the attachment dedup mode, and extract them inline
+    extraction_stage = None
+
+    def forget_deduplicated_documents(self, deleted_documents, membership_paths):
+        """Forgets the items indexed once for several mailboxes which were deleted from all of them
+        :param deleted_documents: Ids of the deleted documents
+        :param membership_paths: Dictionary of the paths of the membership files keyed by their dedup setting
+        """
+        for dedup_key, membership_path in membership_paths.items():
+            if self.config.get_value(dedup_key):
+                deduplicator = DocumentDeduplicator(self.logger, membership_path, False)
+                deduplicator.remove(deleted_documents)
+                deduplicator.save()
+
     def remove_deleted_documents_from_global_keys(
         self,
         live_documents,
@@ -43,9 +63,16 @@ class DeletionSyncCommand(BaseCommand):
                 )
             )
             if len(items_exists) == 0 and self.config.get_value("connector_platform_type") in platform:
-                deleted_documents.append(item_id)
+                # An attachment indexed once for several items has one entry per item
+                if item_id not in deleted_documents:
+                    deleted_documents.append(item_id)
                 if item in global_keys_documents:
                     global_keys_documents.remove(item)
+        # Logic to drop the references of the deleted items to the attachments still held by other items
+        deleted_ids = set(deleted_documents)
+        global_keys_documents[:] = [
+            item for item in global_keys_documents if item["parent id"] not in deleted_ids
+        ]
 
     def create_jobs_for_mails_deletion(
         self,
@@ -66,14 +93,20 @@ class DeletionSyncCommand(BaseCommand):
         storage_with_collection = self.local_storage.get_storage_with_collection(
             self.local_storage, constant.MAIL_DELETION_PATH
         )
-        mails_documents = self.create_jobs(
+        folders = self.get_work_unit_folders(
+            constant.MAILS_OBJECT.lower(), thread_count, users_accounts
+        )
+        mails_documents = self.create_retryable_jobs(
             thread_count,
-            self.microsoft_outlook_mail_object.get_mails,
-            (
-                [],
+            self.create_work_units(
+                self.get_work_unit_keys(
+                    constant.MAILS_OBJECT.lower(), users_accounts, time_range_list, folders
+                ),
+                self.microsoft_outlook_mail_object.get_folder_mails,
+                ([],),
                 users_accounts,
+                folders,
             ),
-            time_range_list,
         )
         delete_keys_documents = storage_with_collection.get("delete_keys") or []
         global_keys_documents = storage_with_collection.get("global_keys") or []
@@ -90,6 +123,13 @@ class DeletionSyncCommand(BaseCommand):
         self.local_storage.update_storage(
             storage_with_collection, constant.MAIL_DELETION_PATH
         )
+        self.forget_deduplicated_documents(
+            deleted_documents,
+            {
+                "enable_message_dedup": constant.MESSAGE_MEMBERSHIP_PATH,
+                "enable_attachment_dedup": constant.ATTACHMENT_MEMBERSHIP_PATH,
+            },
+        )
         self.logger.info("Completed deletion of mails")
 
     def create_jobs_for_calendar_deletion(
@@ -111,11 +151,20 @@ class DeletionSyncCommand(BaseCommand):
         storage_with_collection = self.local_storage.get_storage_with_collection(
             self.local_storage, constant.CALENDAR_DELETION_PATH
         )
-        calendar_documents = self.create_jobs(
+        folders = self.get_work_unit_folders(
+            constant.CALENDARS_OBJECT.lower(), thread_count, users_accounts
+        )
+        calendar_documents = self.create_retryable_jobs(
             thread_count,
-            self.microsoft_outlook_calendar_object.get_calendar,
-            ([], users_accounts,),
-            time_range_list,
+            self.create_work_units(
+                self.get_work_unit_keys(
+                    constant.CALENDARS_OBJECT.lower(), users_accounts, time_range_list, folders
+                ),
+                self.microsoft_outlook_calendar_object.get_folder_calendar,
+                ([],),
+                users_accounts,
+                folders,
+            ),
         )
         delete_keys_documents = storage_with_collection.get("delete_keys") or []
         global_keys_documents = storage_with_collection.get("global_keys") or []
@@ -132,6 +181,9 @@ class DeletionSyncCommand(BaseCommand):
         self.local_storage.update_storage(
             storage_with_collection, constant.CALENDAR_DELETION_PATH
         )
+        self.forget_deduplicated_documents(
+            deleted_documents, {"enable_meeting_dedup": constant.MEETING_MEMBERSHIP_PATH}
+        )
         self.logger.info("Completed deletion of calendar")
 
     def create_jobs_for_contacts_deletion(
@@ -153,14 +205,20 @@ class DeletionSyncCommand(BaseCommand):
         storage_with_collection = self.local_storage.get_storage_with_collection(
             self.local_storage, constant.CONTACT_DELETION_PATH
         )
-        contacts_documents = self.create_jobs(
+        folders = self.get_work_unit_folders(
+            constant.CONTACTS_OBJECT.lower(), thread_count, users_accounts
+        )
+        contacts_documents = self.create_retryable_jobs(
             thread_count,
-            self.microsoft_outlook_contact_object.get_contacts,
-            (
-                [],
+            self.create_work_units(
+                self.get_work_unit_keys(
+                    constant.CONTACTS_OBJECT.lower(), users_accounts, time_range_list, folders
+                ),
+                self.microsoft_outlook_contact_object.get_account_contacts,
+                ([],),
                 users_accounts,
+                folders,
             ),
-            time_range_list,
         )
         delete_keys_documents = storage_with_collection.get("delete_keys") or []
         global_keys_documents = storage_with_collection.get("global_keys") or []
@@ -198,11 +256,20 @@ class DeletionSyncCommand(BaseCommand):
         storage_with_collection = self.local_storage.get_storage_with_collection(
             self.local_storage, constant.TASK_DELETION_PATH
         )
-        tasks_documents = self.create_jobs(
+        folders = self.get_work_unit_folders(
+            constant.TASKS_OBJECT.lower(), thread_count, users_accounts
+        )
+        tasks_documents = self.create_retryable_jobs(
             thread_count,
-            self.microsoft_outlook_task_object.get_tasks,
-            ([], users_accounts,),
-            time_range_list,
+            self.create_work_units(
+                self.get_work_unit_keys(
+                    constant.TASKS_OBJECT.lower(), users_accounts, time_range_list, folders
+                ),
+                self.microsoft_outlook_task_object.get_account_tasks,
+                ([],),
+                users_accounts,
+                folders,
+            ),
         )
         delete_keys_documents = storage_with_collection.get("delete_keys") or []
         global_keys_documents = storage_with_collection.get("global_keys") or []
@@ -226,7 +293,7 @@ class DeletionSyncCommand(BaseCommand):
         for fetching documents from the Microsoft Outlook and pushing them in the shared queue
         :param queue: Shared queue to store the fetched documents
         """
-        thread_count = self.config.get_value("microsoft_outlook_sync_thread_count")
+        thread_count = self.config.get_value("source_sync_thread_count")
         product_type = self.config.get_value("connector_platform_type")
         self.logger.debug(f"Starting producer for fetching objects from {product_type}")
 
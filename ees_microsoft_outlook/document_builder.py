@@ -0,0 +1,40 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module compiles the functions mapping the fields of the Microsoft Outlook objects to the records of
+the Workplace Search documents.
+
+    The included and excluded fields of the configuration file, the permission setting and the type of the
+    documents are resolved once per run and object type into a tuple of the slots of the record and the fields
+    of the object they are copied from, so that mapping an object neither walks the schema nor looks up the
+    configuration.
+"""
+from .document_record import FIELD_SLOTS, DocumentRecord
+from .utils import get_schema_fields
+
+
+def compile_document_builder(config, object_name, document_type=None):
+    """Returns the function mapping the fields of an object to a Workplace Search document
+    :param config: Configuration object
+    :param object_name: Name of the object in the schema like mails, calendar, tasks, contacts
+    :param document_type: Type of the documents, or None if it is the type field of each object
+    Returns:
+        build_document: Function called with the dictionary of the fields of an object and the email address
+            of its mailbox, which returns the record of the document
+    """
+    schema = get_schema_fields(object_name, config.get_value("objects"))
+    # Logic to resolve the fields, the permissions and the type of the documents up front
+    fields = tuple((FIELD_SLOTS[ws_field], ms_field) for ws_field, ms_field in schema.items())
+    permission = config.get_value("enable_document_permission")
+
+    def build_document(source_document, mailbox):
+        document = DocumentRecord()
+        document.permissions = [mailbox] if permission else []
+        document.type = document_type or source_document["type"]
+        for slot, ms_field in fields:
+            setattr(document, slot, source_document[ms_field])
+        return document
+
+    return build_document
@@ -0,0 +1,103 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module contains the compact record of the documents flowing from the Microsoft Outlook fetchers to the
+Workplace Search indexer.
+
+    A record has a fixed set of fields stored in slots instead of a dictionary per document, which divides the
+    memory of the queued documents. The fields are read and written with the keys of the Workplace Search
+    document, so that the stages of the pipeline handle records and dictionaries alike, and a record is
+    converted to a dictionary once, when its batch is indexed.
+"""
+
+# Slot of each field of the Workplace Search documents
+FIELD_SLOTS = {
+    "_allow_permissions": "permissions",
+    "type": "type",
+    "id": "id",
+    "title": "title",
+    "body": "body",
+    "created_at": "created_at",
+    "created": "created",
+    "body_truncated": "body_truncated",
+}
+
+
+class DocumentRecord:
+    """This class is a document of Workplace Search, whose fields are the ones set on the record.
+
+    The mails, calendar events, contacts and tasks have a created_at field, while their attachments have a
+    created field.
+    """
+
+    __slots__ = tuple(FIELD_SLOTS.values())
+
+    def __init__(self, **fields):
+        """
+        :param fields: Values of the fields by slot name, like permissions, type, id, title, body
+        """
+        for slot, value in fields.items():
+            setattr(self, slot, value)
+
+    @classmethod
+    def from_dict(cls, document):
+        """Returns the record of a document
+        :param document: Dictionary of the fields of the document
+        """
+        return cls(**{FIELD_SLOTS[field]: value for field, value in document.items()})
+
+    def to_dict(self):
+        """Returns the dictionary of the fields set on the record, which is the document sent to Workplace Search"""
+        document = {}
+        for field, slot in FIELD_SLOTS.items():
+            try:
+                document[field] = getattr(self, slot)
+            except AttributeError:
+                continue
+        return document
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, FIELD_SLOTS[field])
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def __setitem__(self, field, value):
+        setattr(self, FIELD_SLOTS[field], value)
+
+    def __contains__(self, field):
+        slot = FIELD_SLOTS.get(field)
+        return slot is not None and hasattr(self, slot)
+
+    def get(self, field, default=None):
+        """Returns the value of a field, or the default if the field is not set
+        :param field: Name of the field in the Workplace Search document
+        :param default: Value returned if the field is not set
+        """
+        slot = FIELD_SLOTS.get(field)
+        return getattr(self, slot, default) if slot else default
+
+    def values(self):
+        """Returns the values of the fields set on the record, without converting it to a dictionary"""
+        return [getattr(self, slot) for slot in self.__slots__ if hasattr(self, slot)]
+
+    def __eq__(self, other):
+        if isinstance(other, DocumentRecord):
+            other = other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+def to_dict(document):
+    """Returns the dictionary of a document, which is either a record or already a dictionary
+    :param document: Record or dictionary of the document
+    """
+    return document.to_dict() if isinstance(document, DocumentRecord) else document
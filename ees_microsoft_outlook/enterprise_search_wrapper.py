@@ -6,10 +6,9 @@
 """This module perform operations related to Enterprise Search based on the Enterprise Search version
 """
 from elastic_enterprise_search import WorkplaceSearch, __version__
+from elastic_transport import ConnectionTimeout
 from packaging import version
 
-from .utils import retry
-
 ENTERPRISE_V8 = version.parse("8.0")
 
 if version.parse(__version__) >= ENTERPRISE_V8:
@@ -26,6 +25,16 @@ else:
                                               NotFoundError,
                                               ServiceUnavailableError)
 
+# Errors on which indexing the documents is worth retrying, which also make the next batches smaller as
+# Enterprise Search is overloaded
+TRANSIENT_ERRORS = (
+    BadGatewayError,
+    GatewayTimeoutError,
+    InternalServerError,
+    ServiceUnavailableError,
+    ConnectionTimeout,
+)
+
 
 class EnterpriseSearchWrapper:
     """This class contains operations related to Enterprise Search such as index documents, delete documents, etc."""
@@ -222,18 +231,10 @@ class EnterpriseSearchWrapper:
                 f"Error while checking for deleted documents. Error: {exception}"
             )
 
-    @retry(
-        exception_list=(
-            BadGatewayError,
-            GatewayTimeoutError,
-            InternalServerError,
-            ServiceUnavailableError,
-        )
-    )
     def index_documents(self, documents, timeout):
         """Indexes one or more new documents into a custom content source, or updates one
         or more existing documents
-        :param documents: list of documents to be indexed
+        :param documents: list of documents to be indexed, or the JSON bytes of the list sent as is
         :param timeout: Timeout in seconds
         """
         try:
@@ -242,13 +243,8 @@ class EnterpriseSearchWrapper:
                 documents=documents,
                 request_timeout=timeout,
             )
-        except (
-            BadGatewayError,
-            GatewayTimeoutError,
-            InternalServerError,
-            ServiceUnavailableError,
-        ) as exception:
-            self.logger.exception(
+        except TRANSIENT_ERRORS as exception:
+            self.logger.warning(
                 f"Error while indexing the documents. Error: {exception}"
             )
             raise exception
@@ -0,0 +1,293 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module allows to fetch mails from Microsoft Outlook without building exchangelib item objects.
+
+    The FindItem and GetItem SOAP requests are sent directly through the session pool of the
+    account and the responses are parsed with a streaming lxml parser, so that the memory used
+    for a response is bounded by one GetItem batch instead of the whole parsed response.
+"""
+from types import SimpleNamespace
+from xml.sax.saxutils import quoteattr
+
+import requests
+from exchangelib import IMPERSONATION
+from exchangelib.ewsdatetime import EWSDateTime
+from exchangelib.transport import DEFAULT_HEADERS, wrap
+from exchangelib.util import MNS, TNS, post_ratelimited
+from lxml import etree
+
+
+FIND_ITEM_PAGE_SIZE = 100
+GET_ITEM_BATCH_SIZE = 50
+
+MAIL_FIELD_URIS = [
+    "item:Subject",
+    "message:Sender",
+    "message:ToRecipients",
+    "message:CcRecipients",
+    "message:BccRecipients",
+    "item:Importance",
+    "item:Categories",
+    "item:Body",
+    "item:HasAttachments",
+    "item:LastModifiedTime",
+    "message:InternetMessageId",
+]
+
+FIND_ITEM_TEMPLATE = """<m:FindItem xmlns:m="{mns}" xmlns:t="{tns}" Traversal="Shallow">
+<m:ItemShape><t:BaseShape>IdOnly</t:BaseShape></m:ItemShape>
+<m:IndexedPageItemView MaxEntriesReturned="{page_size}" Offset="{offset}" BasePoint="Beginning"/>
+<m:Restriction><t:And>
+<t:IsGreaterThan><t:FieldURI FieldURI="item:LastModifiedTime"/>
+<t:FieldURIOrConstant><t:Constant Value="{start_time}"/></t:FieldURIOrConstant></t:IsGreaterThan>
+<t:IsLessThan><t:FieldURI FieldURI="item:LastModifiedTime"/>
+<t:FieldURIOrConstant><t:Constant Value="{end_time}"/></t:FieldURIOrConstant></t:IsLessThan>
+</t:And></m:Restriction>
+<m:ParentFolderIds>{folder_id}</m:ParentFolderIds>
+</m:FindItem>"""
+
+GET_ITEM_TEMPLATE = """<m:GetItem xmlns:m="{mns}" xmlns:t="{tns}">
+<m:ItemShape><t:BaseShape>IdOnly</t:BaseShape>
+<t:AdditionalProperties>{field_uris}</t:AdditionalProperties></m:ItemShape>
+<m:ItemIds>{item_ids}</m:ItemIds>
+</m:GetItem>"""
+
+M_RESPONSE_MESSAGE_SUFFIX = "ResponseMessage"
+M_ITEMS = f"{{{MNS}}}Items"
+M_ROOT_FOLDER = f"{{{MNS}}}RootFolder"
+M_MESSAGE_TEXT = f"{{{MNS}}}MessageText"
+T_ITEM_ID = f"{{{TNS}}}ItemId"
+T_EMAIL_ADDRESS = f"{{{TNS}}}EmailAddress"
+
+
+def _tag(name):
+    """Returns the qualified name of an element in the types namespace
+    :param name: Local name of the element
+    """
+    return f"{{{TNS}}}{name}"
+
+
+def _mailboxes(element, name):
+    """Returns the mailboxes of a recipient list element in the shape of exchangelib mailboxes
+    :param element: Item element
+    :param name: Local name of the recipient list element like ToRecipients
+    """
+    recipients = element.find(_tag(name))
+    if recipients is None:
+        return None
+    return [
+        SimpleNamespace(email_address=email.text)
+        for email in recipients.iter(T_EMAIL_ADDRESS)
+    ]
+
+
+def _release(element):
+    """Clears an already parsed element and its preceding siblings to keep the parsed tree small
+    :param element: Element which is completely parsed
+    """
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def parse_find_item_response(stream):
+    """Parses a FindItem response and returns the item ids of the page
+    :param stream: File like object containing the SOAP response
+    Returns:
+        item_ids: List of tuples of item id and change key
+        includes_last_item: Whether the page is the last page of the folder
+    """
+    item_ids = []
+    includes_last_item = True
+    for _, element in etree.iterparse(stream, events=("end",)):
+        if element.tag == T_ITEM_ID:
+            item_ids.append((element.get("Id"), element.get("ChangeKey")))
+            _release(element)
+        elif element.tag == M_ROOT_FOLDER:
+            includes_last_item = element.get("IncludesLastItemInRange", "true") == "true"
+        elif element.tag.endswith(M_RESPONSE_MESSAGE_SUFFIX) and element.get("ResponseClass") == "Error":
+            raise requests.exceptions.RequestException(
+                f"FindItem request failed. Error: {element.findtext(M_MESSAGE_TEXT)}"
+            )
+    return item_ids, includes_last_item
+
+
+def parse_get_item_response(stream, logger):
+    """Parses a GetItem response item by item into records in the shape of exchangelib messages
+    :param stream: File like object containing the SOAP response
+    :param logger: Logger object
+    Yields:
+        mail_record: Lightweight record of a mail with the fields used for creating the documents
+    """
+    for _, element in etree.iterparse(stream, events=("end",)):
+        parent = element.getparent()
+        if parent is not None and parent.tag == M_ITEMS:
+            item_id = element.find(T_ITEM_ID)
+            sender = element.find(_tag("Sender"))
+            categories = element.find(_tag("Categories"))
+            last_modified_time = element.findtext(_tag("LastModifiedTime"))
+            yield SimpleNamespace(
+                id=item_id.get("Id") if item_id is not None else None,
+                changekey=item_id.get("ChangeKey") if item_id is not None else None,
+                subject=element.findtext(_tag("Subject")),
+                sender=SimpleNamespace(email_address=sender.findtext(f".//{T_EMAIL_ADDRESS}"))
+                if sender is not None
+                else None,
+                to_recipients=_mailboxes(element, "ToRecipients"),
+                cc_recipients=_mailboxes(element, "CcRecipients"),
+                bcc_recipients=_mailboxes(element, "BccRecipients"),
+                importance=element.findtext(_tag("Importance")),
+                categories=[category.text for category in categories]
+                if categories is not None
+                else None,
+                body=element.findtext(_tag("Body")),
+                has_attachments=element.findtext(_tag("HasAttachments")) == "true",
+                last_modified_time=EWSDateTime.from_string(last_modified_time)
+                if last_modified_time
+                else None,
+                message_id=element.findtext(_tag("InternetMessageId")),
+                attachments=[],
+            )
+            _release(element)
+        elif element.tag.endswith(M_RESPONSE_MESSAGE_SUFFIX):
+            # An item can be deleted between the FindItem and the GetItem request
+            if element.get("ResponseClass") == "Error":
+                logger.info(
+                    f"Skipping an item which could not be fetched. Error: {element.findtext(M_MESSAGE_TEXT)}"
+                )
+            _release(element)
+
+
+class EWSFastPath:
+    """This class fetches mails of a folder by sending the FindItem and GetItem requests directly"""
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    def post(self, account, payload, parse):
+        """Sends a SOAP request on behalf of the account and parses the streamed response. A failed request
+        raises, so that the work unit of the folder is retried with the backoff of the connector
+        :param account: User account object
+        :param payload: Body of the SOAP request
+        :param parse: Function which parses the response stream
+        Returns:
+            result: Result of the parse function
+        """
+        protocol = account.protocol
+        session = protocol.get_session()
+        headers = dict(DEFAULT_HEADERS)
+        headers["X-AnchorMailbox"] = account.primary_smtp_address
+        response, session = post_ratelimited(
+            protocol=protocol,
+            session=session,
+            url=protocol.service_endpoint,
+            headers=headers,
+            data=wrap(
+                content=etree.fromstring(payload),
+                api_version=account.version.api_version,
+                account_to_impersonate=account.identity
+                if account.access_type == IMPERSONATION
+                else None,
+            ),
+            stream=True,
+        )
+        try:
+            if response.status_code != 200:
+                raise requests.exceptions.HTTPError(
+                    f"Unexpected status code {response.status_code} from {protocol.service_endpoint}"
+                )
+            response.raw.decode_content = True
+            return parse(response.raw)
+        finally:
+            response.close()
+            protocol.release_session(session)
+
+    def find_item_ids(self, account, folder, start_time, end_time):
+        """Pages through a folder and yields the ids of the items modified in the time range
+        :param account: User account object
+        :param folder: Distinguished folder name like inbox or folder object of the account
+        :param start_time: Start time for fetching the mails
+        :param end_time: End time for fetching the mails
+        """
+        if isinstance(folder, str):
+            folder_id = f"<t:DistinguishedFolderId Id={quoteattr(folder)}/>"
+        else:
+            folder_id = f"<t:FolderId Id={quoteattr(folder.id)}/>"
+        offset = 0
+        while True:
+            payload = FIND_ITEM_TEMPLATE.format(
+                mns=MNS,
+                tns=TNS,
+                page_size=FIND_ITEM_PAGE_SIZE,
+                offset=offset,
+                start_time=start_time.ewsformat(),
+                end_time=end_time.ewsformat(),
+                folder_id=folder_id,
+            )
+            item_ids, includes_last_item = self.post(
+                account, payload, parse_find_item_response
+            )
+            yield from item_ids
+            offset += len(item_ids)
+            if includes_last_item or not item_ids:
+                break
+
+    def get_mails(self, account, folder, start_time, end_time):
+        """Yields the mails of a folder modified in the time range
+        :param account: User account object
+        :param folder: Distinguished folder name like inbox or folder object of the account
+        :param start_time: Start time for fetching the mails
+        :param end_time: End time for fetching the mails
+        """
+        field_uris = "".join(
+            f"<t:FieldURI FieldURI={quoteattr(field_uri)}/>" for field_uri in MAIL_FIELD_URIS
+        )
+        batch = []
+        for item_id in self.find_item_ids(account, folder, start_time, end_time):
+            batch.append(item_id)
+            if len(batch) == GET_ITEM_BATCH_SIZE:
+                yield from self.get_mail_batch(account, field_uris, batch)
+                batch = []
+        if batch:
+            yield from self.get_mail_batch(account, field_uris, batch)
+
+    def get_mail_batch(self, account, field_uris, item_ids):
+        """Fetches a batch of mails and the attachments of the mails which have any
+        :param account: User account object
+        :param field_uris: Field URIs to be fetched for each mail
+        :param item_ids: List of tuples of item id and change key
+        Returns:
+            mail_records: List of mail records
+        """
+        payload = GET_ITEM_TEMPLATE.format(
+            mns=MNS,
+            tns=TNS,
+            field_uris=field_uris,
+            item_ids="".join(
+                f"<t:ItemId Id={quoteattr(item_id)} ChangeKey={quoteattr(changekey)}/>"
+                for item_id, changekey in item_ids
+            ),
+        )
+        mail_records = self.post(
+            account, payload, lambda stream: list(parse_get_item_response(stream, self.logger))
+        )
+        # Attachments are rare compared to mails, hence they are fetched through exchangelib
+        records_with_attachments = [
+            mail_record for mail_record in mail_records if mail_record.has_attachments
+        ]
+        if records_with_attachments:
+            items = account.fetch(
+                ids=[
+                    (mail_record.id, mail_record.changekey)
+                    for mail_record in records_with_attachments
+                ],
+                only_fields=["attachments"],
+            )
+            for mail_record, item in zip(records_with_attachments, items):
+                mail_record.attachments = getattr(item, "attachments", None) or []
+        return mail_records
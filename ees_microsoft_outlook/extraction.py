@@ -0,0 +1,267 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module contains the extraction stage which extracts the text of the attachments.
+
+    The attachments are sent to Tika from a dedicated pool of threads, so that the threads fetching the
+    objects from Microsoft Outlook never wait on Tika. The body of an attachment document is a future
+    until its text is extracted, and the documents are appended to the queue once all their bodies are done.
+"""
+import mmap
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .extraction_cache import get_content_digest
+from .extraction_policy import ExtractionPolicy
+from .extractors import get_native_extractor
+from .utils import extract
+
+
+class ExtractionStage:
+    """This class extracts the text of the attachments on its own pool of threads"""
+
+    def __init__(
+        self,
+        logger,
+        thread_count,
+        timeout,
+        cache=None,
+        attachment_index=None,
+        native_extraction=False,
+        policies=None,
+        tika_pool=None,
+    ):
+        """
+        :param logger: Logger object
+        :param thread_count: Number of attachments extracted concurrently
+        :param timeout: Timeout in seconds of a Tika request
+        :param cache: Object of ExtractionCache to extract the same content only once
+        :param attachment_index: Object of AttachmentIndex to download the unchanged attachments only once
+        :param native_extraction: Whether the common formats are extracted in process instead of by Tika
+        :param policies: Dictionary of the ExtractionPolicy of each object type
+        :param tika_pool: Object of TikaPool balancing the requests between several Tika servers
+        """
+        self.logger = logger
+        self.timeout = timeout
+        self.policies = policies or {}
+        self.tika_pool = tika_pool
+        self.default_policy = ExtractionPolicy(logger, {}, timeout)
+        self.native_extraction = native_extraction
+        self.cache = cache
+        self.attachment_index = attachment_index if cache else None
+        self.executor = ThreadPoolExecutor(max_workers=thread_count)
+        # The contents downloaded ahead of their extraction are bounded by the size of the pool
+        self.__slots = threading.Semaphore(thread_count)
+        self.__condition = threading.Condition()
+        self.__pending_batches = 0
+
+    def submit(self, content):
+        """Schedules the extraction of the text of an attachment
+        :param content: Content of the attachment
+        Returns:
+            future: Future of the extracted text
+        """
+        return self.executor.submit(self.extract, content)
+
+    def get_attachment_digest(self, attachment, object_type=None):
+        """Returns the digest of the content of an attachment allowed by the extraction policy of its object,
+        without downloading its content again if the attachment did not change since its last extraction
+        :param attachment: Attachment object
+        :param object_type: Type of the object of the attachment like mails, calendar, tasks
+        Returns:
+            digest: SHA-256 digest of the content, or None if the content is not downloaded
+            content: Content of the attachment, or None if its digest is found in the attachment index. A
+                downloaded content holds a slot of the stage until it is submitted or released
+        """
+        policy = self.policies.get(object_type, self.default_policy)
+        if not policy.is_allowed(attachment):
+            return None, None
+        if self.attachment_index:
+            digest = self.attachment_index.get(attachment)
+            if digest:
+                return digest, None
+        # Logic to wait for a slot, so that the fetching threads do not download faster than the pool extracts
+        self.__slots.acquire()
+        try:
+            content = policy.read(attachment)
+        except Exception:
+            self.__slots.release()
+            raise
+        if content is None:
+            self.__slots.release()
+            return None, None
+        return get_content_digest(content), content
+
+    def submit_attachment(self, attachment, object_type=None, content=None, digest=None):
+        """Schedules the extraction of the text of an attachment within the extraction policy of its object,
+        without downloading its content again if the attachment did not change since its last extraction
+        :param attachment: Attachment object
+        :param object_type: Type of the object of the attachment like mails, calendar, tasks
+        :param content: Content of the attachment if it is already downloaded by get_attachment_digest
+        :param digest: SHA-256 digest of the downloaded content
+        Returns:
+            future: Future of the extracted text
+        """
+        policy = self.policies.get(object_type, self.default_policy)
+        if content is not None:
+            future = self.executor.submit(self.extract, content, attachment, policy, digest)
+            future.add_done_callback(lambda _: self.__slots.release())
+            return future
+        if not policy.is_allowed(attachment):
+            return self.get_done_future(None)
+        if self.attachment_index:
+            digest = self.attachment_index.get(attachment)
+            text = self.cache.get(digest) if digest else None
+            if text is not None:
+                return self.get_done_future(policy.truncate(text) or None)
+            if digest:
+                self.attachment_index.remove(attachment)
+        return self.executor.submit(self.extract_attachment, attachment, policy)
+
+    @staticmethod
+    def get_done_future(text):
+        """Returns a future which is already done with the text of an attachment
+        :param text: Text of the attachment
+        """
+        future = Future()
+        future.set_result(text)
+        return future
+
+    @staticmethod
+    def close_content(content):
+        """Closes the content of an attachment spooled to a memory-mapped file, which deletes the file
+        :param content: Content of the attachment
+        """
+        if isinstance(content, mmap.mmap):
+            content.close()
+
+    def release_content(self, content):
+        """Closes the content of an attachment downloaded by get_attachment_digest which is not extracted, and
+        releases its slot
+        :param content: Content of the attachment, or None if it was not downloaded
+        """
+        if content is not None:
+            self.close_content(content)
+            self.__slots.release()
+
+    def extract_attachment(self, attachment, policy):
+        """Downloads the content of an attachment on the pool of threads and extracts its text, so that the
+        contents waiting for their extraction are not held in memory
+        :param attachment: Attachment object
+        :param policy: ExtractionPolicy of the object of the attachment
+        """
+        try:
+            content = policy.read(attachment)
+        except Exception as exception:
+            self.logger.error(f"Error while downloading the content of an attachment. Error: {exception}")
+            return None
+        return self.extract(content, attachment, policy)
+
+    def extract(self, content, attachment=None, policy=None, digest=None):
+        """Extracts the text of an attachment, an attachment which can not be extracted is indexed without body
+        :param content: Content of the attachment
+        :param attachment: Attachment object to add to the attachment index once extracted
+        :param policy: ExtractionPolicy of the object of the attachment
+        :param digest: SHA-256 digest of the content, if already computed
+        """
+        policy = policy or self.default_policy
+        try:
+            if not self.cache:
+                return policy.truncate(self.extract_content(content, attachment, policy))
+            digest = digest or get_content_digest(content)
+            text = self.cache.get(digest)
+            if text is None:
+                text = self.extract_content(content, attachment, policy) or ""
+                try:
+                    self.cache.put(digest, text)
+                except OSError as exception:
+                    self.logger.error(f"Error while caching the content of an attachment. Error: {exception}")
+                    return policy.truncate(text) or None
+            if attachment is not None and self.attachment_index:
+                self.attachment_index.put(attachment, digest)
+            return policy.truncate(text) or None
+        except Exception as exception:
+            self.logger.error(f"Error while extracting the content of an attachment. Error: {exception}")
+            return None
+        finally:
+            self.close_content(content)
+
+    def extract_content(self, content, attachment, policy):
+        """Extracts the text of an attachment with the native extractor of its format, if any, or with Tika
+        :param content: Content of the attachment
+        :param attachment: Attachment object giving the content type and the name of the attachment
+        :param policy: ExtractionPolicy of the object of the attachment
+        """
+        if self.native_extraction and attachment is not None:
+            native_extractor = get_native_extractor(attachment.content_type, attachment.name)
+            if native_extractor:
+                try:
+                    return native_extractor(content)
+                except Exception as exception:
+                    self.logger.warning(
+                        f"Error while extracting the content of the attachment {attachment.name} in process, "
+                        f"falling back to Tika. Error: {exception}"
+                    )
+        if self.tika_pool:
+            return self.tika_pool.extract(content, policy.timeout)
+        return extract(content, policy.timeout)
+
+    def append_to_queue(self, queue, object_type, documents):
+        """Appends the documents to the queue once the text of their attachments is extracted, without
+        waiting for the extraction
+        :param queue: Shared queue for storing the data
+        :param object_type: Type of documents
+        :param documents: Documents whose bodies may be futures of the extraction
+        """
+        futures = [
+            document["body"]
+            for document in documents or []
+            if isinstance(document.get("body"), Future)
+        ]
+        if not futures:
+            queue.append_to_queue(object_type, documents)
+            return
+        with self.__condition:
+            self.__pending_batches += 1
+        lock = threading.Lock()
+        remaining_futures = [len(futures)]
+
+        def on_extracted(_):
+            with lock:
+                remaining_futures[0] -= 1
+                if remaining_futures[0]:
+                    return
+            try:
+                for document in documents:
+                    if isinstance(document.get("body"), Future):
+                        document["body"] = document["body"].result()
+                queue.append_to_queue(object_type, documents)
+            except Exception as exception:
+                self.logger.error(f"Error while appending {len(documents)} {object_type} to the queue. Error: {exception}")
+            finally:
+                # Logic to release the waiting producers even if the documents could not be queued
+                with self.__condition:
+                    self.__pending_batches -= 1
+                    self.__condition.notify_all()
+
+        for future in futures:
+            future.add_done_callback(on_extracted)
+
+    def close(self):
+        """Stops the pool of threads once the pending extractions are done, logs the metrics of the extraction
+        cache, if any, saves the attachment index and stops the Tika pool"""
+        self.executor.shutdown(wait=True)
+        if self.cache:
+            self.cache.log_metrics()
+        if self.attachment_index:
+            self.attachment_index.save()
+        if self.tika_pool:
+            self.tika_pool.close()
+
+    def wait(self):
+        """Waits until all the documents handed to the stage are appended to the queue"""
+        with self.__condition:
+            while self.__pending_batches:
+                self.__condition.wait()
@@ -0,0 +1,193 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module contains the on-disk cache of the text extracted from the attachments.
+
+    The cache is addressed by the SHA-256 digest of the content of an attachment, so the same attachment
+    sent to several mailboxes is extracted once. The entries are files named after the digest, which are
+    written atomically and whose modification time is the last access time, so that the cache directory can
+    be shared by several connectors and the least recently used entries are evicted first.
+
+    The attachment index maps the metadata of an attachment to the digest of its content, so that an
+    unchanged attachment of a changed item is found in the cache without being downloaded again.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# Ratio of the maximum size down to which the cache is evicted once it is full, to avoid evicting on every write
+EVICTION_TARGET_RATIO = 0.9
+
+
+def get_content_digest(content):
+    """Returns the SHA-256 digest of the content of an attachment
+    :param content: Content of the attachment
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+class ExtractionCache:
+    """This class stores the extracted text of the attachments in a directory, bounded in size"""
+
+    def __init__(self, logger, cache_path, max_size):
+        """
+        :param logger: Logger object
+        :param cache_path: Directory of the cache, which can be shared
+        :param max_size: Maximum size of the cache in bytes
+        """
+        self.logger = logger
+        self.cache_path = cache_path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__lock = threading.Lock()
+        os.makedirs(cache_path, exist_ok=True)
+        self.__size = sum(size for _, _, size in self.__entries())
+
+    def __entries(self):
+        """Yields the path, the last access time and the size of each entry of the cache"""
+        for shard in os.scandir(self.cache_path):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # The entry was evicted by another connector sharing the cache
+                    continue
+                yield entry.path, stat.st_mtime, stat.st_size
+
+    def __get_entry_path(self, digest):
+        return os.path.join(self.cache_path, digest[:2], digest)
+
+    def get(self, digest):
+        """Returns the extracted text of an attachment, or None if it is not in the cache
+        :param digest: SHA-256 digest of the content of the attachment
+        """
+        entry_path = self.__get_entry_path(digest)
+        try:
+            with open(entry_path, encoding="utf-8") as entry_file:
+                text = entry_file.read()
+            os.utime(entry_path)
+        except FileNotFoundError:
+            with self.__lock:
+                self.misses += 1
+            return None
+        with self.__lock:
+            self.hits += 1
+        return text
+
+    def put(self, digest, text):
+        """Stores the extracted text of an attachment and evicts the least recently used entries
+        if the cache is full
+        :param digest: SHA-256 digest of the content of the attachment
+        :param text: Extracted text of the attachment
+        """
+        entry_path = self.__get_entry_path(digest)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(entry_path))
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as entry_file:
+            entry_file.write(text)
+        os.replace(temporary_path, entry_path)
+        with self.__lock:
+            self.__size += os.path.getsize(entry_path)
+            if self.__size > self.max_size:
+                self.__evict()
+
+    def __evict(self):
+        """Removes the least recently used entries until the cache is below its eviction target"""
+        entries = sorted(self.__entries(), key=lambda entry: entry[1])
+        self.__size = sum(size for _, _, size in entries)
+        for entry_path, _, size in entries:
+            if self.__size <= self.max_size * EVICTION_TARGET_RATIO:
+                break
+            try:
+                os.remove(entry_path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            self.__size -= size
+
+    def log_metrics(self):
+        """Logs the hits, misses and evictions of the cache"""
+        with self.__lock:
+            lookups = self.hits + self.misses
+            hit_ratio = self.hits / lookups if lookups else 0
+            self.logger.info(
+                f"Extraction cache: {self.hits} hits, {self.misses} misses ({hit_ratio:.0%} hit ratio), "
+                f"{self.evictions} evictions, {self.__size} bytes used out of {self.max_size}"
+            )
+
+
+class AttachmentIndex:
+    """This class keeps the digest of the content of the extracted attachments in a JSON file, keyed by
+    the id, the size and the last modified time of the attachments.
+
+    The structure of the file is {'attachment_id': ['size', 'last_modified_time', 'digest']}
+    """
+
+    def __init__(self, logger, attachment_index_path):
+        self.logger = logger
+        self.attachment_index_path = attachment_index_path
+        self.__lock = threading.Lock()
+        self.__attachments = {}
+        if os.path.exists(attachment_index_path) and os.path.getsize(attachment_index_path) > 0:
+            with open(attachment_index_path, encoding="utf-8") as attachment_index_file:
+                try:
+                    self.__attachments = json.load(attachment_index_file)
+                except ValueError as exception:
+                    self.logger.exception(
+                        f"Error while parsing the attachment index file from path: {attachment_index_path}. "
+                        f"Error: {exception}"
+                    )
+
+    @staticmethod
+    def get_metadata(attachment):
+        """Returns the id and the metadata identifying the content of an attachment
+        :param attachment: Attachment object
+        """
+        return attachment.attachment_id.id, [attachment.size, str(attachment.last_modified_time)]
+
+    def get(self, attachment):
+        """Returns the digest of the content of an attachment if it did not change since its extraction
+        :param attachment: Attachment object
+        """
+        attachment_id, metadata = self.get_metadata(attachment)
+        with self.__lock:
+            indexed_attachment = self.__attachments.get(attachment_id)
+        if indexed_attachment and indexed_attachment[:2] == metadata:
+            return indexed_attachment[2]
+        return None
+
+    def put(self, attachment, digest):
+        """Stores the digest of the content of an attachment
+        :param attachment: Attachment object
+        :param digest: SHA-256 digest of the content of the attachment
+        """
+        attachment_id, metadata = self.get_metadata(attachment)
+        with self.__lock:
+            self.__attachments[attachment_id] = metadata + [digest]
+
+    def remove(self, attachment):
+        """Removes an attachment whose content was evicted from the cache
+        :param attachment: Attachment object
+        """
+        with self.__lock:
+            self.__attachments.pop(attachment.attachment_id.id, None)
+
+    def save(self):
+        """Writes the attachments to the attachment index file"""
+        os.makedirs(os.path.dirname(self.attachment_index_path), exist_ok=True)
+        with self.__lock:
+            with open(self.attachment_index_path, "w", encoding="utf-8") as attachment_index_file:
+                try:
+                    json.dump(self.__attachments, attachment_index_file)
+                except ValueError as exception:
+                    self.logger.exception(
+                        f"Error while updating the attachment index file. Error: {exception}"
+                    )
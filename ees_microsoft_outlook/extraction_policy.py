@@ -0,0 +1,151 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module contains the extraction policy which bounds the attachments downloaded and extracted for
+each object.
+
+    The attachments whose content type is denied are neither downloaded nor extracted. The content of
+    an attachment larger than the maximum download size is streamed from Microsoft Outlook and truncated
+    at the cap when its format can be extracted from a prefix, like the text formats, and is skipped
+    otherwise. An attachment larger than the spool threshold is streamed to a temporary file which is
+    handed to the extraction as a memory-mapped file, so that the memory used by the attachments is
+    bounded by the spool threshold times the number of attachments handled concurrently.
+"""
+import fnmatch
+import mmap
+import tempfile
+
+# Default maximum size in MB of the content of an attachment which is downloaded
+DEFAULT_MAX_SIZE = 50
+DEFAULT_DENIED_MIME_TYPES = ["video/*", "audio/*"]
+
+# Size of the chunks of an attachment streamed to a temporary file
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+# Content types whose prefix can be extracted, so that an oversized attachment is truncated instead of skipped
+TRUNCATABLE_MIME_TYPES = ["text/*", "application/json", "application/xml", "message/rfc822"]
+
+
+def get_complete_length(content):
+    """Returns the length of a text truncated at the maximum size without its last character if the truncation
+    cut it, so that the text is still decoded as UTF-8, or as UTF-16 if it has a byte order mark
+    :param content: Truncated content of the attachment, as bytes or as a memory-mapped file
+    """
+    length = len(content)
+    if content[:2] in (b"\xff\xfe", b"\xfe\xff"):
+        return length - length % 2
+    # Logic to find the first byte of the last character, within the 4 bytes of the longest UTF-8 character
+    for position in range(length - 1, max(length - 5, -1), -1):
+        byte = content[position]
+        if byte & 0xC0 != 0x80:
+            character_size = 4 if byte >= 0xF0 else 3 if byte >= 0xE0 else 2 if byte >= 0xC0 else 1
+            return position if position + character_size > length else length
+    return length
+
+
+def match_mime_type(content_type, patterns):
+    """Returns whether a content type matches one of the patterns, like image/*
+    :param content_type: Content type of the attachment
+    :param patterns: List of content types, which may contain wildcards
+    """
+    return any(fnmatch.fnmatchcase(content_type, pattern.lower()) for pattern in patterns)
+
+
+class ExtractionPolicy:
+    """This class decides whether an attachment is extracted and reads its content within the size cap"""
+
+    def __init__(self, logger, policy_config, default_timeout, spool_threshold=None):
+        """
+        :param logger: Logger object
+        :param policy_config: Dictionary of the extraction policy of an object from the configuration file
+        :param default_timeout: Timeout in seconds of a Tika request if the policy does not set one
+        :param spool_threshold: Size in bytes above which an attachment is spooled to a temporary file
+        """
+        policy_config = policy_config or {}
+        self.logger = logger
+        self.max_size = (policy_config.get("max_size") or DEFAULT_MAX_SIZE) * 1024 * 1024
+        self.allowed_mime_types = policy_config.get("allowed_mime_types") or []
+        self.denied_mime_types = policy_config.get("denied_mime_types")
+        if self.denied_mime_types is None:
+            self.denied_mime_types = DEFAULT_DENIED_MIME_TYPES
+        self.max_text_length = policy_config.get("max_text_length")
+        self.timeout = policy_config.get("timeout") or default_timeout
+        self.spool_threshold = spool_threshold
+
+    @staticmethod
+    def get_content_type(attachment):
+        """Returns the content type of an attachment without its parameters
+        :param attachment: Attachment object
+        """
+        return (attachment.content_type or "").split(";")[0].strip().lower()
+
+    def is_allowed(self, attachment):
+        """Returns whether the content of an attachment is downloaded and extracted
+        :param attachment: Attachment object
+        """
+        content_type = self.get_content_type(attachment)
+        if self.allowed_mime_types and not match_mime_type(content_type, self.allowed_mime_types):
+            return False
+        if match_mime_type(content_type, self.denied_mime_types):
+            return False
+        if (attachment.size or 0) > self.max_size and not match_mime_type(content_type, TRUNCATABLE_MIME_TYPES):
+            self.logger.info(
+                f"Skipping the content of the attachment {attachment.name} of {attachment.size} bytes, "
+                f"which is larger than the maximum size of {self.max_size} bytes"
+            )
+            return False
+        return True
+
+    def read(self, attachment):
+        """Returns the content of an attachment, streamed and truncated at the maximum size if it is larger.
+        The content of an attachment larger than the spool threshold is returned as a memory-mapped file
+        :param attachment: Attachment object
+        """
+        size = attachment.size or 0
+        spooled = self.spool_threshold is not None and size > self.spool_threshold
+        if size <= self.max_size and not spooled:
+            return attachment.content
+        with attachment.fp as stream:
+            if not spooled:
+                content = stream.read(self.max_size)
+                return content[: get_complete_length(content)] if len(content) == self.max_size else content
+            return self.spool(stream)
+
+    def spool(self, stream):
+        """Streams the content of an attachment to a temporary file, up to the maximum size, and maps it
+        :param stream: File object streaming the content of the attachment
+        Returns:
+            content: Memory-mapped content of the attachment, which is closed once extracted
+        """
+        with tempfile.TemporaryFile() as spool_file:
+            remaining_size = self.max_size
+            while remaining_size:
+                chunk = stream.read(min(SPOOL_CHUNK_SIZE, remaining_size))
+                if not chunk:
+                    break
+                spool_file.write(chunk)
+                remaining_size -= len(chunk)
+            if not spool_file.tell():
+                return b""
+            spool_file.flush()
+            # The mapping keeps its own reference to the file, which is deleted once the mapping is closed
+            content = mmap.mmap(spool_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if remaining_size:
+                return content
+            # Logic to drop the character cut by the truncation, which needs the file to be mapped again
+            length = get_complete_length(content)
+            if not length or length == len(content):
+                return content
+            content.close()
+            spool_file.truncate(length)
+            return mmap.mmap(spool_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def truncate(self, text):
+        """Truncates the extracted text of an attachment at the maximum text length
+        :param text: Extracted text of the attachment
+        """
+        if text and self.max_text_length and len(text) > self.max_text_length:
+            return text[: self.max_text_length]
+        return text
@@ -0,0 +1,273 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module contains the native extractors which extract the text of the common formats of attachments
+in process, without a round-trip to the Tika server.
+
+    An extractor is picked by the content type of the attachment and, when the content type is missing or
+    generic, by the extension of its name. The attachments of the other formats are extracted by Tika.
+"""
+import codecs
+import csv
+import email
+import io
+import json
+import os
+import zipfile
+from email import policy
+
+import olefile
+from lxml import etree
+
+from .utils import html_to_text, open_stream
+
+# Content types which do not tell the format of an attachment, so that its extension is used instead
+GENERIC_CONTENT_TYPES = {"", "application/octet-stream", "application/x-unknown"}
+
+# Namespaces of the elements holding the text of the OOXML documents
+WORDPROCESSINGML_NAMESPACE = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+SPREADSHEETML_NAMESPACE = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+DRAWINGML_NAMESPACE = "http://schemas.openxmlformats.org/drawingml/2006/main"
+
+# Streams of an Outlook MSG file holding the subject and the plain text body, encoded in UTF-16LE
+MSG_SUBJECT_STREAM = "__substg1.0_0037001F"
+MSG_BODY_STREAM = "__substg1.0_1000001F"
+# Options of the parser of the XML parts of the attachments, which are untrusted, set explicitly rather than
+# relying on the defaults of the installed lxml version
+SAFE_PARSER_OPTIONS = {"resolve_entities": False, "no_network": True}
+
+EXTRACTORS_BY_CONTENT_TYPE = {}
+EXTRACTORS_BY_EXTENSION = {}
+
+
+def register_extractor(content_types, extensions):
+    """Decorator registering a native extractor for content types and extensions
+    :param content_types: Content types extracted by the extractor
+    :param extensions: Extensions, with the leading dot, extracted by the extractor
+    """
+
+    def decorator(func):
+        """This function used as a decorator."""
+        for content_type in content_types:
+            EXTRACTORS_BY_CONTENT_TYPE[content_type] = func
+        for extension in extensions:
+            EXTRACTORS_BY_EXTENSION[extension] = func
+        return func
+
+    return decorator
+
+
+def get_native_extractor(content_type, name):
+    """Returns the native extractor of an attachment, or None if the attachment is extracted by Tika
+    :param content_type: Content type of the attachment
+    :param name: File name of the attachment
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type not in GENERIC_CONTENT_TYPES:
+        return EXTRACTORS_BY_CONTENT_TYPE.get(content_type)
+    return EXTRACTORS_BY_EXTENSION.get(os.path.splitext(name or "")[1].lower())
+
+
+def decode(content):
+    """Decodes the content of a text attachment, which is UTF-8 unless it has a byte order mark. A content which
+    is not valid UTF-8 is decoded as cp1252, unless it is UTF-8 with a few bad bytes, like a truncated content
+    :param content: Content of the attachment, as bytes or as a memory-mapped file
+    """
+    with memoryview(content) as view:
+        if bytes(view[:2]) in (b"\xff\xfe", b"\xfe\xff"):
+            return codecs.decode(view, "utf-16", "replace")
+        try:
+            return codecs.decode(view, "utf-8-sig")
+        except UnicodeDecodeError as exception:
+            # Logic to keep UTF-8 if the error is within the final bytes, or after a valid non ASCII character
+            if exception.start < len(view) - 3 and bytes(view[: exception.start]).isascii():
+                return codecs.decode(view, "cp1252", "replace")
+            return codecs.decode(view, "utf-8-sig", "replace")
+
+
+@register_extractor(["text/plain", "text/markdown"], [".txt", ".log", ".md"])
+def extract_text(content):
+    """Extracts the text of a plain text attachment
+    :param content: Content of the attachment
+    """
+    return decode(content)
+
+
+@register_extractor(["text/html", "application/xhtml+xml"], [".html", ".htm", ".xhtml"])
+def extract_html(content):
+    """Extracts the text of an HTML attachment
+    :param content: Content of the attachment
+    """
+    return html_to_text(decode(content)) or ""
+
+
+@register_extractor(["text/csv"], [".csv"])
+def extract_csv(content):
+    """Extracts the cells of a CSV attachment, one row per line
+    :param content: Content of the attachment
+    """
+    rows = csv.reader(io.StringIO(decode(content), newline=""))
+    return "\n".join(" ".join(cell for cell in row if cell) for row in rows)
+
+
+@register_extractor(["application/json"], [".json"])
+def extract_json(content):
+    """Extracts the scalar values of a JSON attachment, one value per line
+    :param content: Content of the attachment
+    """
+    values = []
+    pending = [json.loads(decode(content))]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, dict):
+            pending.extend(reversed(list(value.values())))
+        elif isinstance(value, list):
+            pending.extend(reversed(value))
+        elif value is not None:
+            values.append(str(value))
+    return "\n".join(values)
+
+
+@register_extractor(["message/rfc822"], [".eml"])
+def extract_eml(content):
+    """Extracts the headers and the body of an email attachment
+    :param content: Content of the attachment
+    """
+    message = email.message_from_binary_file(open_stream(content), policy=policy.default)
+    lines = [
+        f"{header}: {message[header]}"
+        for header in ("From", "To", "Cc", "Subject")
+        if message[header]
+    ]
+    body = message.get_body(preferencelist=("plain", "html"))
+    if body is not None:
+        body_text = body.get_content()
+        if body.get_content_subtype() == "html":
+            body_text = html_to_text(body_text) or ""
+        lines.append(body_text)
+    return "\n".join(lines)
+
+
+def iter_texts(stream, tags, line_tags=()):
+    """Streams the text of the elements of an XML part, without building its tree
+    :param stream: File object of the XML part
+    :param tags: Qualified names of the elements holding the text
+    :param line_tags: Qualified names of the elements ending a line, like the paragraphs
+    """
+    for _, element in etree.iterparse(
+        stream, events=("end",), tag=list(tags) + list(line_tags), **SAFE_PARSER_OPTIONS
+    ):
+        if element.tag in line_tags:
+            yield "\n"
+        elif element.text:
+            yield element.text
+        element.clear()
+
+
+def get_parts(archive, prefix):
+    """Returns the names of the XML parts of a directory of an OOXML document in their natural order,
+    so that slide10 comes after slide9
+    :param archive: Object of ZipFile
+    :param prefix: Directory of the parts
+    """
+    names = [
+        name for name in archive.namelist() if name.startswith(prefix) and name.endswith(".xml")
+    ]
+    return sorted(names, key=lambda name: (len(name), name))
+
+
+@register_extractor(
+    ["application/vnd.openxmlformats-officedocument.wordprocessingml.document"], [".docx"]
+)
+def extract_docx(content):
+    """Extracts the paragraphs of a Word document
+    :param content: Content of the attachment
+    """
+    with zipfile.ZipFile(open_stream(content)) as archive:
+        with archive.open("word/document.xml") as stream:
+            return "".join(
+                iter_texts(
+                    stream,
+                    [f"{{{WORDPROCESSINGML_NAMESPACE}}}t"],
+                    [f"{{{WORDPROCESSINGML_NAMESPACE}}}p"],
+                )
+            ).strip()
+
+
+@register_extractor(
+    ["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"], [".xlsx"]
+)
+def extract_xlsx(content):
+    """Extracts the shared strings and the inline values of an Excel workbook
+    :param content: Content of the attachment
+    """
+    texts = []
+    with zipfile.ZipFile(open_stream(content)) as archive:
+        if "xl/sharedStrings.xml" in archive.namelist():
+            with archive.open("xl/sharedStrings.xml") as stream:
+                texts.append(
+                    "".join(
+                        iter_texts(
+                            stream,
+                            [f"{{{SPREADSHEETML_NAMESPACE}}}t"],
+                            [f"{{{SPREADSHEETML_NAMESPACE}}}si"],
+                        )
+                    )
+                )
+        for name in get_parts(archive, "xl/worksheets/sheet"):
+            with archive.open(name) as stream:
+                texts.append(" ".join(iter_sheet_values(stream)))
+    return "\n".join(text.strip() for text in texts if text.strip())
+
+
+def iter_sheet_values(stream):
+    """Streams the values of the cells of a sheet which are not indexes of shared strings, like the numbers
+    and the inline strings
+    :param stream: File object of the sheet part
+    """
+    value_tag = f"{{{SPREADSHEETML_NAMESPACE}}}v"
+    text_tag = f"{{{SPREADSHEETML_NAMESPACE}}}t"
+    for _, element in etree.iterparse(
+        stream, events=("end",), tag=f"{{{SPREADSHEETML_NAMESPACE}}}c", **SAFE_PARSER_OPTIONS
+    ):
+        if element.get("t") != "s":
+            value = element.findtext(value_tag) or "".join(
+                text.text or "" for text in element.iter(text_tag)
+            )
+            if value:
+                yield value
+        element.clear()
+
+
+@register_extractor(
+    ["application/vnd.openxmlformats-officedocument.presentationml.presentation"], [".pptx"]
+)
+def extract_pptx(content):
+    """Extracts the paragraphs of the slides of a PowerPoint presentation
+    :param content: Content of the attachment
+    """
+    slides = []
+    with zipfile.ZipFile(open_stream(content)) as archive:
+        for name in get_parts(archive, "ppt/slides/slide"):
+            with archive.open(name) as stream:
+                slides.append(
+                    "".join(
+                        iter_texts(stream, [f"{{{DRAWINGML_NAMESPACE}}}t"], [f"{{{DRAWINGML_NAMESPACE}}}p"])
+                    ).strip()
+                )
+    return "\n".join(slide for slide in slides if slide)
+
+
+@register_extractor(["application/vnd.ms-outlook"], [".msg"])
+def extract_msg(content):
+    """Extracts the subject and the plain text body of an Outlook message
+    :param content: Content of the attachment
+    """
+    with olefile.OleFileIO(content) as message:
+        return "\n".join(
+            message.openstream(stream).read().decode("utf-16-le")
+            for stream in (MSG_SUBJECT_STREAM, MSG_BODY_STREAM)
+            if message.exists(stream)
+        )
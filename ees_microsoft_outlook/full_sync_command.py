@@ -9,7 +9,6 @@ third-party system and ingest them into Enterprise Search instance.
 """
 
 from .base_indexing_command import BaseIndexingCommand
-from .connector_queue import ConnectorQueue
 from .constant import CURRENT_TIME
 from .sync_microsoft_outlook import SyncMicrosoftOutlook
 
@@ -24,7 +23,7 @@ class FullSyncCommand(BaseIndexingCommand):
         the Microsoft Outlook and pushing them in the shared queue
         :param queue: Shared queue to fetch the stored documents
         """
-        thread_count = self.config.get_value("microsoft_outlook_sync_thread_count")
+        thread_count = self.config.get_value("source_sync_thread_count")
 
         users_accounts = self.get_accounts()
         sync_microsoft_outlook = SyncMicrosoftOutlook(
@@ -32,6 +31,7 @@ class FullSyncCommand(BaseIndexingCommand):
             self.logger,
             self.workplace_search_custom_client,
             queue,
+            self.extraction_stage,
         )
 
         start_time, end_time = (
@@ -76,12 +76,12 @@ class FullSyncCommand(BaseIndexingCommand):
             end_time,
             queue,
         )
+        self.extraction_stage.close()
         self.pass_end_signal(queue)
 
     def execute(self):
         """This function execute the start function."""
 
-        queue = ConnectorQueue(self.logger)
+        queue = self.create_queue()
         self.local_storage.create_local_storage_directory()
-        self.start_producer(queue)
-        self.start_consumer(queue)
+        self.start_producer_and_consumer(queue)
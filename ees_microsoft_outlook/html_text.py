@@ -0,0 +1,172 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module contains the engines converting the HTML bodies of the mails, the calendar events and the
+attachments to text.
+
+    The beautifulsoup engine builds the whole tree of the document and keeps all its text. The html_parser
+    engine strips the tags while parsing, without building a tree, and the lxml engine parses the document
+    with the C parser of lxml. Both drop the content of the style and script elements, keep one line per
+    block of text and can drop the quoted reply chains of the mails.
+"""
+from html.parser import HTMLParser
+
+import lxml.html
+from bs4 import BeautifulSoup
+from lxml import etree
+
+DEFAULT_HTML_ENGINE = "lxml"
+
+SKIPPED_TAGS = {"script", "style", "template"}
+BLOCK_TAGS = {
+    "address", "article", "blockquote", "br", "dd", "div", "dl", "dt", "footer", "h1", "h2", "h3", "h4",
+    "h5", "h6", "header", "hr", "li", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul",
+}
+
+# Ids of the elements of Outlook after which the rest of the body is the quoted mail
+REPLY_SEPARATOR_IDS = {"divRplyFwdMsg", "appendonsend"}
+# Classes of the elements holding a quoted mail, like the quotes of Gmail and Yahoo
+QUOTE_CLASSES = {"gmail_quote", "yahoo_quoted"}
+
+QUOTE_XPATH = " | ".join(
+    [
+        "//blockquote[@type='cite']",
+        *(
+            f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {quote_class} ')]"
+            for quote_class in sorted(QUOTE_CLASSES)
+        ),
+    ]
+)
+REPLY_SEPARATOR_XPATH = " | ".join(f"//*[@id='{separator_id}']" for separator_id in sorted(REPLY_SEPARATOR_IDS))
+
+
+def is_quote(tag, attributes):
+    """Returns whether an element holds a quoted mail
+    :param tag: Name of the element
+    :param attributes: Dictionary of the attributes of the element
+    """
+    if tag == "blockquote" and attributes.get("type") == "cite":
+        return True
+    return not QUOTE_CLASSES.isdisjoint((attributes.get("class") or "").split())
+
+
+def normalize_lines(text):
+    """Collapses the whitespaces of each line of a text and removes its empty lines
+    :param text: Text converted from HTML
+    """
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class HTMLTextParser(HTMLParser):
+    """This class collects the text of an HTML document while parsing it"""
+
+    def __init__(self, strip_quoted_replies):
+        """
+        :param strip_quoted_replies: Whether the quoted reply chains are dropped
+        """
+        super().__init__(convert_charrefs=True)
+        self.strip_quoted_replies = strip_quoted_replies
+        self.parts = []
+        self.skipped_tag = None
+        self.skipped_depth = 0
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if self.skipped_tag:
+            if tag == self.skipped_tag:
+                self.skipped_depth += 1
+            return
+        if tag in SKIPPED_TAGS:
+            self.skipped_tag, self.skipped_depth = tag, 1
+            return
+        if self.strip_quoted_replies:
+            attributes = dict(attrs)
+            if attributes.get("id") in REPLY_SEPARATOR_IDS:
+                self.done = True
+                return
+            if is_quote(tag, attributes):
+                self.skipped_tag, self.skipped_depth = tag, 1
+                return
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if not self.done and not self.skipped_tag and tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if self.skipped_tag:
+            if tag == self.skipped_tag:
+                self.skipped_depth -= 1
+                if not self.skipped_depth:
+                    self.skipped_tag = None
+            return
+        if not self.done and tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.done and not self.skipped_tag:
+            self.parts.append(data)
+
+
+def beautifulsoup_to_text(content, strip_quoted_replies=False):
+    """Converts HTML to text by building the whole tree of the document, keeping all its text
+    :param content: HTML content
+    :param strip_quoted_replies: Not supported by this engine
+    """
+    return BeautifulSoup(content, "html.parser").get_text().strip()
+
+
+def html_parser_to_text(content, strip_quoted_replies=False):
+    """Converts HTML to text by stripping the tags while parsing the document
+    :param content: HTML content
+    :param strip_quoted_replies: Whether the quoted reply chains are dropped
+    """
+    parser = HTMLTextParser(strip_quoted_replies)
+    parser.feed(content)
+    parser.close()
+    return normalize_lines("".join(parser.parts))
+
+
+def lxml_to_text(content, strip_quoted_replies=False):
+    """Converts HTML to text with the C parser of lxml
+    :param content: HTML content
+    :param strip_quoted_replies: Whether the quoted reply chains are dropped
+    """
+    try:
+        root = lxml.html.document_fromstring(content)
+    except (etree.ParserError, ValueError):
+        # Empty documents and documents declaring their encoding are handled by the pure Python parser
+        return html_parser_to_text(content, strip_quoted_replies)
+    etree.strip_elements(root, etree.Comment, *SKIPPED_TAGS, with_tail=False)
+    if strip_quoted_replies:
+        separators = root.xpath(REPLY_SEPARATOR_XPATH)
+        if separators:
+            # Logic to drop everything after the first separator in document order, like the html_parser engine,
+            # which is the following content of the separator and of each of its ancestors
+            element = separators[0]
+            while element.getparent() is not None:
+                parent = element.getparent()
+                for quoted_element in list(element.itersiblings()):
+                    parent.remove(quoted_element)
+                element.tail = None
+                element = parent
+            separators[0].getparent().remove(separators[0])
+        for quote in root.xpath(QUOTE_XPATH):
+            quote.drop_tree()
+    for element in root.iter(*BLOCK_TAGS):
+        element.text = "\n" + (element.text or "")
+        element.tail = "\n" + (element.tail or "")
+    return normalize_lines("".join(root.itertext()))
+
+
+HTML_ENGINES = {
+    "beautifulsoup": beautifulsoup_to_text,
+    "html_parser": html_parser_to_text,
+    "lxml": lxml_to_text,
+}
@@ -14,7 +14,6 @@
 from . import constant
 from .base_indexing_command import BaseIndexingCommand
 from .checkpointing import Checkpoint
-from .connector_queue import ConnectorQueue
 from .sync_microsoft_outlook import SyncMicrosoftOutlook
 
 INCREMENTAL_SYNC_INDEXING = "incremental"
@@ -28,7 +27,7 @@ class IncrementalSyncCommand(BaseIndexingCommand):
         the Microsoft Outlook and pushing them in the shared queue
         :param queue: Shared queue to fetch the stored documents
         """
-        thread_count = self.config.get_value("microsoft_outlook_sync_thread_count")
+        thread_count = self.config.get_value("source_sync_thread_count")
         checkpoint = Checkpoint(self.logger, self.config)
 
         users_accounts = self.get_accounts()
@@ -37,6 +36,7 @@ class IncrementalSyncCommand(BaseIndexingCommand):
             self.logger,
             self.workplace_search_custom_client,
             queue,
+            self.extraction_stage,
         )
 
         # Logic to fetch mails from Microsoft Outlook by using multithreading approach based on saved checkpoint
@@ -98,12 +98,12 @@ class IncrementalSyncCommand(BaseIndexingCommand):
             end_time,
             queue,
         )
+        self.extraction_stage.close()
         self.pass_end_signal(queue)
 
     def execute(self):
         """This function execute the start function."""
 
-        queue = ConnectorQueue(self.logger)
+        queue = self.create_queue()
         self.local_storage.create_local_storage_directory()
-        self.start_producer(queue)
-        self.start_consumer(queue)
+        self.start_producer_and_consumer(queue)
@@ -0,0 +1,143 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module allows to create the accounts of the users concurrently and to skip the broken mailboxes.
+
+    Each account is probed with a GetFolder request on its root folder when it is created. A mailbox
+    failing the probe is kept in a negative cache with an exponential back-off across the runs, so that
+    a mailbox which is broken or has no licence costs one probe per day instead of failed queries for
+    every object type and time range of every run. Only the errors showing that the mailbox itself is
+    broken are cached, a transient error fails the run instead of skipping a healthy mailbox.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from exchangelib.errors import (ErrorAccessDenied, ErrorImpersonateUserDenied,
+                                ErrorMailboxMoveInProgress,
+                                ErrorNonExistentMailbox)
+
+# Seconds before probing again a mailbox which failed the probe once, doubled after each failure
+PROBE_BACKOFF = 3600
+MAX_PROBE_BACKOFF = 86400
+
+# Errors of the probe showing that the mailbox itself can not be fetched, other errors are raised
+MAILBOX_ERRORS = (
+    ErrorNonExistentMailbox,
+    ErrorMailboxMoveInProgress,
+    ErrorAccessDenied,
+    ErrorImpersonateUserDenied,
+)
+
+
+def create_accounts(emails, create_account, thread_count, mailbox_health=None):
+    """Creates the accounts of the users concurrently
+    :param emails: Email addresses of the users
+    :param create_account: Function which creates the account of an email address
+    :param thread_count: Number of accounts created concurrently
+    :param mailbox_health: Object of MailboxHealth to probe the accounts and skip the broken mailboxes
+    Returns:
+        users_accounts: List of user accounts in the order of the email addresses
+    """
+    create = create_account
+    if mailbox_health:
+        emails = [email for email in emails if not mailbox_health.is_skipped(email)]
+        create = functools.partial(mailbox_health.probe, create_account=create_account)
+    with ThreadPoolExecutor(max_workers=thread_count) as executor:
+        users_accounts = [account for account in executor.map(create, emails) if account]
+    if mailbox_health:
+        mailbox_health.save()
+    return users_accounts
+
+
+class MailboxHealth:
+    """This class keeps the mailboxes which failed the probe in a JSON file along with the time after
+    which they are probed again.
+
+    The structure of the file is {'email_address': {'failures': 1, 'retry_after': 1650000000, 'error': '...'}}
+    """
+
+    def __init__(self, logger, mailbox_health_path):
+        self.logger = logger
+        self.mailbox_health_path = mailbox_health_path
+        self.__lock = threading.Lock()
+        self.__failed_mailboxes = {}
+        self.__skipped_mailboxes = set()
+        if os.path.exists(mailbox_health_path) and os.path.getsize(mailbox_health_path) > 0:
+            with open(mailbox_health_path, encoding="utf-8") as mailbox_health_file:
+                try:
+                    self.__failed_mailboxes = json.load(mailbox_health_file)
+                except ValueError as exception:
+                    self.logger.exception(
+                        f"Error while parsing the mailbox health file from path: {mailbox_health_path}. "
+                        f"Error: {exception}"
+                    )
+
+    def is_skipped(self, email):
+        """Returns whether the mailbox failed the probe recently and is skipped in this run
+        :param email: Email address of the mailbox
+        """
+        with self.__lock:
+            failed_mailbox = self.__failed_mailboxes.get(email)
+        if failed_mailbox and failed_mailbox["retry_after"] > time.time():
+            with self.__lock:
+                self.__skipped_mailboxes.add(email)
+            self.logger.info(
+                f"Skipping the mailbox {email} which failed {failed_mailbox['failures']} times. "
+                f"Error: {failed_mailbox['error']}"
+            )
+            return True
+        return False
+
+    def probe(self, email, create_account):
+        """Creates the account of a mailbox and sends a GetFolder request on its root folder
+        :param email: Email address of the mailbox
+        :param create_account: Function which creates the account of an email address
+        Returns:
+            account: Account of the mailbox, or None if the mailbox failed the probe
+        """
+        try:
+            account = create_account(email)
+            # Accessing the root folder sends the GetFolder request
+            account.root
+        except MAILBOX_ERRORS as exception:
+            with self.__lock:
+                self.__skipped_mailboxes.add(email)
+                failures = self.__failed_mailboxes.get(email, {}).get("failures", 0) + 1
+                backoff = min(PROBE_BACKOFF * 2 ** (failures - 1), MAX_PROBE_BACKOFF)
+                self.__failed_mailboxes[email] = {
+                    "failures": failures,
+                    "retry_after": time.time() + backoff,
+                    "error": str(exception),
+                }
+            self.logger.error(
+                f"Mailbox {email} failed the health probe and is skipped for {backoff} seconds. Error: {exception}"
+            )
+            return None
+        with self.__lock:
+            self.__failed_mailboxes.pop(email, None)
+        return account
+
+    def get_skipped_mailboxes(self):
+        """Returns the email addresses of the mailboxes skipped in this run, whose work units are kept for
+        the run in which they pass the probe again
+        """
+        with self.__lock:
+            return set(self.__skipped_mailboxes)
+
+    def save(self):
+        """Writes the failed mailboxes to the mailbox health file"""
+        os.makedirs(os.path.dirname(self.mailbox_health_path), exist_ok=True)
+        with self.__lock:
+            with open(self.mailbox_health_path, "w", encoding="utf-8") as mailbox_health_file:
+                try:
+                    json.dump(self.__failed_mailboxes, mailbox_health_file, indent=4)
+                except ValueError as exception:
+                    self.logger.exception(
+                        f"Error while updating the mailbox health file. Error: {exception}"
+                    )
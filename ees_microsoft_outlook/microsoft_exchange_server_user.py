@@ -15,6 +15,8 @@ from exchangelib import (IMPERSONATION, Account, Configuration, Credentials,
 from exchangelib.protocol import BaseProtocol, NoVerifyHTTPAdapter
 from ldap3 import SAFE_SYNC, Connection, Server
 
+from .mailbox_health import create_accounts
+
 global_dns_name = ""
 global_ssl_certificate_path = ""
 
@@ -81,13 +83,34 @@ class MicrosoftExchangeServerUser:
                 f"Error while fetching users from Exchange Active Directory. Error: {exception}"
             )
 
-    def get_users_accounts(self, users):
+    def create_account(self, email):
+        """Creates the account of a user of exchange server
+        :param email: Email address of the user
+        Returns:
+            user_account: User account
+        """
+        credentials = Credentials(
+            self.config.get_value("microsoft_exchange.username"),
+            self.config.get_value("microsoft_exchange.password"),
+        )
+        config = Configuration(
+            server=self.config.get_value("microsoft_exchange.server"),
+            credentials=credentials,
+            retry_policy=FaultTolerance(max_wait=900),
+        )
+        return Account(
+            primary_smtp_address=email,
+            config=config,
+            access_type=IMPERSONATION,
+        )
+
+    def get_users_accounts(self, users, mailbox_health=None):
         """Fetch user account from exchange server
         :param users: Fetch users from Exchange Active Directory
+        :param mailbox_health: Object of MailboxHealth to probe the accounts and skip the broken mailboxes
         Returns:
             users_accounts: List of all user accounts
         """
-        users_accounts = []
         try:
             # Logic to establish secure connection when SSL is enabled into exchange server host name
             if self.config.get_value("microsoft_exchange.secure_connection"):
@@ -100,24 +123,16 @@ class MicrosoftExchangeServerUser:
                 BaseProtocol.HTTP_ADAPTER_CLS = RootCAAdapter
             else:
                 BaseProtocol.HTTP_ADAPTER_CLS = NoVerifyHTTPAdapter
-            for user in users:
-                if "searchResRef" not in user["type"]:
-                    credentials = Credentials(
-                        self.config.get_value("microsoft_exchange.username"),
-                        self.config.get_value("microsoft_exchange.password"),
-                    )
-                    config = Configuration(
-                        server=self.config.get_value("microsoft_exchange.server"),
-                        credentials=credentials,
-                        retry_policy=FaultTolerance(max_wait=900),
-                    )
-                    user_account = Account(
-                        primary_smtp_address=user["attributes"]["mail"],
-                        config=config,
-                        access_type=IMPERSONATION,
-                    )
-                    users_accounts.append(user_account)
-            return users_accounts
+            return create_accounts(
+                [
+                    user["attributes"]["mail"]
+                    for user in users
+                    if "searchResRef" not in user["type"]
+                ],
+                self.create_account,
+                self.config.get_value("source_sync_thread_count"),
+                mailbox_health,
+            )
         except Exception as exception:
             raise Exception(
                 f"Error while fetching users account from exchange server. Error: {exception}"
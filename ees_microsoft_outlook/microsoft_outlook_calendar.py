@@ -8,64 +8,114 @@
 import requests
 
 from . import constant
+from .deduplication import deduplication_unit
+from .document_builder import compile_document_builder
+from .document_record import DocumentRecord
 from .utils import (change_datetime_format, convert_datetime_to_ews_format,
-                    extract, get_schema_fields, html_to_text,
-                    insert_document_into_doc_id_storage, retry)
+                    extract, html_to_text, insert_document_into_doc_id_storage)
+
+# Child calendars whose events are birthdays
+BIRTHDAY_CALENDARS = ("Folder (Birthdays)", "Birthdays (Birthdays)")
+
+# Templates of the descriptions of the calendar events, whose lines are indented like the documents indexed so far
+EVENT_DESCRIPTION = ("\n" + " " * 16).join(
+    (
+        "",
+        "Start Date: {start}",
+        "End Date: {end}",
+        "Location: {location}",
+        "Organizer: {organizer}",
+        "Meeting Type: {event_type}",
+        "Attendee List: {attendees}",
+        "Description: {body}",
+    )
+)
+BIRTHDAY_DESCRIPTION = ("\n" + " " * 16).join(
+    ("", "Date: {date}", "Organizer: {organizer}\n Meeting Type: {event_type}\n")
+)
 
 
 class MicrosoftOutlookCalendar:
     """This class fetches Calendar Events for all users from Microsoft Outlook"""
 
-    def __init__(self, logger, config):
+    def __init__(self, logger, config, extraction_stage=None, meeting_deduplicator=None):
         self.logger = logger
         self.config = config
-        self.time_zone = constant.DEFAULT_TIME_ZONE
+        self.extraction_stage = extraction_stage
+        self.meeting_dedup = self.config.get_value("enable_meeting_dedup")
+        self.meeting_deduplicator = meeting_deduplicator
+        self.permission = self.config.get_value("enable_document_permission")
+        self.platform = self.config.get_value("connector_platform_type")
+        self.build_document = compile_document_builder(config, constant.CALENDARS_OBJECT.lower())
         self.retry_count = self.config.get_value("retry_count")
+        self.html_engine = self.config.get_value("html_to_text.engine")
+        self.strip_quoted_replies = self.config.get_value("html_to_text.strip_quoted_replies")
+
+    def get_calendar_id(self, calendar_obj):
+        """Returns the id of the document of a calendar event, which is the iCalendar UID of a meeting in the dedup
+        mode so that the copies of the meeting in the calendars of its attendees are indexed as one document
+        :param calendar_obj: Object of calendar event
+        """
+        # The occurrences and the exceptions of a recurring meeting share the UID of the series
+        if self.meeting_dedup and calendar_obj.uid and calendar_obj.type in ("Single", "RecurringMaster"):
+            return calendar_obj.uid
+        return calendar_obj.id
 
     def get_calendar_attachments(
-        self, ids_list_calendars, calendar_obj, user_email_address, start_time, end_time
+        self, ids_list_calendars, calendar_obj, user_email_address, time_zone, start_time, end_time, calendar_id=None
     ):
         """Method is used to fetches attachments from calendar object
         :param ids_list_calendars: Documents ids of calendar
         :param calendar_obj: Object of account
         :param user_email_address: Email address of user
+        :param time_zone: Time zone of the mailbox of the user
         :param start_time: Start time for fetching the calendar events
         :param end_time: End time for fetching the calendar events
+        :param calendar_id: Id of the document of the calendar event
         Returns:
             calendar_attachments: Dictionary of calendar attachments
         """
+        calendar_id = calendar_id or calendar_obj.id
         calendar_attachments = []
-        for attachment in calendar_obj.attachments:
+        for position, attachment in enumerate(calendar_obj.attachments):
 
             # Logic for calendar last modified time
             attachment_created = ""
             if attachment.last_modified_time:
                 attachment_created = change_datetime_format(
-                    attachment.last_modified_time, self.time_zone
+                    attachment.last_modified_time, time_zone
                 )
 
             # Logic to fetch calendar events attachments
             if attachment.last_modified_time >= start_time and attachment.last_modified_time < end_time:
-                attachments = {
-                    "type": constant.CALENDAR_ATTACHMENTS_OBJECT,
-                    "id": attachment.attachment_id.id,
-                    "title": attachment.name,
-                    "created": attachment_created,
-                }
-                attachments["_allow_permissions"] = []
-                if self.config.get_value("enable_document_permission"):
-                    attachments["_allow_permissions"] = [user_email_address]
+                # The attachments of the copies of a meeting have different ids, so their position is used in the dedup mode
+                attachment_id = attachment.attachment_id.id
+                if calendar_id != calendar_obj.id:
+                    attachment_id = f"{calendar_id}/{position}"
+                attachments = DocumentRecord(
+                    type=constant.CALENDAR_ATTACHMENTS_OBJECT,
+                    id=attachment_id,
+                    title=attachment.name,
+                    created=attachment_created,
+                    permissions=[user_email_address] if self.permission else [],
+                )
 
                 # Logic to insert calendar attachment into global_keys object
                 insert_document_into_doc_id_storage(
                     ids_list_calendars,
-                    attachment.attachment_id.id,
-                    calendar_obj.id,
+                    attachment_id,
+                    calendar_id,
                     constant.CALENDAR_ATTACHMENTS_OBJECT.lower(),
-                    self.config.get_value("connector_platform_type"),
+                    self.platform,
                 )
                 if hasattr(attachment, "content"):
-                    attachments["body"] = extract(attachment.content)
+                    # Logic to extract the attachment on the extraction stage, if any, without waiting
+                    if self.extraction_stage:
+                        attachments.body = self.extraction_stage.submit_attachment(
+                            attachment, constant.CALENDARS_OBJECT.lower()
+                        )
+                    else:
+                        attachments.body = extract(attachment.content)
                 calendar_attachments.append(attachments)
 
         return calendar_attachments
@@ -75,6 +125,7 @@ class MicrosoftOutlookCalendar:
         ids_list_calendars,
         calendar_obj,
         user_email_address,
+        time_zone,
         start_time,
         end_time,
         child_calendar,
@@ -83,6 +134,7 @@ class MicrosoftOutlookCalendar:
         :param ids_list_calendars: Documents ids of calendar
         :param calendar_obj: Object of account
         :param user_email_address: Email address of user
+        :param time_zone: Time zone of the mailbox of the user
         :param start_time: Start time for fetching the calendar events
         :param end_time: End time for fetching the calendar events
         :param child_calendar: Type of child calendar
@@ -110,39 +162,39 @@ class MicrosoftOutlookCalendar:
         # Logic for calendar last modified time
         if calendar_obj.last_modified_time:
             calendar_created = change_datetime_format(
-                calendar_obj.last_modified_time, self.time_zone
+                calendar_obj.last_modified_time, time_zone
             )
         else:
             calendar_created = ""
 
         # Logic to create document body
+        calendar_id = self.get_calendar_id(calendar_obj)
         calendar_document = {
             "type": constant.CALENDARS_OBJECT,
-            "Id": calendar_obj.id,
+            "Id": calendar_id,
             "DisplayName": calendar_obj.subject,
             "Created": calendar_created,
         }
 
         # Logic for Birthday Calendar Events
-        if child_calendar in ["Folder (Birthdays)", "Birthdays (Birthdays)"]:
-            calendar_document[
-                "Description"
-            ] = f"""
-                Date: {(change_datetime_format(calendar_obj.start, self.time_zone)).split('T', 1)[0]}
-                Organizer: {calendar_obj.organizer.email_address}\n Meeting Type: {event_type}\n"""
+        if child_calendar in BIRTHDAY_CALENDARS:
+            calendar_document["Description"] = BIRTHDAY_DESCRIPTION.format(
+                date=change_datetime_format(calendar_obj.start, time_zone).split("T", 1)[0],
+                organizer=calendar_obj.organizer.email_address,
+                event_type=event_type,
+            )
 
         # Logic for Other Calendar Events
         else:
-            calendar_document[
-                "Description"
-            ] = f"""
-                Start Date: {change_datetime_format(calendar_obj.start, self.time_zone)}
-                End Date: {change_datetime_format(calendar_obj.end, self.time_zone)}
-                Location: {calendar_obj.location}
-                Organizer: {calendar_obj.organizer.email_address}
-                Meeting Type: {event_type}
-                Attendee List: {attendees}
-                Description: {html_to_text(calendar_obj.body)}"""
+            calendar_document["Description"] = EVENT_DESCRIPTION.format(
+                start=change_datetime_format(calendar_obj.start, time_zone),
+                end=change_datetime_format(calendar_obj.end, time_zone),
+                location=calendar_obj.location,
+                organizer=calendar_obj.organizer.email_address,
+                event_type=event_type,
+                attendees=attendees,
+                body=html_to_text(calendar_obj.body, self.html_engine, self.strip_quoted_replies),
+            )
 
         # Logic to fetches attachments
         calendar_attachments_documents = []
@@ -151,36 +203,59 @@ class MicrosoftOutlookCalendar:
                 ids_list_calendars,
                 calendar_obj,
                 user_email_address,
+                time_zone,
                 start_time,
                 end_time,
+                calendar_id,
             )
 
         return calendar_document, calendar_attachments_documents
 
-    @retry(exception_list=(requests.exceptions.RequestException,))
-    def get_calendar(self, ids_list_calendars, accounts, start_time, end_time):
-        """This method is used to get documents of calendar and mapped with Workplace Search fields
+    def get_calendar_folders(self, account):
+        """This method is used to get the calendar folders of an account, i.e. the main calendar and its
+        children, each of them being fetched by a separate work unit
+        :param account: User account object
+        Returns:
+            folders: Dictionary of the key of the folder, which is calendar for the main calendar and the
+                id of the folder for the child calendars, and the folder object
+        """
+        folders = {"calendar": account.calendar}
+        try:
+            for child_calendar in account.calendar.children:
+                folders[child_calendar.id] = child_calendar
+        except Exception as exception:
+            self.logger.info(
+                f"Error while fetching calendar folders for {account.primary_smtp_address}. Error: {exception}"
+            )
+        return folders
+
+    def get_folder_calendar(
+        self, ids_list_calendars, account, folder, start_time, end_time
+    ):
+        """This method is used to get documents of calendar events of a single calendar folder of an account.
+        The folder is the unit of retry, so a transient error raised from here only refetches that folder
         :param ids_list_calendars: List of ids of documents
-        param accounts: List of user accounts
+        :param account: User account object
+        :param folder: Main calendar or child calendar folder object
         :param start_time: Start time for fetching the calendar events
         :param end_time: End time for fetching the calendar events
         Returns:
-            documents: Documents with all calendar events
+            documents: Documents with calendar events of the folder
         """
         documents = []
         start_time = convert_datetime_to_ews_format(start_time)
         end_time = convert_datetime_to_ews_format(end_time)
-        calendar_schema = get_schema_fields(
-            constant.CALENDARS_OBJECT.lower(), self.config.get_value("objects")
-        )
-        for account in accounts:
+        # Birthday events of the child calendars are described differently
+        child_calendar = "" if folder is account.calendar else str(folder)
 
-            # Logic to set time zone according to user account
-            self.time_zone = account.default_timezone
+        # Logic to set time zone according to user account
+        time_zone = account.default_timezone
 
-            try:
+        try:
+            # Logic to release the meetings claimed by the folder if it fails, as its documents are not queued
+            with deduplication_unit(self.meeting_deduplicator):
                 # Logic to fetch Calendar Events
-                for calendar in account.calendar.filter(
+                for calendar in folder.filter(
                     last_modified_time__gt=start_time,
                     last_modified_time__lt=end_time,
                 ).only(
@@ -196,93 +271,51 @@ class MicrosoftOutlookCalendar:
                     "body",
                     "has_attachments",
                     "attachments",
+                    "uid",
                 ):
+                    calendar_id = self.get_calendar_id(calendar)
+
+                    # Logic to convert only the first copy of a meeting present in the calendars of several attendees
+                    deduplicated = bool(self.meeting_deduplicator) and calendar_id != calendar.id
+                    if deduplicated and not self.meeting_deduplicator.claim(calendar_id, account.primary_smtp_address):
+                        continue
 
                     # Logic to insert calendar into global_keys object
                     insert_document_into_doc_id_storage(
                         ids_list_calendars,
-                        calendar.id,
+                        calendar_id,
                         "",
                         constant.CALENDARS_OBJECT.lower(),
-                        self.config.get_value("connector_platform_type"),
-                    )
-                    (calendar_obj, calendar_attachment,) = self.calendar_to_docs(
-                        ids_list_calendars,
-                        calendar,
-                        account.primary_smtp_address,
-                        start_time,
-                        end_time,
-                        str(calendar),
+                        self.platform,
                     )
-                    calendar_map = {}
-                    calendar_map["_allow_permissions"] = []
-                    if self.config.get_value("enable_document_permission"):
-                        calendar_map["_allow_permissions"] = [
-                            account.primary_smtp_address
-                        ]
-                    calendar_map["type"] = calendar_obj["type"]
-                    for ws_field, ms_fields in calendar_schema.items():
-                        calendar_map[ws_field] = calendar_obj[ms_fields]
-                    documents.append(calendar_map)
-                    if calendar_attachment:
-                        documents.extend(calendar_attachment)
-
-                # Logic to fetch Custom Calendar Events
-                for child_calendar in account.calendar.children:
-                    for calendar in child_calendar.filter(
-                        last_modified_time__gt=start_time,
-                        last_modified_time__lt=end_time,
-                    ).only(
-                        "required_attendees",
-                        "type",
-                        "recurrence",
-                        "last_modified_time",
-                        "subject",
-                        "start",
-                        "end",
-                        "location",
-                        "organizer",
-                        "body",
-                        "has_attachments",
-                        "attachments",
-                    ):
-
-                        # Logic to insert calendar into global_keys object
-                        insert_document_into_doc_id_storage(
-                            ids_list_calendars,
-                            calendar.id,
-                            "",
-                            constant.CALENDARS_OBJECT.lower(),
-                            self.config.get_value("connector_platform_type"),
-                        )
+                    try:
                         (calendar_obj, calendar_attachment,) = self.calendar_to_docs(
                             ids_list_calendars,
                             calendar,
                             account.primary_smtp_address,
+                            time_zone,
                             start_time,
                             end_time,
-                            str(child_calendar),
+                            child_calendar,
                         )
-                        calendar_map = {}
-                        calendar_map["_allow_permissions"] = []
-                        if self.config.get_value("enable_document_permission"):
-                            calendar_map["_allow_permissions"] = [
-                                account.primary_smtp_address
-                            ]
-                        calendar_map["type"] = calendar_obj["type"]
-                        for ws_field, ms_fields in calendar_schema.items():
-                            calendar_map[ws_field] = calendar_obj[ms_fields]
-                        documents.append(calendar_map)
-                        if calendar_attachment:
-                            documents.extend(calendar_attachment)
-            except requests.exceptions.RequestException as request_error:
-                raise requests.exceptions.RequestException(
-                    f"Error while fetching calendar data for {account.primary_smtp_address}. Error: {request_error}"
-                )
-            except Exception as exception:
-                self.logger.info(
-                    f"Error while fetching calendar data for {account.primary_smtp_address}. Error: {exception}"
-                )
-                pass
+                        calendar_map = self.build_document(calendar_obj, account.primary_smtp_address)
+                    except Exception:
+                        if deduplicated:
+                            self.meeting_deduplicator.release(calendar_id)
+                        raise
+                    if deduplicated:
+                        # Logic to index the meeting again at the end of the run if the calendars of other attendees hold it
+                        self.meeting_deduplicator.keep(calendar_id, [calendar_map] + calendar_attachment)
+                    documents.append(calendar_map)
+                    if calendar_attachment:
+                        documents.extend(calendar_attachment)
+        except requests.exceptions.RequestException as request_error:
+            raise requests.exceptions.RequestException(
+                f"Error while fetching calendar data for {account.primary_smtp_address}. Error: {request_error}"
+            )
+        except Exception as exception:
+            self.logger.info(
+                f"Error while fetching calendar data for {account.primary_smtp_address}. Error: {exception}"
+            )
 
         return documents
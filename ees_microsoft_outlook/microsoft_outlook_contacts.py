@@ -7,15 +7,13 @@
 """
 import exchangelib
 import requests
-from iteration_utilities import unique_everseen
 
 from . import constant
+from .document_builder import compile_document_builder
 from .utils import (
     change_datetime_format,
     convert_datetime_to_ews_format,
-    get_schema_fields,
     insert_document_into_doc_id_storage,
-    retry,
 )
 
 # Default Birth Year in Outlook set to 1604 if user not specified Birth Year
@@ -28,12 +26,16 @@ class MicrosoftOutlookContacts:
     def __init__(self, logger, config):
         self.logger = logger
         self.config = config
-        self.time_zone = constant.DEFAULT_TIME_ZONE
         self.retry_count = self.config.get_value("retry_count")
+        self.platform = self.config.get_value("connector_platform_type")
+        self.build_document = compile_document_builder(
+            config, constant.CONTACTS_OBJECT.lower(), constant.CONTACTS_OBJECT
+        )
 
-    def convert_contacts_to_workplace_search_documents(self, contact_obj):
+    def convert_contacts_to_workplace_search_documents(self, contact_obj, time_zone):
         """Method is used to convert contact data into Workplace Search document
         :param contact_obj: Object of contact
+        :param time_zone: Time zone of the mailbox of the user
         Returns:
             contact_document: Dictionary of contact
         """
@@ -58,7 +60,7 @@ class MicrosoftOutlookContacts:
         contact_created = ""
         if contact_obj.last_modified_time:
             contact_created = change_datetime_format(
-                contact_obj.last_modified_time, self.time_zone
+                contact_obj.last_modified_time, time_zone
             )
 
         # Logic to remove year from birthdate if birth year is kept empty by the user
@@ -78,75 +80,64 @@ class MicrosoftOutlookContacts:
         }
         return contact_document
 
-    @retry(exception_list=(requests.exceptions.RequestException,))
-    def get_contacts(self, ids_list_contacts, accounts, start_time, end_time):
-        """This method is used to fetches contacts from the Microsoft Outlook
-        :param ids_list_contacts: List of documents which is already fetched
-        :param accounts: List of user accounts
+    def get_account_contacts(
+        self, ids_list_contacts, account, start_time, end_time
+    ):
+        """This method is used to get documents of contacts of a single account. The
+        mailbox is the unit of retry, so a transient error raised from here only refetches that mailbox
+        :param ids_list_contacts: List of ids of documents
+        :param account: User account object
         :param start_time: Start time for fetching the contacts
         :param end_time: End time for fetching the contacts
         Returns:
-            documents: List of contact documents
+            documents: List of contacts documents of the account
         """
         documents = []
         start_time = convert_datetime_to_ews_format(start_time)
         end_time = convert_datetime_to_ews_format(end_time)
-        contact_schema = get_schema_fields(
-            constant.CONTACTS_OBJECT.lower(), self.config.get_value("objects")
-        )
-        for account in accounts:
-
-            # Logic to set time zone according to user account
-            self.time_zone = account.default_timezone
 
-            try:
-                # Logic to fetch contacts
-                folder = account.root / "Top of Information Store" / "Contacts"
-                for contact in (
-                    folder.all()
-                    .filter(
-                        last_modified_time__gt=start_time,
-                        last_modified_time__lt=end_time,
-                    )
-                    .only(
-                        "email_addresses",
-                        "phone_numbers",
-                        "last_modified_time",
-                        "display_name",
-                        "company_name",
-                        "birthday",
-                    )
-                ):
-                    if isinstance(contact, exchangelib.items.contact.Contact):
+        # Logic to set time zone according to user account
+        time_zone = account.default_timezone
 
-                        # Logic to insert contact into global_keys object
-                        insert_document_into_doc_id_storage(
-                            ids_list_contacts,
-                            contact.id,
-                            "",
-                            constant.CONTACTS_OBJECT.lower(),
-                            self.config.get_value("connector_platform_type"),
-                        )
-                        contact_obj = (
-                            self.convert_contacts_to_workplace_search_documents(contact)
-                        )
-                        contact_map = {}
-                        contact_map["_allow_permissions"] = []
-                        if self.config.get_value("enable_document_permission"):
-                            contact_map["_allow_permissions"] = [
-                                account.primary_smtp_address
-                            ]
-                        contact_map["type"] = constant.CONTACTS_OBJECT
-                        for ws_field, ms_field in contact_schema.items():
-                            contact_map[ws_field] = contact_obj[ms_field]
-                        documents.append(contact_map)
-            except requests.exceptions.RequestException as request_error:
-                raise requests.exceptions.RequestException(
-                    f"Error while fetching contacts data for {account.primary_smtp_address}. Error: {request_error}"
+        try:
+            # Logic to fetch contacts
+            folder = account.root / "Top of Information Store" / "Contacts"
+            for contact in (
+                folder.all()
+                .filter(
+                    last_modified_time__gt=start_time,
+                    last_modified_time__lt=end_time,
                 )
-            except Exception as exception:
-                self.logger.info(
-                    f"Error while fetching contacts data for {account.primary_smtp_address}. Error: {exception}"
+                .only(
+                    "email_addresses",
+                    "phone_numbers",
+                    "last_modified_time",
+                    "display_name",
+                    "company_name",
+                    "birthday",
                 )
-                pass
-        return list(unique_everseen(documents))
+            ):
+                if isinstance(contact, exchangelib.items.contact.Contact):
+
+                    # Logic to insert contact into global_keys object
+                    insert_document_into_doc_id_storage(
+                        ids_list_contacts,
+                        contact.id,
+                        "",
+                        constant.CONTACTS_OBJECT.lower(),
+                        self.platform,
+                    )
+                    contact_obj = (
+                        self.convert_contacts_to_workplace_search_documents(contact, time_zone)
+                    )
+                    documents.append(self.build_document(contact_obj, account.primary_smtp_address))
+        except requests.exceptions.RequestException as request_error:
+            raise requests.exceptions.RequestException(
+                f"Error while fetching contacts data for {account.primary_smtp_address}. Error: {request_error}"
+            )
+        except Exception as exception:
+            self.logger.info(
+                f"Error while fetching contacts data for {account.primary_smtp_address}. Error: {exception}"
+            )
+            pass
+        return documents
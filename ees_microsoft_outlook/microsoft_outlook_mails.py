@@ -7,73 +7,179 @@
 """
 
 import requests
-from iteration_utilities import unique_everseen
 
 from . import constant
+from .deduplication import deduplication_unit
+from .document_builder import compile_document_builder
+from .document_record import DocumentRecord
+from .ews_fast_path import EWSFastPath
+from .extraction_cache import get_content_digest
 from .utils import (
     change_datetime_format,
     convert_datetime_to_ews_format,
     extract,
-    get_schema_fields,
     html_to_text,
     insert_document_into_doc_id_storage,
-    retry,
+)
+
+MAIL_TYPES = [
+    {
+        "folder": "inbox",
+        "constant": constant.INBOX_MAIL_OBJECT,
+    },
+    {
+        "folder": "sent",
+        "constant": constant.SENT_MAIL_OBJECT,
+    },
+    {
+        "folder": "junk",
+        "constant": constant.JUNK_MAIL_OBJECT,
+    },
+    {
+        "folder": "archive",
+        "constant": constant.ARCHIVE_MAIL_OBJECT,
+    },
+]
+
+# Template of the description of the mails, whose lines are indented like the documents indexed so far
+MAIL_DESCRIPTION = ("\n" + " " * 28).join(
+    (
+        "Sender Email: {sender_email}",
+        "Receiver Email: {receiver_email}",
+        "CC: {cc}",
+        "BCC: {bcc}",
+        "Importance: {importance}",
+        "Category: {categories}",
+        "Body: {body}",
+    )
 )
 
 
 class MicrosoftOutlookMails:
     """This class fetches mails for all users from Microsoft Outlook"""
 
-    def __init__(self, logger, config):
+    def __init__(
+        self, logger, config, extraction_stage=None, message_deduplicator=None, attachment_deduplicator=None
+    ):
         self.logger = logger
         self.config = config
-        self.time_zone = constant.DEFAULT_TIME_ZONE
+        self.extraction_stage = extraction_stage
+        self.message_dedup = self.config.get_value("enable_message_dedup")
+        self.message_deduplicator = message_deduplicator
+        self.attachment_dedup = self.config.get_value("enable_attachment_dedup")
+        self.attachment_deduplicator = attachment_deduplicator
+        self.permission = self.config.get_value("enable_document_permission")
+        self.platform = self.config.get_value("connector_platform_type")
+        self.build_document = compile_document_builder(config, constant.MAILS_OBJECT.lower())
         self.retry_count = self.config.get_value("retry_count")
+        self.html_engine = self.config.get_value("html_to_text.engine")
+        self.strip_quoted_replies = self.config.get_value("html_to_text.strip_quoted_replies")
+        self.ews_fast_path = None
+        if self.config.get_value("enable_ews_fast_path"):
+            self.ews_fast_path = EWSFastPath(logger)
+
+    def get_mail_id(self, mail_obj):
+        """Returns the id of the document of a mail, which is its internet message id in the dedup mode so that
+        the copies of the mail in several mailboxes are indexed as one document
+        :param mail_obj: Object of mail
+        """
+        if self.message_dedup and mail_obj.message_id:
+            return mail_obj.message_id
+        return mail_obj.id
+
+    def get_attachment_digest(self, attachment):
+        """Returns the digest of the content of an attachment, which is the id of its document in the attachment
+        dedup mode, along with its content if it was downloaded
+        :param attachment: Attachment object
+        """
+        if self.extraction_stage:
+            return self.extraction_stage.get_attachment_digest(attachment, constant.MAILS_OBJECT.lower())
+        content = attachment.content
+        if content is None:
+            return None, None
+        return get_content_digest(content), content
 
     def get_mail_attachments(
-        self, ids_list_mails, mail_obj, user_email_address, start_time, end_time
+        self, ids_list_mails, mail_obj, user_email_address, time_zone, start_time, end_time, mail_id=None
     ):
         """Method is used to fetch attachment from mail object store in dictionary
         :param ids_list_mails: Documents ids of mails
         :param mail_obj: Object of account
         :param user_email_address: Email address of user
+        :param time_zone: Time zone of the mailbox of the user
         :param start_time: Start time for fetching the mails
         :param end_time: End time for fetching the mails
+        :param mail_id: Id of the document of the mail
         Returns:
             mail_attachments: Dictionary of attachment
         """
+        mail_id = mail_id or mail_obj.id
         mail_attachments = []
-        for attachment in mail_obj.attachments:
+        for position, attachment in enumerate(mail_obj.attachments):
 
             # Logic for mail attachment last modified time
             attachment_created = ""
             if attachment.last_modified_time:
                 attachment_created = change_datetime_format(
-                    attachment.last_modified_time, self.time_zone
+                    attachment.last_modified_time, time_zone
                 )
 
             # Logic to fetch mail attachments
             if attachment.last_modified_time >= start_time and attachment.last_modified_time < end_time:
-                attachments = {
-                    "type": constant.MAILS_ATTACHMENTS_OBJECT,
-                    "id": attachment.attachment_id.id,
-                    "title": attachment.name,
-                    "created": attachment_created,
-                }
-                attachments["_allow_permissions"] = []
-                if self.config.get_value("enable_document_permission"):
-                    attachments["_allow_permissions"] = [user_email_address]
+                # The attachments of the copies of a mail have different ids, so their position is used in the dedup mode
+                attachment_id = attachment.attachment_id.id
+                if mail_id != mail_obj.id:
+                    attachment_id = f"{mail_id}/{position}"
+
+                # Logic to key the attachment on its content, so that the same content held by several items is one document
+                content = digest = None
+                if self.attachment_dedup and hasattr(attachment, "content"):
+                    digest, content = self.get_attachment_digest(attachment)
+                if digest:
+                    attachment_id = digest
+                deduplicated = bool(self.attachment_deduplicator) and digest is not None
+                if deduplicated and mail_id != mail_obj.id:
+                    # Logic to give the attachment the mailboxes of the copies of the mail which are not converted
+                    self.attachment_deduplicator.add_holder(digest, mail_id)
+                if deduplicated and not self.attachment_deduplicator.claim(digest, user_email_address):
+                    # Logic to track the item as a holder of the attachment which is indexed once
+                    insert_document_into_doc_id_storage(
+                        ids_list_mails,
+                        attachment_id,
+                        mail_id,
+                        constant.MAILS_ATTACHMENTS_OBJECT.lower(),
+                        self.platform,
+                    )
+                    if self.extraction_stage:
+                        self.extraction_stage.release_content(content)
+                    continue
+                attachments = DocumentRecord(
+                    type=constant.MAILS_ATTACHMENTS_OBJECT,
+                    id=attachment_id,
+                    title=attachment.name,
+                    created=attachment_created,
+                    permissions=[user_email_address] if self.permission else [],
+                )
 
                 # Logic to insert mail attachment into global_keys object
                 insert_document_into_doc_id_storage(
                     ids_list_mails,
-                    attachment.attachment_id.id,
-                    mail_obj.id,
+                    attachment_id,
+                    mail_id,
                     constant.MAILS_ATTACHMENTS_OBJECT.lower(),
-                    self.config.get_value("connector_platform_type"),
+                    self.platform,
                 )
                 if hasattr(attachment, "content"):
-                    attachments["body"] = extract(attachment.content)
+                    # Logic to extract the attachment on the extraction stage, if any, without waiting
+                    if self.extraction_stage:
+                        attachments.body = self.extraction_stage.submit_attachment(
+                            attachment, constant.MAILS_OBJECT.lower(), content, digest
+                        )
+                    else:
+                        attachments.body = extract(attachment.content if content is None else content)
+                if deduplicated:
+                    # Logic to index the attachment again at the end of the run if other mailboxes hold it
+                    self.attachment_deduplicator.keep(digest, [attachments])
                 mail_attachments.append(attachments)
 
         return mail_attachments
@@ -84,6 +190,7 @@ class MicrosoftOutlookMails:
         mail_type,
         mail_obj,
         user_email_address,
+        time_zone,
         start_time,
         end_time,
     ):
@@ -92,6 +199,7 @@ class MicrosoftOutlookMails:
         :param mail_type: Type of the mail like inbox, sent, junk
         :param mail_obj: Object of account
         :param user_email_address: Email address of user
+        :param time_zone: Time zone of the mailbox of the user
         :param start_time: Start time for fetching the mails
         :param end_time: End time for fetching the mails
         Returns:
@@ -135,7 +243,7 @@ class MicrosoftOutlookMails:
         # Logic for mail last modified time
         if mail_obj.last_modified_time:
             mail_created = change_datetime_format(
-                mail_obj.last_modified_time, self.time_zone
+                mail_obj.last_modified_time, time_zone
             )
         else:
             mail_created = ""
@@ -150,17 +258,20 @@ class MicrosoftOutlookMails:
             mail_categories = ""
 
         # Logic to create document body
+        mail_id = self.get_mail_id(mail_obj)
         mail_document = {
             "type": mail_type,
-            "Id": mail_obj.id,
+            "Id": mail_id,
             "DisplayName": mail_obj.subject,
-            "Description": f"""Sender Email: {sender_email}
-                            Receiver Email: {receiver_email}
-                            CC: {cc}
-                            BCC: {bcc}
-                            Importance: {mail_obj.importance}
-                            Category: {mail_categories}
-                            Body: {html_to_text(mail_obj.body)}""",
+            "Description": MAIL_DESCRIPTION.format(
+                sender_email=sender_email,
+                receiver_email=receiver_email,
+                cc=cc,
+                bcc=bcc,
+                importance=mail_obj.importance,
+                categories=mail_categories,
+                body=html_to_text(mail_obj.body, self.html_engine, self.strip_quoted_replies),
+            ),
             "Created": mail_created,
         }
 
@@ -168,7 +279,7 @@ class MicrosoftOutlookMails:
         mail_attachments_documents = []
         if mail_obj.has_attachments:
             mail_attachments_documents = self.get_mail_attachments(
-                ids_list_mails, mail_obj, user_email_address, start_time, end_time
+                ids_list_mails, mail_obj, user_email_address, time_zone, start_time, end_time, mail_id
             )
 
         return mail_document, mail_attachments_documents
@@ -187,126 +298,127 @@ class MicrosoftOutlookMails:
             documents: List of documents
         """
         documents = []
-        mail_schema = get_schema_fields(
-            constant.MAILS_OBJECT.lower(), self.config.get_value("objects")
-        )
+
+        # Logic to set time zone according to user account
+        time_zone = account.default_timezone
+
         for mail_obj in mail_objs:
+            mail_id = self.get_mail_id(mail_obj)
+
+            # Logic to convert only the first copy of a mail present in several mailboxes
+            deduplicated = bool(self.message_deduplicator) and mail_id != mail_obj.id
+            if deduplicated and not self.message_deduplicator.claim(mail_id, account.primary_smtp_address):
+                continue
 
             # Logic to insert mail into global_keys object
             insert_document_into_doc_id_storage(
                 ids_list_mails,
-                mail_obj.id,
+                mail_id,
                 "",
                 mail_type.lower(),
-                self.config.get_value("connector_platform_type"),
-            )
-            (
-                mail_dict,
-                mail_attachment,
-            ) = self.mails_to_docs(
-                ids_list_mails,
-                mail_type,
-                mail_obj,
-                account.primary_smtp_address,
-                start_time,
-                end_time,
+                self.platform,
             )
-            mail_map = {}
-            mail_map["_allow_permissions"] = []
-            if self.config.get_value("enable_document_permission"):
-                mail_map["_allow_permissions"] = [account.primary_smtp_address]
-            mail_map["type"] = mail_dict["type"]
-            for ws_field, ms_fields in mail_schema.items():
-                mail_map[ws_field] = mail_dict[ms_fields]
+            try:
+                (
+                    mail_dict,
+                    mail_attachment,
+                ) = self.mails_to_docs(
+                    ids_list_mails,
+                    mail_type,
+                    mail_obj,
+                    account.primary_smtp_address,
+                    time_zone,
+                    start_time,
+                    end_time,
+                )
+                mail_map = self.build_document(mail_dict, account.primary_smtp_address)
+            except Exception:
+                if deduplicated:
+                    self.message_deduplicator.release(mail_id)
+                raise
+            if deduplicated:
+                # Logic to index the mail again at the end of the run if other mailboxes hold it, along with the
+                # attachments which are not indexed with the mailboxes of their own content
+                mail_documents = [mail_map]
+                for attachment in mail_attachment:
+                    if not (self.attachment_deduplicator and self.attachment_deduplicator.is_kept(attachment["id"])):
+                        mail_documents.append(attachment)
+                self.message_deduplicator.keep(mail_id, mail_documents)
             documents.append(mail_map)
             if mail_attachment:
                 documents.extend(mail_attachment)
         return documents
 
-    @retry(exception_list=(requests.exceptions.RequestException,))
-    def get_mails(self, ids_list_mails, accounts, start_time, end_time):
-        """This method is used to get documents of mails and mapped with Workplace Search fields
+    def get_folder_mails(
+        self, ids_list_mails, account, mail_type, start_time, end_time
+    ):
+        """This method is used to get documents of mails of a single folder of an account. The
+        folder of a mailbox is the unit of retry, so a transient error raised from here only refetches that folder
         :param ids_list_mails: List of ids of documents
-        :param accounts: List of user accounts
+        :param account: User account object
+        :param mail_type: Dictionary of the folder and the type of the mails like inbox, sent, junk
         :param start_time: Start time for fetching the mails
         :param end_time: End time for fetching the mails
         Returns:
-            documents: List of all types of mail documents
+            documents: List of mail documents of the folder
         """
-        documents = []
-        mail_type = [
-            {
-                "folder": "inbox",
-                "constant": constant.INBOX_MAIL_OBJECT,
-            },
-            {
-                "folder": "sent",
-                "constant": constant.SENT_MAIL_OBJECT,
-            },
-            {
-                "folder": "junk",
-                "constant": constant.JUNK_MAIL_OBJECT,
-            },
-            {
-                "folder": "archive",
-                "constant": constant.ARCHIVE_MAIL_OBJECT,
-            },
-        ]
         start_time = convert_datetime_to_ews_format(start_time)
         end_time = convert_datetime_to_ews_format(end_time)
-        for account in accounts:
-            # Logic to set time zone according to user account
-            self.time_zone = account.default_timezone
 
-            try:
-                for type in mail_type:
+        try:
+            # Logic to get mails folder
+            if "archive" in mail_type["folder"]:
+                mail_type_obj_folder = (
+                    account.root / "Top of Information Store" / "Archive"
+                )
+            else:
+                mail_type_obj_folder = getattr(account, mail_type["folder"])
 
-                    # Logic to get mails folder
-                    if "archive" in type["folder"]:
-                        mail_type_obj_folder = (
-                            account.root / "Top of Information Store" / "Archive"
-                        )
-                    else:
-                        mail_type_obj_folder = getattr(account, type["folder"])
-
-                    # Logic to fetch mails
-                    mail_type_obj = (
-                        mail_type_obj_folder.all()
-                        .filter(
-                            last_modified_time__gt=start_time,
-                            last_modified_time__lt=end_time,
-                        )
-                        .only(
-                            "sender",
-                            "to_recipients",
-                            "cc_recipients",
-                            "bcc_recipients",
-                            "last_modified_time",
-                            "subject",
-                            "importance",
-                            "categories",
-                            "body",
-                            "has_attachments",
-                            "attachments",
-                        )
+            # Logic to fetch mails
+            if self.ews_fast_path:
+                mail_type_obj = self.ews_fast_path.get_mails(
+                    account, mail_type_obj_folder, start_time, end_time
+                )
+            else:
+                mail_type_obj = (
+                    mail_type_obj_folder.all()
+                    .filter(
+                        last_modified_time__gt=start_time,
+                        last_modified_time__lt=end_time,
                     )
-                    mail_type_documents = self.get_mail_documents(
-                        account,
-                        ids_list_mails,
-                        type["constant"],
-                        mail_type_obj,
-                        start_time,
-                        end_time,
+                    .only(
+                        "sender",
+                        "to_recipients",
+                        "cc_recipients",
+                        "bcc_recipients",
+                        "last_modified_time",
+                        "subject",
+                        "importance",
+                        "categories",
+                        "body",
+                        "has_attachments",
+                        "attachments",
+                        "message_id",
                     )
-                    documents.extend(mail_type_documents)
-            except requests.exceptions.RequestException as request_error:
-                raise requests.exceptions.RequestException(
-                    f"Error while fetching mails data for {account.primary_smtp_address}. Error: {request_error}"
                 )
-            except Exception as exception:
-                self.logger.info(
-                    f"Error while fetching mails data for {account.primary_smtp_address}. Error: {exception}"
+            # Logic to release the items claimed by the folder if it fails, as its documents are not queued
+            with deduplication_unit(self.message_deduplicator, self.attachment_deduplicator):
+                return self.get_mail_documents(
+                    account,
+                    ids_list_mails,
+                    mail_type["constant"],
+                    mail_type_obj,
+                    start_time,
+                    end_time,
                 )
-                pass
-
-        return list(unique_everseen(documents))
+        except requests.exceptions.RequestException as request_error:
+            raise requests.exceptions.RequestException(
+                f"Error while fetching {mail_type['constant']} data for {account.primary_smtp_address}. "
+                f"Error: {request_error}"
+            )
+        except Exception as exception:
+            self.logger.info(
+                f"Error while fetching {mail_type['constant']} data for {account.primary_smtp_address}. "
+                f"Error: {exception}"
+            )
+            return []
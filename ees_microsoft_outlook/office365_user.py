@@ -14,6 +14,7 @@ from exchangelib import (IMPERSONATION, OAUTH2, Account, Configuration,
 
 from .constant import (API_SCOPE, EWS_ENDPOINT, GRAPH_BASE_URL,
                        MICROSOFTONLINE_URL)
+from .mailbox_health import create_accounts
 
 
 class Office365User:
@@ -96,36 +97,45 @@ class Office365User:
                 f"Error while fetching users from Azure Active Directory. Error: {exception}"
             )
 
-    def get_users_accounts(self, users):
+    def create_account(self, user_account):
+        """Creates the account of a user of office365
+        :param user_account: Email address of the user
+        Returns:
+            account: User account
+        """
+        credentials = OAuth2Credentials(
+            client_id=self.client_id,
+            tenant_id=self.tenant_id,
+            client_secret=self.secret_value,
+            identity=Identity(primary_smtp_address=user_account),
+        )
+        conf = Configuration(
+            credentials=credentials,
+            auth_type=OAUTH2,
+            service_endpoint=EWS_ENDPOINT,
+            retry_policy=FaultTolerance(max_wait=900),
+        )
+        return Account(
+            user_account,
+            config=conf,
+            autodiscover=False,
+            access_type=IMPERSONATION,
+        )
+
+    def get_users_accounts(self, users, mailbox_health=None):
         """Fetch user account from office365
         :param users: Azure active directory user list
+        :param mailbox_health: Object of MailboxHealth to probe the accounts and skip the broken mailboxes
         Returns:
             users_accounts: List of all user accounts
         """
-        users_accounts = []
         try:
-
-            for user_account in users:
-                credentials = OAuth2Credentials(
-                    client_id=self.client_id,
-                    tenant_id=self.tenant_id,
-                    client_secret=self.secret_value,
-                    identity=Identity(primary_smtp_address=user_account),
-                )
-                conf = Configuration(
-                    credentials=credentials,
-                    auth_type=OAUTH2,
-                    service_endpoint=EWS_ENDPOINT,
-                    retry_policy=FaultTolerance(max_wait=900),
-                )
-                account = Account(
-                    user_account,
-                    config=conf,
-                    autodiscover=False,
-                    access_type=IMPERSONATION,
-                )
-                users_accounts.append(account)
-            return users_accounts
+            return create_accounts(
+                users,
+                self.create_account,
+                self.config.get_value("source_sync_thread_count"),
+                mailbox_health,
+            )
         except Exception as exception:
             raise Exception(
                 f"Error while creating users account objects. Error: {exception}"
@@ -0,0 +1,124 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module contains the overflow of the connector queue on the local disk.
+
+    The items which do not fit in the memory of the queue are appended to segment files, each item being a
+    compressed pickle preceded by its length, and are read back in the order they were written. A segment is
+    removed once all its items are read, so the files left by a stopped run hold the items which were not
+    indexed, and are read first by the next run.
+"""
+import collections
+import os
+import pickle
+import struct
+import zlib
+
+# Size in bytes from which the next items are written to a new segment, so that the read segments are removed
+SEGMENT_SIZE = 64 * 1024 * 1024
+SEGMENT_SUFFIX = ".segment"
+LENGTH_HEADER = struct.Struct(">I")
+
+
+class QueueSpill:
+    """This class is a FIFO of items stored in compressed append-only segment files"""
+
+    def __init__(self, logger, spill_path, segment_size=SEGMENT_SIZE):
+        """
+        :param logger: Logger object
+        :param spill_path: Directory of the segment files
+        :param segment_size: Size in bytes from which the items are written to a new segment
+        """
+        self.logger = logger
+        self.spill_path = spill_path
+        self.segment_size = segment_size
+        self.written_bytes = 0
+        # Number and count of unread items of each segment, from the oldest to the one being written
+        self.__segments = collections.deque()
+        self.__writer = None
+        self.__reader = None
+        os.makedirs(spill_path, exist_ok=True)
+        numbers = sorted(
+            int(file_name[: -len(SEGMENT_SUFFIX)])
+            for file_name in os.listdir(spill_path)
+            if file_name.endswith(SEGMENT_SUFFIX)
+        )
+        for number in numbers:
+            item_count = self.__count_items(number)
+            if item_count:
+                self.__segments.append([number, item_count])
+            else:
+                os.remove(self.__get_segment_path(number))
+        self.__next_number = numbers[-1] + 1 if numbers else 0
+        self.recovered_items = len(self)
+        if self.recovered_items:
+            self.logger.info(
+                f"Resuming {self.recovered_items} items of the connector queue spilled to {spill_path} by the previous run"
+            )
+
+    def __len__(self):
+        return sum(item_count for _, item_count in self.__segments)
+
+    def __get_segment_path(self, number):
+        return os.path.join(self.spill_path, f"{number:08d}{SEGMENT_SUFFIX}")
+
+    def __count_items(self, number):
+        """Returns the number of complete items of a segment, ignoring an item cut by the end of a stopped run"""
+        item_count = 0
+        with open(self.__get_segment_path(number), "rb") as segment_file:
+            size = os.fstat(segment_file.fileno()).st_size
+            while True:
+                header = segment_file.read(LENGTH_HEADER.size)
+                if len(header) < LENGTH_HEADER.size:
+                    return item_count
+                (length,) = LENGTH_HEADER.unpack(header)
+                if segment_file.tell() + length > size:
+                    return item_count
+                segment_file.seek(length, os.SEEK_CUR)
+                item_count += 1
+
+    def append(self, item):
+        """Appends an item to the last segment
+        :param item: Item of the queue
+        Returns:
+            size: Size in bytes of the item on the disk
+        """
+        data = zlib.compress(pickle.dumps(item, pickle.HIGHEST_PROTOCOL), 1)
+        if not self.__writer or self.__writer.tell() >= self.segment_size:
+            if self.__writer:
+                self.__writer.close()
+            self.__writer = open(self.__get_segment_path(self.__next_number), "ab")
+            self.__segments.append([self.__next_number, 0])
+            self.__next_number += 1
+        self.__writer.write(LENGTH_HEADER.pack(len(data)))
+        self.__writer.write(data)
+        # Logic to make the item readable by the reader of the segment
+        self.__writer.flush()
+        self.__segments[-1][1] += 1
+        self.written_bytes += LENGTH_HEADER.size + len(data)
+        return LENGTH_HEADER.size + len(data)
+
+    def popleft(self):
+        """Removes and returns the oldest item, and removes its segment once all the items of the segment are read
+        Returns:
+            item: Item of the queue
+        """
+        segment = self.__segments[0]
+        if not self.__reader:
+            self.__reader = open(self.__get_segment_path(segment[0]), "rb")
+        (length,) = LENGTH_HEADER.unpack(self.__reader.read(LENGTH_HEADER.size))
+        item = pickle.loads(zlib.decompress(self.__reader.read(length)))
+        segment[1] -= 1
+        if self.recovered_items:
+            self.recovered_items -= 1
+        if not segment[1]:
+            self.__reader.close()
+            self.__reader = None
+            if len(self.__segments) == 1 and self.__writer:
+                self.__writer.close()
+                self.__writer = None
+            self.__segments.popleft()
+            os.remove(self.__get_segment_path(segment[0]))
+        return item
@@ -0,0 +1,239 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module contains the delay queue used to retry failed work units without blocking the workers.
+
+    A failed work unit is put back in the queue with a not-before time computed with a jittered
+    exponential back-off, so the worker threads keep processing the other units in the meantime.
+    Units which still fail after the configured number of attempts are recorded in a retry file,
+    so that the next run can process them again.
+"""
+import collections
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+
+
+def get_backoff_delay(attempts):
+    """Returns the delay in seconds before the next attempt of a work unit, using an exponential
+    back-off with jitter, so that the units failed together are not retried together
+    :param attempts: Number of attempts already made for the work unit
+    """
+    delay = 2**attempts
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class WorkUnit:
+    """This class represents a retryable unit of work like fetching a folder of a mailbox
+    or indexing a batch of documents"""
+
+    def __init__(self, key, func, args):
+        """
+        :param key: JSON serializable dictionary describing the unit, used for logging and persistence
+        :param func: Function executing the unit
+        :param args: Arguments of the function
+        """
+        self.key = key
+        self.func = func
+        self.args = args
+        self.attempts = 0
+
+    def __repr__(self):
+        return f"WorkUnit({self.key})"
+
+
+class DelayedRetryQueue:
+    """Thread safe queue of work units where each unit becomes available after its not-before time.
+
+    A unit failing with one of the retryable exceptions is put back with a jittered back-off delay, until
+    it has been attempted retry_count times. Then it is given up and passed to the on_give_up callback.
+    """
+
+    def __init__(self, logger, retry_count, exception_list, on_give_up=None):
+        """
+        :param logger: Logger object
+        :param retry_count: Number of attempts of a work unit before giving it up
+        :param exception_list: Exceptions on which the work unit is retried
+        :param on_give_up: Function called with the work units which are given up
+        """
+        self.logger = logger
+        self.retry_count = retry_count
+        self.exception_list = exception_list
+        self.on_give_up = on_give_up
+        self.retried_units = 0
+        self.failed_units = 0
+        self.__heap = []
+        self.__sequence = itertools.count()
+        self.__condition = threading.Condition()
+        self.__unfinished_units = 0
+
+    def put(self, unit, delay=0):
+        """Adds a new work unit to the queue
+        :param unit: Work unit to be processed
+        :param delay: Seconds to wait before the unit can be processed
+        """
+        with self.__condition:
+            self.__unfinished_units += 1
+            self.__push(unit, delay)
+
+    def retry(self, unit, delay):
+        """Puts back a work unit which is being processed, to be processed again after the delay
+        :param unit: Work unit to be retried
+        :param delay: Seconds to wait before the unit can be processed again
+        """
+        with self.__condition:
+            self.__push(unit, delay)
+
+    def __push(self, unit, delay):
+        heapq.heappush(
+            self.__heap, (time.monotonic() + delay, next(self.__sequence), unit)
+        )
+        self.__condition.notify()
+
+    def task_done(self):
+        """Marks a work unit returned by get as finished, either successfully or given up"""
+        with self.__condition:
+            self.__unfinished_units -= 1
+            self.__condition.notify_all()
+
+    def get(self, block=True):
+        """Returns the next work unit whose not-before time has passed
+        :param block: Whether to wait for a unit to become available
+        Returns:
+            unit: Work unit, or None if every unit is finished or if no unit is ready and block is False
+        """
+        with self.__condition:
+            while True:
+                now = time.monotonic()
+                if self.__heap and self.__heap[0][0] <= now:
+                    return heapq.heappop(self.__heap)[2]
+                if not block or not self.__unfinished_units:
+                    return None
+                timeout = self.__heap[0][0] - now if self.__heap else None
+                self.__condition.wait(timeout)
+
+    def qsize(self):
+        """Returns the number of work units waiting in the queue"""
+        with self.__condition:
+            return len(self.__heap)
+
+    def process(self, unit):
+        """Executes a work unit returned by get. On a retryable error the unit is put back in the queue
+        instead of sleeping, so the caller can go on with the next unit
+        :param unit: Work unit to be executed
+        Returns:
+            result: Result of the work unit, or None if it failed
+        """
+        unit.attempts += 1
+        result = None
+        try:
+            result = unit.func(*unit.args)
+        except self.exception_list as exception:
+            if unit.attempts < self.retry_count:
+                delay = get_backoff_delay(unit.attempts)
+                self.logger.warning(
+                    f"Error while processing {unit}. Retry count: {unit.attempts} out of {self.retry_count}, "
+                    f"retrying in {delay:.1f} seconds. Error: {exception}"
+                )
+                self.retried_units += 1
+                self.retry(unit, delay)
+                return None
+            self.logger.error(
+                f"Giving up {unit} after {unit.attempts} attempts. Error: {exception}"
+            )
+            self.failed_units += 1
+            if self.on_give_up:
+                self.on_give_up(unit)
+        except Exception as exception:
+            self.logger.exception(f"Error while processing {unit}. Error: {exception}")
+        self.task_done()
+        return result
+
+
+class MailboxLimiter:
+    """This class bounds the number of work units processed concurrently for a single mailbox, to stay within
+    the EWS throttling budget of the user while several folders of the mailbox are fetched in parallel"""
+
+    def __init__(self, concurrency):
+        """
+        :param concurrency: Maximum number of work units processed concurrently for a mailbox
+        """
+        self.concurrency = concurrency
+        self.__lock = threading.Lock()
+        self.__running_units = collections.Counter()
+
+    def acquire(self, mailbox):
+        """Takes a slot of the mailbox without waiting
+        :param mailbox: Email address of the mailbox
+        Returns:
+            acquired: Whether a slot was free
+        """
+        with self.__lock:
+            if self.__running_units[mailbox] >= self.concurrency:
+                return False
+            self.__running_units[mailbox] += 1
+            return True
+
+    def release(self, mailbox):
+        """Frees a slot of the mailbox taken with acquire
+        :param mailbox: Email address of the mailbox
+        """
+        with self.__lock:
+            self.__running_units[mailbox] -= 1
+
+
+class RetryStore:
+    """This class keeps the work units which failed after all the attempts in a JSON file,
+    so that the next run can process them again.
+
+    The structure of the file is {'fetch': {'mails': [key, ...], ...}, 'index': {'documents': [documents, ...]}}
+    """
+
+    def __init__(self, logger, retry_store_path):
+        self.logger = logger
+        self.retry_store_path = retry_store_path
+        self.__lock = threading.Lock()
+        self.__failures = {"fetch": {}, "index": {}}
+        if os.path.exists(retry_store_path) and os.path.getsize(retry_store_path) > 0:
+            with open(retry_store_path, encoding="utf-8") as retry_file:
+                try:
+                    self.__failures.update(json.load(retry_file))
+                except ValueError as exception:
+                    self.logger.exception(
+                        f"Error while parsing the retry file from path: {retry_store_path}. Error: {exception}"
+                    )
+
+    def pop_failures(self, kind, object_type):
+        """Removes and returns the failures of a previous run
+        :param kind: Kind of the failed units, fetch or index
+        :param object_type: Object type like mails, calendar, contacts or tasks, or documents for index failures
+        """
+        with self.__lock:
+            return self.__failures[kind].pop(object_type, [])
+
+    def record_failure(self, kind, object_type, payload):
+        """Records a work unit which failed after all the attempts
+        :param kind: Kind of the failed unit, fetch or index
+        :param object_type: Object type like mails, calendar, contacts or tasks, or documents for index failures
+        :param payload: Data needed to process the unit again
+        """
+        with self.__lock:
+            self.__failures[kind].setdefault(object_type, []).append(payload)
+
+    def save(self):
+        """Writes the recorded failures to the retry file"""
+        os.makedirs(os.path.dirname(self.retry_store_path), exist_ok=True)
+        with self.__lock:
+            with open(self.retry_store_path, "w", encoding="utf-8") as retry_file:
+                try:
+                    json.dump(self.__failures, retry_file, indent=4)
+                except ValueError as exception:
+                    self.logger.exception(
+                        f"Error while updating the retry file. Error: {exception}"
+                    )
@@ -17,6 +17,18 @@ def coerce_rfc_3339_date(input_date):
     return False
 
 
+EXTRACTION_POLICY_SCHEMA = {
+    "type": "dict",
+    "nullable": True,
+    "schema": {
+        "max_size": {"nullable": True, "type": "integer", "min": 1},
+        "allowed_mime_types": {"nullable": True, "type": "list"},
+        "denied_mime_types": {"nullable": True, "type": "list"},
+        "max_text_length": {"nullable": True, "type": "integer", "min": 1},
+        "timeout": {"nullable": True, "type": "integer", "min": 1},
+    },
+}
+
 schema = {
     "microsoft_exchange.active_directory_server": {
         "required": False,
@@ -106,6 +118,7 @@ schema = {
                 "schema": {
                     "include_fields": {"nullable": True, "type": "list"},
                     "exclude_fields": {"nullable": True, "type": "list"},
+                    "extraction_policy": EXTRACTION_POLICY_SCHEMA,
                 },
             },
             "calendar": {
@@ -114,6 +127,7 @@ schema = {
                 "schema": {
                     "include_fields": {"nullable": True, "type": "list"},
                     "exclude_fields": {"nullable": True, "type": "list"},
+                    "extraction_policy": EXTRACTION_POLICY_SCHEMA,
                 },
             },
             "tasks": {
@@ -122,6 +136,7 @@ schema = {
                 "schema": {
                     "include_fields": {"nullable": True, "type": "list"},
                     "exclude_fields": {"nullable": True, "type": "list"},
+                    "extraction_policy": EXTRACTION_POLICY_SCHEMA,
                 },
             },
             "contacts": {
@@ -158,6 +173,24 @@ schema = {
     },
     "retry_count": {"required": False, "type": "integer", "default": 3, "min": 1},
     "source_sync_thread_count": {"required": True, "type": "integer", "default": 5, "min": 1},
+    "per_mailbox_concurrency": {"required": False, "type": "integer", "default": 2, "min": 1},
+    "extraction_thread_count": {"required": False, "type": "integer", "default": 5, "min": 1},
+    "extraction_timeout": {"required": False, "type": "integer", "default": 60, "min": 1},
+    "extraction_spool_threshold": {"required": False, "type": "integer", "default": 4, "min": 1},
+    "html_to_text.engine": {
+        "required": False,
+        "type": "string",
+        "default": "lxml",
+        "allowed": ["beautifulsoup", "html_parser", "lxml"],
+    },
+    "html_to_text.strip_quoted_replies": {"required": False, "type": "boolean", "default": False},
+    "enable_native_extraction": {"required": False, "type": "boolean", "default": True},
+    "tika.endpoints": {"required": False, "type": "list", "nullable": True, "default": []},
+    "tika.server_count": {"required": False, "type": "integer", "nullable": True, "default": 0, "min": 0},
+    "tika.start_port": {"required": False, "type": "integer", "default": 9998, "min": 1},
+    "enable_extraction_cache": {"required": False, "type": "boolean", "default": True},
+    "extraction_cache.path": {"required": False, "type": "string"},
+    "extraction_cache.max_size": {"required": False, "type": "integer", "default": 1024, "min": 1},
     "enterprise_search_sync_thread_count": {
         "required": True,
         "type": "integer",
@@ -165,4 +198,22 @@ schema = {
         "min": 1,
     },
     "connector.user_mapping": {"required": False, "type": "string"},
+    "enable_ews_fast_path": {"required": False, "type": "boolean", "default": False},
+    "enable_message_dedup": {"required": False, "type": "boolean", "default": False},
+    "enable_attachment_dedup": {"required": False, "type": "boolean", "default": False},
+    "enable_meeting_dedup": {"required": False, "type": "boolean", "default": False},
+    "body_truncation.max_bytes": {"required": False, "type": "integer", "nullable": True, "min": 1, "default": 102400},
+    "body_truncation.keep_tail": {"required": False, "type": "boolean", "default": False},
+    "connector_queue.max_items": {"required": False, "type": "integer", "nullable": True, "min": 1, "default": 100},
+    "connector_queue.max_bytes": {
+        "required": False,
+        "type": "integer",
+        "nullable": True,
+        "min": 1,
+        "default": 268435456,
+    },
+    "connector_queue.enable_spill": {"required": False, "type": "boolean", "default": False},
+    "connector_queue.spill_path": {"required": False, "type": "string"},
+    "adaptive_batching.enable": {"required": False, "type": "boolean", "default": True},
+    "adaptive_batching.target_latency": {"required": False, "type": "integer", "default": 20, "min": 1},
 }
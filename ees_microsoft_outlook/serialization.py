@@ -0,0 +1,59 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module serializes the Workplace Search documents to the JSON bytes of the indexing requests.
+
+    A document is encoded once, when it is added to a batch, and the bytes are used both to measure the
+    batch and as its request body, which is the JSON array of the encoded documents joined together. The
+    Enterprise Search client sends a body of bytes as is, so that a retried batch sends the same buffer.
+    The documents are encoded with orjson when the package is installed, and with the json module otherwise,
+    both producing compact UTF-8 JSON.
+"""
+import json
+
+from .document_record import DocumentRecord, to_dict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_document(document):
+    """Returns the JSON bytes of a document, as it is sent to Enterprise Search
+    :param document: Record or dictionary of the document
+    """
+    document = to_dict(document)
+    if orjson:
+        try:
+            # The datetimes are passed to str like the json module does, instead of the RFC 3339 format of orjson
+            return orjson.dumps(document, default=str, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            # Logic to fall back to the json module for the values orjson rejects, like lone surrogates
+            pass
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":"), default=str).encode(
+        "utf-8", "surrogatepass"
+    )
+
+
+def join_encoded_documents(encoded_documents):
+    """Returns the JSON array of encoded documents, which is the body of an indexing request
+    :param encoded_documents: List of the JSON bytes of the documents
+    """
+    return b"[" + b",".join(encoded_documents) + b"]"
+
+
+def estimate_document_size(document):
+    """Returns the number of characters of the text fields of a document, which approximates the memory of the
+    document without encoding it or converting a record to a dictionary
+    :param document: Record or dictionary of the document
+    """
+    size = 0
+    for value in document.values() if isinstance(document, (dict, DocumentRecord)) else (document,):
+        if isinstance(value, str):
+            size += len(value)
+        elif isinstance(value, list):
+            size += sum(len(item) for item in value if isinstance(item, str))
+    return size
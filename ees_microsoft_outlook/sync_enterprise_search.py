@@ -6,15 +6,29 @@
 
 import collections
 import copy
+import itertools
+import threading
+import time
 
 from . import constant
-from .utils import split_documents_into_equal_bytes, split_documents_into_equal_chunks
+from .adaptive_batching import AdaptiveBatchSize
+from .batching import DocumentBatcher
+from .document_record import to_dict
+from .enterprise_search_wrapper import TRANSIENT_ERRORS
+from .retry_queue import DelayedRetryQueue, WorkUnit
+from .serialization import encode_document, join_encoded_documents
+from .utils import truncate_document_body
+
+# Type of the documents indexed without an object type, like the documents requeued from a previous run
+DOCUMENTS_TYPE = "documents"
 
 
 class SyncEnterpriseSearch:
     """This class allows ingesting documents to Elastic Enterprise Search."""
 
-    def __init__(self, config, logger, workplace_search_custom_client, queue):
+    def __init__(
+        self, config, logger, workplace_search_custom_client, queue, retry_store=None
+    ):
         self.config = config
         self.logger = logger
         self.workplace_search_custom_client = workplace_search_custom_client
@@ -25,12 +39,103 @@ class SyncEnterpriseSearch:
         )
         self.queue = queue
         self.checkpoint_list = []
+        # Checkpoints waiting for the documents of their object type dequeued before them, along with their
+        # sequence number, and the sequence number of the oldest document of each open or closed batch of each
+        # object type not indexed yet, by batch id. They are shared by the consumer threads
+        self.pending_checkpoints = []
+        self.unfinished_batches = collections.defaultdict(dict)
+        # Object types of which a batch could neither be indexed nor recorded, whose checkpoints are not saved
+        self.incomplete_object_types = set()
+        self.batch_ids = itertools.count()
+        self.sequence_numbers = itertools.count()
+        self.checkpoints_lock = threading.Lock()
+        # Lock held while a consumer thread dequeues an item and registers the batch of its documents, so that
+        # a checkpoint dequeued afterwards by another consumer thread waits for this batch
+        self.dequeue_lock = threading.Lock()
         self.max_allowed_bytes = 10000000
+        self.max_body_bytes = config.get_value("body_truncation.max_bytes")
+        self.keep_tail = config.get_value("body_truncation.keep_tail")
+        self.enable_adaptive_batching = config.get_value("adaptive_batching.enable")
+        self.target_latency = config.get_value("adaptive_batching.target_latency")
+        # Sizes of the batches of each object type, shared by the consumer threads
+        self.batch_sizes = {}
+        self.batch_sizes_lock = threading.Lock()
+        self.retry_store = retry_store
+        self.retry_queue = DelayedRetryQueue(
+            logger,
+            config.get_value("retry_count"),
+            TRANSIENT_ERRORS,
+            self.record_failed_documents,
+        )
+
+    def truncate_documents(self, documents):
+        """Truncates the bodies of the documents to the byte budget of the configuration, if any
+        :param documents: Documents fetched from the queue
+        Returns:
+            documents: The documents, whose bodies are truncated in place
+        """
+        if self.max_body_bytes:
+            for document in documents:
+                truncate_document_body(document, self.max_body_bytes, self.keep_tail)
+        return documents
 
-    def index_documents(self, documents):
+    def get_batch_size(self, object_type):
+        """Returns the size of the batches of an object type
+        :param object_type: Type of the queued documents like mails, calendar, contacts, tasks
+        Returns:
+            batch_size: Object of AdaptiveBatchSize
+        """
+        with self.batch_sizes_lock:
+            if object_type not in self.batch_sizes:
+                self.batch_sizes[object_type] = AdaptiveBatchSize(
+                    constant.BATCH_SIZE, self.max_allowed_bytes, self.target_latency
+                )
+            return self.batch_sizes[object_type]
+
+    def adapt_batch_size(self, object_type, latency=None, exception=None):
+        """Adapts the size of the next batches of an object type to the outcome of an indexing request
+        :param object_type: Type of the indexed documents
+        :param latency: Duration in seconds of the successful request
+        :param exception: Exception raised by the failed request, or None
+        """
+        if not self.enable_adaptive_batching:
+            return
+        batch_size = self.get_batch_size(object_type)
+        if exception is None:
+            resized = batch_size.record_success(latency)
+        else:
+            resized = batch_size.record_failure(isinstance(exception, TRANSIENT_ERRORS))
+        if resized:
+            self.logger.info(
+                f"Batches of {object_type} resized to {batch_size.max_documents} documents "
+                f"and {batch_size.max_bytes} bytes"
+            )
+
+    def get_batcher(self, batchers, object_type):
+        """Returns the batcher of an object type, bounded by the current size of the batches of the type
+        :param batchers: Dictionary of the batchers of a consumer thread by object type
+        :param object_type: Type of the queued documents like mails, calendar, contacts, tasks
+        Returns:
+            batcher: Object of DocumentBatcher
+        """
+        batcher = batchers.get(object_type)
+        if not batcher:
+            # A document larger than the batches is truncated to the size accepted by Workplace Search only
+            batcher = batchers[object_type] = DocumentBatcher(
+                constant.BATCH_SIZE, self.max_allowed_bytes, self.keep_tail, self.max_allowed_bytes
+            )
+        batch_size = self.get_batch_size(object_type)
+        batcher.max_documents, batcher.max_bytes = batch_size.max_documents, batch_size.max_bytes
+        return batcher
+
+    def index_documents(self, documents, body=None, object_type=DOCUMENTS_TYPE, batch_id=None):
         """This method indexes the documents to the Enterprise Search.
         :param documents: Documents to be indexed
+        :param body: JSON bytes of the documents, or None to encode them
+        :param object_type: Type of the documents, whose next batches are adapted to the outcome of the request
+        :param batch_id: Id of the batch whose checkpoints wait for it, or None
         """
+        indexed = False
         try:
             if documents:
                 error_count = 0
@@ -39,10 +144,19 @@ class SyncEnterpriseSearch:
                     documents_dict[document["id"]] = document
                 total_records_dict = self.get_records_by_types(documents)
                 total_inserted_record_dict = copy.deepcopy(total_records_dict)
-                responses = self.workplace_search_custom_client.index_documents(
-                    documents,
-                    constant.CONNECTION_TIMEOUT,
-                )
+                if body is None:
+                    body = join_encoded_documents([encode_document(document) for document in documents])
+                start_time = time.perf_counter()
+                try:
+                    # The client sends a body of bytes as is, without serializing the documents again
+                    responses = self.workplace_search_custom_client.index_documents(
+                        body,
+                        constant.CONNECTION_TIMEOUT,
+                    )
+                except Exception as exception:
+                    self.adapt_batch_size(object_type, exception=exception)
+                    raise
+                self.adapt_batch_size(object_type, latency=time.perf_counter() - start_time)
                 if responses:
                     for each in responses["results"]:
                         if each["errors"]:
@@ -60,10 +174,94 @@ class SyncEnterpriseSearch:
                 self.logger.info(
                     f"Total {error_count} documents missed due to some error and it will sync in next full-sync cycle"
                 )
+            indexed = True
+        except TRANSIENT_ERRORS:
+            raise
         except Exception as exception:
             self.logger.info(
                 f"Error while indexing {len(documents)} documents into Workplace Search. Error: {exception}"
             )
+        self.finish_batch(object_type, batch_id, indexed)
+
+    def index_batch(self, documents, body=None, object_type=DOCUMENTS_TYPE, batch_id=None):
+        """Adds a batch of documents to the retry queue and indexes the batches which are due. A batch failing
+        with a transient error is retried after a back-off delay, while the consumer goes on with the next batches
+        :param documents: Documents to be indexed
+        :param body: JSON bytes of the documents, sent again as is by the retries, or None to encode them
+        :param object_type: Type of the documents
+        :param batch_id: Id of the batch whose checkpoints wait for it, or None
+        """
+        if body is None:
+            body = join_encoded_documents([encode_document(document) for document in documents])
+        self.retry_queue.put(
+            WorkUnit({"documents": len(documents)}, self.index_documents, (documents, body, object_type, batch_id))
+        )
+        self.process_retry_queue(block=False)
+
+    def process_retry_queue(self, block):
+        """Indexes the batches of the retry queue which are due
+        :param block: Whether to wait until every batch of the queue is indexed or given up
+        """
+        unit = self.retry_queue.get(block)
+        while unit:
+            self.retry_queue.process(unit)
+            unit = self.retry_queue.get(block)
+
+    def record_failed_documents(self, unit):
+        """Records the documents of a batch which could not be indexed after all the retries, so that
+        the next run indexes them again
+        :param unit: Work unit of the batch
+        """
+        if self.retry_store:
+            self.retry_store.record_failure(
+                "index", "documents", [to_dict(document) for document in unit.args[0]]
+            )
+        self.finish_batch(unit.args[2], unit.args[3], bool(self.retry_store))
+
+    def finish_batch(self, object_type, batch_id, indexed):
+        """Marks a batch as finished and releases the checkpoints which no longer wait for any batch
+        :param object_type: Type of the documents of the batch
+        :param batch_id: Id of the batch, or None if no checkpoint waits for it
+        :param indexed: Whether the batch was indexed, or recorded to be indexed by the next run
+        """
+        if batch_id is None:
+            return
+        with self.checkpoints_lock:
+            self.unfinished_batches[object_type].pop(batch_id, None)
+            if not indexed:
+                self.incomplete_object_types.add(object_type)
+            self.release_checkpoints()
+
+    def register_batch(self, batch, object_type, sequence_number=None):
+        """Adds a batch holding documents to the unfinished batches of its object type, if not done yet
+        :param batch: Object of DocumentBatch
+        :param object_type: Type of the documents of the batch
+        :param sequence_number: Sequence number of the oldest document of the batch, or None for a new one
+        """
+        with self.checkpoints_lock:
+            if batch.batch_id is None:
+                if sequence_number is None:
+                    sequence_number = next(self.sequence_numbers)
+                batch.batch_id = next(self.batch_ids)
+                self.unfinished_batches[object_type][batch.batch_id] = sequence_number
+
+    def release_checkpoints(self):
+        """Saves the checkpoints for which no batch of their object type holds a document dequeued before them
+        and not indexed yet, called with the checkpoints lock held. The checkpoint of an object type whose
+        documents were not all indexed is dropped, so that the next sync fetches them again"""
+        pending_checkpoints = []
+        for checkpoint, sequence_number in self.pending_checkpoints:
+            unfinished_batches = self.unfinished_batches[checkpoint["object_type"]].values()
+            if any(batch_sequence_number < sequence_number for batch_sequence_number in unfinished_batches):
+                pending_checkpoints.append((checkpoint, sequence_number))
+            elif checkpoint["object_type"] in self.incomplete_object_types:
+                self.logger.warning(
+                    f"Not saving the checkpoint of {checkpoint['object_type']} as some of its documents could not "
+                    "be indexed, they will be fetched again by the next sync"
+                )
+            else:
+                self.checkpoint_list.append(checkpoint)
+        self.pending_checkpoints = pending_checkpoints
 
     def get_records_by_types(self, documents):
         """This method is used to for grouping the document based on their type
@@ -88,47 +286,84 @@ class SyncEnterpriseSearch:
             # Logic to delete documents from the Workplace Search
             self.workplace_search_custom_client.delete_documents(final_list)
 
+    def index_closed_batch(self, batch, object_type):
+        """Indexes a batch closed by the batcher, whose checkpoints are released once the batch and the batches
+        of its object type holding documents dequeued before them, on any consumer thread, are indexed
+        :param batch: Object of DocumentBatch, or None
+        :param object_type: Type of the documents of the batch
+        """
+        if not batch:
+            return
+        if batch.documents:
+            self.register_batch(batch, object_type)
+        with self.checkpoints_lock:
+            sequence_number = next(self.sequence_numbers)
+            for checkpoint in batch.checkpoints:
+                self.pending_checkpoints.append((checkpoint, sequence_number))
+            self.release_checkpoints()
+        if batch.documents:
+            self.index_batch(batch.documents, batch.get_body(), object_type, batch.batch_id)
+
     def perform_sync(self):
         """Pull documents from the queue and synchronize it to the Enterprise Search."""
         try:
-            signal_open = True
-            while signal_open:
-                documents_to_index, deleted_document = [], []
-                while len(documents_to_index) < constant.BATCH_SIZE and len(str(documents_to_index)) < self.max_allowed_bytes:
+            # The documents of each object type are batched apart, so that their batches are sized apart
+            batchers = {}
+            deleted_document = []
+            while True:
+                with self.dequeue_lock:
                     queue_item = self.queue.get()
-                    if queue_item.get("type") == constant.SIGNAL_CLOSE:
-                        signal_open = False
-                        break
-                    elif queue_item.get("type") == constant.CHECKPOINT:
-                        data = queue_item.get("data")
-                        checkpoint_dict = {
-                            "current_time": data[1],
-                            "index_type": data[2],
-                            "object_type": data[0],
-                        }
-                        self.checkpoint_list.append(checkpoint_dict)
-                        break
-                    elif queue_item.get("type") == "deletion":
-                        deleted_document.extend(queue_item.get("data"))
-                    else:
-                        documents_to_index.extend(queue_item.get("data"))
-                # This loop is to ensure if the last document fetched from the queue exceeds the size of
-                # documents_to_index to more than the permitted chunk size, then we split the documents as per the limit
-                if documents_to_index:
-                    for chunk in split_documents_into_equal_chunks(
-                        documents_to_index, constant.BATCH_SIZE
-                    ):
-                        for documents in split_documents_into_equal_bytes(
-                            chunk, self.max_allowed_bytes
-                        ):
-                            self.index_documents(documents)
-                if deleted_document:
-                    for chunk in split_documents_into_equal_chunks(
-                        deleted_document, constant.BATCH_SIZE
-                    ):
-                        self.delete_documents(chunk)
-                if not signal_open:
+                    sequence_number = next(self.sequence_numbers)
+                    object_type = queue_item.get("type")
+                    if queue_item.get("data") and object_type not in (constant.CHECKPOINT, "deletion"):
+                        batcher = self.get_batcher(batchers, object_type)
+                        self.register_batch(batcher.batch, object_type, sequence_number)
+                if queue_item.get("type") == constant.SIGNAL_CLOSE:
                     break
+                elif queue_item.get("type") == constant.CHECKPOINT:
+                    data = queue_item.get("data")
+                    checkpoint_dict = {
+                        "current_time": data[1],
+                        "index_type": data[2],
+                        "object_type": data[0],
+                    }
+                    self.index_closed_batch(self.get_batcher(batchers, data[0]).add_checkpoint(checkpoint_dict), data[0])
+                elif queue_item.get("type") == "deletion":
+                    deleted_document.extend(queue_item.get("data"))
+                    if len(deleted_document) >= constant.BATCH_SIZE:
+                        self.delete_documents(deleted_document)
+                        deleted_document = []
+                else:
+                    for document in self.truncate_documents(queue_item.get("data")):
+                        closed_batch = batcher.add(document)
+                        if closed_batch:
+                            # Logic to register the next batch before the closed one can be finished
+                            self.register_batch(batcher.batch, object_type, sequence_number)
+                        self.index_closed_batch(closed_batch, object_type)
+            for object_type, batcher in batchers.items():
+                self.index_closed_batch(batcher.flush(), object_type)
+            if deleted_document:
+                self.delete_documents(deleted_document)
+            self.process_retry_queue(block=True)
 
         except Exception as exception:
             self.logger.info(f"Error while indexing the objects. Error: {exception}")
+
+    def get_batch_size_metrics(self):
+        """Returns the current sizes of the batches of each object type
+        Returns:
+            metrics: Dictionary of the metrics of each object type
+        """
+        with self.batch_sizes_lock:
+            batch_sizes = dict(self.batch_sizes)
+        return {object_type: batch_size.get_metrics() for object_type, batch_size in batch_sizes.items()}
+
+    def log_batch_size_metrics(self):
+        """Logs the current sizes of the batches of each object type"""
+        for object_type, metrics in self.get_batch_size_metrics().items():
+            p95_latency = f"{metrics['p95_latency']:.2f}s" if metrics["p95_latency"] is not None else "n/a"
+            self.logger.info(
+                f"Batches of {object_type}: {metrics['max_documents']} documents and {metrics['max_bytes']} bytes, "
+                f"p95 latency of {p95_latency}, error rate of {metrics['error_rate']:.0%}, "
+                f"shrunk {metrics['shrinks']} and grown {metrics['grows']} times"
+            )
@@ -7,6 +7,7 @@ import csv
 import os
 
 from . import constant
+from .deduplication import DocumentKeyFilter
 
 
 class SyncMicrosoftOutlook:
@@ -19,6 +20,7 @@ class SyncMicrosoftOutlook:
         logger,
         workplace_search_custom_client,
         queue,
+        extraction_stage=None,
     ):
         self.logger = logger
         self.config = config
@@ -31,6 +33,8 @@ class SyncMicrosoftOutlook:
         self.ws_auth = config.get_value("enterprise_search.api_key")
         self.ws_source = config.get_value("enterprise_search.source_id")
         self.queue = queue
+        self.extraction_stage = extraction_stage
+        self.document_key_filter = DocumentKeyFilter()
 
     def workplace_add_permission(self, user_name, permissions):
         """Indexes the user permissions into Workplace Search
@@ -58,78 +62,89 @@ class SyncMicrosoftOutlook:
         user_name = rows.get(user, user)
         self.workplace_add_permission(user_name, permissions)
 
-    def fetch_mails(self, ids_list, users_account, mail_object, start_time, end_time):
-        """This method is used to fetch mails from Microsoft Outlook
+    def append_to_queue(self, object_type, documents):
+        """Appends the documents to the queue, after the extraction of their attachments in case of
+        the extraction stage. The documents already appended by another work unit of the run are dropped
+        :param object_type: Type of documents
+        :param documents: Documents fetched from Microsoft Outlook
+        """
+        fetched_count = len(documents or [])
+        documents = self.document_key_filter.filter(documents or [])
+        if len(documents) < fetched_count:
+            self.logger.debug(
+                f"Dropped {fetched_count - len(documents)} {object_type} documents already fetched in this run"
+            )
+        if self.extraction_stage:
+            self.extraction_stage.append_to_queue(self.queue, object_type, documents)
+        else:
+            self.queue.append_to_queue(object_type, documents)
+
+    def fetch_mails(
+        self, ids_list, mail_object, account, mail_type, start_time, end_time
+    ):
+        """This method is used to fetch mails of a folder of an account from Microsoft Outlook
         :ids_list: List of ids of documents
-        :param users_account: List of user accounts
         :param mail_object: Object of mails
+        :param account: User account
+        :param mail_type: Dictionary of the folder and the type of the mails
         :param start_time: Start time for fetching the mails
         :param end_time: End time for fetching the mails
         """
-        self.logger.info("Fetching Mails from Microsoft Outlook")
-        try:
-            documents = mail_object.get_mails(
-                ids_list, users_account, start_time, end_time
-            )
-        except Exception as exception:
-            self.logger.exception(f"Error while fetching Mails. Error: {exception}")
-        self.logger.info("Successfully fetched Mails from Microsoft Outlook")
-        self.queue.append_to_queue(constant.MAILS_OBJECT.lower(), documents)
+        self.logger.debug(
+            f"Fetching {mail_type['constant']} of {account.primary_smtp_address} from Microsoft Outlook"
+        )
+        documents = mail_object.get_folder_mails(
+            ids_list, account, mail_type, start_time, end_time
+        )
+        self.append_to_queue(constant.MAILS_OBJECT.lower(), documents)
 
     def fetch_calendar(
-        self, ids_list, users_account, calendar_object, start_time, end_time
+        self, ids_list, calendar_object, account, folder, start_time, end_time
     ):
-        """This method is used to fetch calendar from Microsoft Outlook
+        """This method is used to fetch a calendar folder of an account from Microsoft Outlook
         :ids_list: List of ids of documents
-        :param users_accounts: List of user account
         :param calendar_object: Object of calendar
+        :param account: User account
+        :param folder: Main calendar or child calendar folder object
         :param start_time: Start time for fetching the calendar
         :param end_time: End time for fetching the calendar
         """
-        self.logger.info("Fetching Calendars from Microsoft Outlook")
-        try:
-            documents = calendar_object.get_calendar(
-                ids_list, users_account, start_time, end_time
-            )
-        except Exception as exception:
-            self.logger.exception(f"Error while fetching Calendar. Error: {exception}")
-        self.logger.info("Successfully fetched Calendars from Microsoft Outlook")
-        self.queue.append_to_queue(constant.CALENDARS_OBJECT.lower(), documents)
+        self.logger.debug(
+            f"Fetching Calendars of {account.primary_smtp_address} from Microsoft Outlook"
+        )
+        documents = calendar_object.get_folder_calendar(
+            ids_list, account, folder, start_time, end_time
+        )
+        self.append_to_queue(constant.CALENDARS_OBJECT.lower(), documents)
 
-    def fetch_contacts(
-        self, ids_list, users_account, contact_object, start_time, end_time
-    ):
-        """This method is used to fetch contacts from Microsoft Outlook
+    def fetch_contacts(self, ids_list, contact_object, account, start_time, end_time):
+        """This method is used to fetch contacts of an account from Microsoft Outlook
         :ids_list: List of ids of documents
-        :param users_account: List of user account
         :param contact_object: Object of contacts
+        :param account: User account
         :param start_time: Start time for fetching the contacts
         :param end_time: End time for fetching the contacts
         """
-        self.logger.info("Fetching Contacts from Microsoft Outlook")
-        try:
-            documents = contact_object.get_contacts(
-                ids_list, users_account, start_time, end_time
-            )
-        except Exception as exception:
-            self.logger.exception(f"Error while fetching Contacts. Error: {exception}")
-        self.logger.info("Successfully fetched Contacts from Microsoft Outlook")
-        self.queue.append_to_queue(constant.CONTACTS_OBJECT.lower(), documents)
+        self.logger.debug(
+            f"Fetching Contacts of {account.primary_smtp_address} from Microsoft Outlook"
+        )
+        documents = contact_object.get_account_contacts(
+            ids_list, account, start_time, end_time
+        )
+        self.append_to_queue(constant.CONTACTS_OBJECT.lower(), documents)
 
-    def fetch_tasks(self, ids_list, users_account, task_object, start_time, end_time):
-        """This method is used to fetch tasks from Microsoft Outlook
+    def fetch_tasks(self, ids_list, task_object, account, start_time, end_time):
+        """This method is used to fetch tasks of an account from Microsoft Outlook
         :ids_list: List of ids of documents
-        :param users_account: List of user accounts
         :param task_object: Object of task
+        :param account: User account
         :param start_time: Start time for fetching the tasks
         :param end_time: End time for fetching the tasks
         """
-        self.logger.info("Fetching Tasks from Microsoft Outlook")
-        try:
-            documents = task_object.get_tasks(
-                ids_list, users_account, start_time, end_time
-            )
-        except Exception as exception:
-            self.logger.exception(f"Error while fetching Tasks. Error: {exception}")
-        self.logger.info("Successfully fetched Tasks from Microsoft Outlook")
-        self.queue.append_to_queue(constant.TASKS_OBJECT.lower(), documents)
+        self.logger.debug(
+            f"Fetching Tasks of {account.primary_smtp_address} from Microsoft Outlook"
+        )
+        documents = task_object.get_account_tasks(
+            ids_list, account, start_time, end_time
+        )
+        self.append_to_queue(constant.TASKS_OBJECT.lower(), documents)
@@ -0,0 +1,251 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""This module contains the pool of Tika servers which extract the content of the attachments.
+
+    The pool either uses the configured Tika endpoints or starts local Tika servers when the connector
+    starts, and warms each server with a probe document so that the first attachments do not wait for
+    the parsers to load. A request is sent to the healthy server with the fewest requests in flight through
+    a keep-alive session. A server failing several requests in a row is ejected from the pool, restarted
+    if the pool started it, and brought back once it answers the health check. An ejected server is restarted
+    on a thread of its own, so that the other servers keep serving while it starts.
+"""
+import json
+import mmap
+import os
+import subprocess
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from tika import tika
+
+# Number of consecutive failed requests after which a server is ejected from the pool
+MAX_CONSECUTIVE_FAILURES = 3
+# Seconds between two health checks of the ejected servers
+HEALTH_CHECK_INTERVAL = 10
+# Seconds waited for a local server to start
+STARTUP_TIMEOUT = 120
+# Seconds waited for a local server to stop before it is killed
+SHUTDOWN_TIMEOUT = 10
+PROBE_DOCUMENT = b"Tika warm up probe"
+
+
+def parse_content(response_text):
+    """Returns the content of the recursive metadata response of Tika
+    :param response_text: Text of the response of the /rmeta/text service
+    """
+    if not response_text:
+        return None
+    content = "".join(
+        document.get("X-TIKA:content", "") for document in json.loads(response_text)
+    )
+    return content or None
+
+
+class TikaServer:
+    """This class keeps the session, the requests in flight and the health of a Tika server"""
+
+    def __init__(self, endpoint, session_pool_size, port=None):
+        """
+        :param endpoint: URL of the server
+        :param session_pool_size: Number of keep-alive connections to the server
+        :param port: Port of the server if it is started by the pool
+        """
+        self.endpoint = endpoint.rstrip("/")
+        self.port = port
+        self.process = None
+        self.in_flight = 0
+        self.failures = 0
+        self.healthy = False
+        # Whether the server is being restarted by the health check, which keeps it out of the pool
+        self.restarting = False
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=session_pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+
+class TikaPool:
+    """This class balances the extraction requests between several Tika servers"""
+
+    def __init__(self, logger, endpoints, server_count, start_port, session_pool_size):
+        """
+        :param logger: Logger object
+        :param endpoints: List of the URLs of running Tika servers
+        :param server_count: Number of local Tika servers started by the pool when no endpoint is configured
+        :param start_port: Port of the first local Tika server
+        :param session_pool_size: Number of keep-alive connections to each server
+        """
+        self.logger = logger
+        self.__condition = threading.Condition()
+        self.__closed = threading.Event()
+        if endpoints:
+            self.servers = [TikaServer(endpoint, session_pool_size) for endpoint in endpoints]
+        else:
+            self.servers = [
+                TikaServer(f"http://localhost:{start_port + index}", session_pool_size, start_port + index)
+                for index in range(server_count)
+            ]
+        starting_threads = [
+            threading.Thread(target=self.start_server, args=(server,), daemon=True) for server in self.servers
+        ]
+        for starting_thread in starting_threads:
+            starting_thread.start()
+        for starting_thread in starting_threads:
+            starting_thread.join()
+        self.health_check_thread = threading.Thread(target=self.check_health, daemon=True)
+        self.health_check_thread.start()
+
+    def start_server(self, server):
+        """Starts a local Tika server if the pool owns it, then warms it with the probe document
+        :param server: Object of TikaServer
+        """
+        if self.__closed.is_set():
+            return
+        if server.port and (server.process is None or server.process.poll() is not None):
+            jar_path = os.path.join(tika.TikaJarPath, "tika-server.jar")
+            if not os.path.isfile(jar_path):
+                tika.getRemoteJar(tika.TikaServerJar, jar_path)
+            server.process = subprocess.Popen(
+                [
+                    tika.TikaJava,
+                    "-cp",
+                    jar_path,
+                    "org.apache.tika.server.TikaServerCli",
+                    "--port",
+                    str(server.port),
+                    "--host",
+                    "localhost",
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        deadline = time.time() + (STARTUP_TIMEOUT if server.port else 0)
+        while True:
+            try:
+                self.probe(server)
+                break
+            except requests.exceptions.RequestException as exception:
+                if time.time() > deadline or self.__closed.is_set():
+                    self.logger.error(f"Tika server {server.endpoint} is not available. Error: {exception}")
+                    return
+                time.sleep(1)
+        with self.__condition:
+            server.healthy = True
+            server.failures = 0
+            self.__condition.notify_all()
+        self.logger.info(f"Tika server {server.endpoint} is ready")
+
+    def probe(self, server):
+        """Extracts the probe document, which loads the parsers of the server
+        :param server: Object of TikaServer
+        """
+        response = server.session.put(
+            f"{server.endpoint}/rmeta/text",
+            data=PROBE_DOCUMENT,
+            headers={"Accept": "application/json"},
+            timeout=STARTUP_TIMEOUT,
+        )
+        response.raise_for_status()
+
+    def check_health(self):
+        """Restarts the ejected servers in the background, each on a thread of its own"""
+        while not self.__closed.wait(HEALTH_CHECK_INTERVAL):
+            for server in self.servers:
+                with self.__condition:
+                    if server.healthy or server.restarting:
+                        continue
+                    server.restarting = True
+                threading.Thread(target=self.restart_server, args=(server,), daemon=True).start()
+
+    def restart_server(self, server):
+        """Brings an ejected server back into the pool once it answers the probe, restarting the local server
+        if its process stopped or hung
+        :param server: Object of TikaServer
+        """
+        try:
+            if server.process and server.process.poll() is None and server.failures:
+                self.logger.warning(f"Restarting the Tika server {server.endpoint} which stopped responding")
+                server.process.kill()
+                server.process.wait()
+            self.start_server(server)
+        finally:
+            with self.__condition:
+                server.restarting = False
+
+    def acquire(self):
+        """Returns the healthy server with the fewest requests in flight, waiting for a health check if no
+        server is healthy
+        """
+        with self.__condition:
+            healthy_servers = [server for server in self.servers if server.healthy]
+            if not healthy_servers:
+                self.__condition.wait(HEALTH_CHECK_INTERVAL)
+                healthy_servers = [server for server in self.servers if server.healthy]
+            if not healthy_servers:
+                raise requests.exceptions.ConnectionError("No Tika server of the pool is available")
+            server = min(healthy_servers, key=lambda server: server.in_flight)
+            server.in_flight += 1
+            return server
+
+    def release(self, server, failed):
+        """Releases a server after a request and ejects it once it failed too many requests in a row
+        :param server: Object of TikaServer
+        :param failed: Whether the request failed
+        """
+        with self.__condition:
+            server.in_flight -= 1
+            server.failures = server.failures + 1 if failed else 0
+            if server.healthy and server.failures >= MAX_CONSECUTIVE_FAILURES:
+                server.healthy = False
+                self.logger.error(
+                    f"Ejecting the Tika server {server.endpoint} from the pool after {server.failures} failed requests"
+                )
+
+    def extract(self, content, timeout=None):
+        """Extracts the content of an attachment on the least loaded server
+        :param content: Content of the attachment
+        :param timeout: Timeout in seconds of the request
+        Returns:
+            parsed_text: Extracted text, or None if the attachment has no text
+        """
+        if isinstance(content, mmap.mmap):
+            content.seek(0)
+        server = self.acquire()
+        try:
+            response = server.session.put(
+                f"{server.endpoint}/rmeta/text",
+                data=content,
+                headers={"Accept": "application/json"},
+                timeout=timeout,
+            )
+        except requests.exceptions.RequestException:
+            self.release(server, True)
+            raise
+        # A server answering with an error status is alive, the attachment is the problem
+        self.release(server, False)
+        if response.status_code != 200:
+            self.logger.warning(f"Tika server {server.endpoint} returned status: {response.status_code}")
+            return None
+        response.encoding = "utf-8"
+        return parse_content(response.text)
+
+    def close(self):
+        """Stops the health checks and the local servers started by the pool"""
+        self.__closed.set()
+        for server in self.servers:
+            if server.process:
+                server.process.terminate()
+        for server in self.servers:
+            if server.process:
+                # Logic to reap the stopped processes, so that they do not remain as zombies
+                try:
+                    server.process.wait(SHUTDOWN_TIMEOUT)
+                except subprocess.TimeoutExpired:
+                    server.process.kill()
+                    server.process.wait()
+            server.session.close()
@@ -6,6 +6,8 @@
 """This module contains un-categorized utility methods.
 """
 import csv
+import io
+import mmap
 import os
 import time
 import urllib.parse
@@ -13,25 +15,41 @@ from datetime import date, datetime
 
 import exchangelib
 import pytz
-from bs4 import BeautifulSoup
 from exchangelib import EWSTimeZone
 from tika import parser
 
 from .adapter import SCHEMA
-from .constant import DEFAULT_TIME_ZONE, RFC_3339_DATETIME_FORMAT
+from .constant import (BODY_TRUNCATED_FIELD, DEFAULT_TIME_ZONE,
+                       RFC_3339_DATETIME_FORMAT, TRUNCATION_MARKER)
+from .html_text import DEFAULT_HTML_ENGINE, HTML_ENGINES
+from .serialization import encode_document
 
 
-def extract(content):
+def extract(content, timeout=None):
     """Extracts the contents
     :param content: content to be extracted
+    :param timeout: Timeout in seconds of the Tika request
     Returns:
         parsed_test: parsed text
     """
-    parsed = parser.from_buffer(content)
+    request_options = {"timeout": timeout} if timeout else {}
+    if isinstance(content, mmap.mmap):
+        content.seek(0)
+    parsed = parser.from_buffer(content, requestOptions=request_options)
     parsed_text = parsed["content"]
     return parsed_text
 
 
+def open_stream(content):
+    """Returns a file object reading the content of an attachment from its start
+    :param content: Content of the attachment, as bytes or as a memory-mapped file
+    """
+    if isinstance(content, mmap.mmap):
+        content.seek(0)
+        return content
+    return io.BytesIO(content)
+
+
 def url_encode(object_name):
     """Performs encoding on the name of objects
     containing special characters in their url, and
@@ -127,16 +145,16 @@ def get_current_time():
     return (datetime.utcnow()).strftime(RFC_3339_DATETIME_FORMAT)
 
 
-def html_to_text(content):
+def html_to_text(content, engine=DEFAULT_HTML_ENGINE, strip_quoted_replies=False):
     """Convert html content to text format
     :param content: HTML content
+    :param engine: Name of the engine converting the HTML like beautifulsoup, html_parser, lxml
+    :param strip_quoted_replies: Whether the quoted reply chains are dropped
     Returns:
         text: Converted Text
     """
     if content:
-        soup = BeautifulSoup(content, "html.parser")
-        text = soup.get_text().strip()
-        return text
+        return HTML_ENGINES[engine](content, strip_quoted_replies)
 
 
 def convert_datetime_to_ews_format(utc_datetime):
@@ -236,10 +254,85 @@ def split_date_range_into_chunks(start_time, end_time, number_of_chunks):
     return datelist
 
 
-def split_documents_into_equal_bytes(documents, allowed_size):
-    """This method splits a list of dictionary into list based on allowed size limit.
+def get_document_size(document):
+    """Returns the size in bytes of a document serialized to JSON, as it is sent to Enterprise Search
+    :param document: Record or dictionary of the document
+    """
+    return len(encode_document(document))
+
+
+def truncate_text(text, max_bytes, keep_tail=False):
+    """Truncates a text to a budget of UTF-8 bytes without splitting a character
+    :param text: Text to truncate
+    :param max_bytes: Maximum size of the truncated text in UTF-8 bytes
+    :param keep_tail: Whether the end of the text is kept along with its beginning, around a marker
+    Returns:
+        text: Truncated text, or the text itself if it fits in the budget
+    """
+    # A character takes at most 4 bytes in UTF-8, so that short texts are not encoded
+    if len(text) * 4 <= max_bytes:
+        return text
+    encoded_text = text.encode("utf-8")
+    if len(encoded_text) <= max_bytes:
+        return text
+    marker_size = len(TRUNCATION_MARKER.encode("utf-8"))
+    if not keep_tail or max_bytes <= marker_size:
+        return encoded_text[:max_bytes].decode("utf-8", "ignore")
+    head_size = (max_bytes - marker_size + 1) // 2
+    tail_size = max_bytes - marker_size - head_size
+    head = encoded_text[:head_size].decode("utf-8", "ignore")
+    tail = encoded_text[len(encoded_text) - tail_size:].decode("utf-8", "ignore") if tail_size else ""
+    return head + TRUNCATION_MARKER + tail
+
+
+def truncate_document_body(document, max_bytes, keep_tail=False):
+    """Truncates the body of a document to a budget of UTF-8 bytes and flags the document as truncated
+    :param document: Dictionary of the document
+    :param max_bytes: Maximum size of the body in UTF-8 bytes
+    :param keep_tail: Whether the end of the body is kept along with its beginning
+    Returns:
+        document: The document, whose body is truncated in place
+    """
+    body = document.get("body")
+    if isinstance(body, str) and body:
+        truncated_body = truncate_text(body, max_bytes, keep_tail)
+        if truncated_body is not body:
+            document["body"] = truncated_body
+            document[BODY_TRUNCATED_FIELD] = "true"
+    return document
+
+
+def fit_document_to_size(document, allowed_size, keep_tail=False):
+    """Truncates the body of a document larger than the allowed size so that the document fits in a request of
+    its own, and flags the document as truncated
+    :param document: Document larger than the allowed size
+    :param allowed_size: Maximum size allowed for indexing per request
+    :param keep_tail: Whether the end of the truncated body is kept along with its beginning
+    Returns:
+        document_size: Size in bytes of the truncated document
+    """
+    body = document.get("body")
+    document["body"] = ""
+    document[BODY_TRUNCATED_FIELD] = "true"
+    body_budget = allowed_size - get_document_size(document) if isinstance(body, str) else 0
+    while body_budget > 0:
+        document["body"] = truncate_text(body, body_budget, keep_tail)
+        # The escaped characters of the body take up to twice their UTF-8 size in JSON
+        overflow = get_document_size(document) - allowed_size
+        if overflow <= 0:
+            break
+        body_budget -= (overflow + 1) // 2
+    if body_budget <= 0:
+        document["body"] = None
+    return get_document_size(document)
+
+
+def split_documents_into_equal_bytes(documents, allowed_size, keep_tail=False):
+    """This method splits a list of dictionary into list based on allowed size limit. The body of a document
+    larger than the limit is truncated so that the document fits in a request of its own.
     :param documents: List of dictionary to be partitioned into chunks
     :param allowed_size: Maximum size allowed for indexing per request.
+    :param keep_tail: Whether the end of a truncated body is kept along with its beginning
     Returns:
         list_of_chunks: List of dictionary array that to be indexed.
     """
@@ -247,7 +340,7 @@ def split_documents_into_equal_bytes(documents, allowed_size):
     chunk = []
     current_size = allowed_size
     for document in documents:
-        document_size = len(str(document))
+        document_size = get_document_size(document)
         if document_size < current_size:
             chunk.append(document)
             current_size -= document_size
@@ -255,8 +348,7 @@ def split_documents_into_equal_bytes(documents, allowed_size):
             if chunk:
                 list_of_chunks.append(chunk)
             if document_size > allowed_size:
-                document["body"] = None
-                document_size = len(str(document))
+                document_size = fit_document_to_size(document, allowed_size, keep_tail)
             chunk = [document]
             current_size = allowed_size - document_size
     list_of_chunks.append(chunk)
@@ -26,6 +26,8 @@ install_requires = [
     "flake8",
     "ldap3",
     "exchangelib",
+    "lxml",
+    "olefile",
     "requests",
     "tika",
     "pytz"
@@ -0,0 +1,103 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""Compares the throughput of mapping the Microsoft Outlook objects to Workplace Search documents per item,
+walking the schema and looking up the configuration for every object, with the compiled document builders.
+
+    Run it from the tests directory:
+    python benchmark_document_builders.py [iterations]
+"""
+import os
+import sys
+import time
+
+import support  # noqa: F401 adds the connector to the path
+from ees_microsoft_outlook import constant
+from ees_microsoft_outlook.configuration import Configuration
+from ees_microsoft_outlook.document_builder import compile_document_builder
+from ees_microsoft_outlook.utils import get_schema_fields
+
+OBJECTS = {
+    "mails": {
+        "type": "Inbox Mails",
+        "Id": "AAMkAGQ2ZTc0",
+        "DisplayName": "Quarterly results",
+        "Description": "From: sender@xyz.com\nBody: The results of the quarter are attached.",
+        "Created": "2022-04-21T12:12:30Z",
+    },
+    "calendar": {
+        "type": "Calendar",
+        "Id": "AAMkAGQ2ZTc1",
+        "DisplayName": "All hands",
+        "Description": "Organizer: organizer@xyz.com",
+        "Created": "2022-04-21T12:12:30Z",
+    },
+    "contacts": {
+        "type": constant.CONTACTS_OBJECT,
+        "Id": "AAMkAGQ2ZTc2",
+        "DisplayName": "Jane Doe",
+        "Description": "Email Addresses: jane@xyz.com",
+        "Created": "2022-04-21T12:12:30Z",
+    },
+    "tasks": {
+        "type": constant.TASKS_OBJECT,
+        "Id": "AAMkAGQ2ZTc3",
+        "DisplayName": "Review the budget",
+        "Description": "Due Date: 2022-04-22",
+        "Created": "2022-04-21T12:12:30Z",
+    },
+}
+
+
+def map_per_item(config, object_name, source_documents):
+    """Maps the objects as the connector did before the builders, walking the schema of every folder and
+    looking up the configuration for every object"""
+    documents = []
+    schema = get_schema_fields(object_name, config.get_value("objects"))
+    for source_document in source_documents:
+        document = {}
+        document["_allow_permissions"] = []
+        if config.get_value("enable_document_permission"):
+            document["_allow_permissions"] = ["abc@xyz.com"]
+        document["type"] = source_document["type"]
+        for ws_field, ms_field in schema.items():
+            document[ws_field] = source_document[ms_field]
+        config.get_value("connector_platform_type")
+        documents.append(document)
+    return documents
+
+
+def map_compiled(config, object_name, source_documents):
+    """Maps the objects with the document builder compiled once per run"""
+    build_document = compile_document_builder(config, object_name)
+    return [build_document(source_document, "abc@xyz.com") for source_document in source_documents]
+
+
+def measure(func, config, object_name, iterations):
+    """Returns the number of objects mapped per second on one core
+    :param func: Mapping function
+    :param config: Configuration object
+    :param object_name: Name of the object in the schema
+    :param iterations: Number of objects
+    """
+    source_documents = [OBJECTS[object_name]] * iterations
+    start = time.perf_counter()
+    func(config, object_name, source_documents)
+    return iterations / (time.perf_counter() - start)
+
+
+def main(iterations):
+    config = Configuration(
+        file_name=os.path.join(os.path.dirname(__file__), "config", "microsoft_outlook_connector.yml")
+    )
+    print(f"{'object':<12}{'per item (items/s)':>22}{'compiled (items/s)':>22}{'speedup':>10}")
+    for object_name in OBJECTS:
+        before = measure(map_per_item, config, object_name, iterations)
+        after = measure(map_compiled, config, object_name, iterations)
+        print(f"{object_name:<12}{before:>22,.0f}{after:>22,.0f}{after / before:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,56 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""Compares the time to drop the duplicated documents with unique_everseen, which compares the unhashable
+documents with each other, and with the filter keyed on the type and id of the documents.
+
+    A tenth of the documents are fetched twice, like the events overlapping the time ranges of two work units.
+    unique_everseen is quadratic and takes seconds for a thousand documents, so it is only measured up to the
+    given number of documents.
+
+    Run it from the tests directory:
+    python benchmark_document_key_filter.py [max documents of unique_everseen]
+"""
+import sys
+import time
+
+import support  # noqa: F401 adds the connector to the path
+from ees_microsoft_outlook.deduplication import DocumentKeyFilter
+from ees_microsoft_outlook.document_record import DocumentRecord
+from iteration_utilities import unique_everseen
+
+SIZES = (1000, 10000, 100000, 1000000)
+
+
+def create_documents(count):
+    """Returns the documents of the work units, where a tenth of the documents are fetched twice"""
+    documents = [
+        DocumentRecord(permissions=[], type="Calendar", id=f"AAMkAGQ2ZTc0{index:012d}", title=f"Event {index}")
+        for index in range(count - count // 10)
+    ]
+    return documents + documents[: count // 10]
+
+
+def measure(func, documents):
+    """Returns the time in seconds to drop the duplicated documents"""
+    start = time.perf_counter()
+    func(documents)
+    return time.perf_counter() - start
+
+
+def main(max_everseen_size):
+    print(f"{'documents':>10}{'unique_everseen (s)':>22}{'key filter (s)':>18}")
+    for size in SIZES:
+        documents = create_documents(size)
+        key_filter = f"{measure(lambda documents: DocumentKeyFilter().filter(documents), documents):>18.3f}"
+        if size <= max_everseen_size:
+            everseen = f"{measure(lambda documents: list(unique_everseen(documents)), documents):>22.3f}"
+        else:
+            everseen = f"{'skipped':>22}"
+        print(f"{size:>10,}{everseen}{key_filter}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,85 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""Compares the memory of the queued documents held as dictionaries and as records, and the time to build them.
+
+    The values of the fields are allocated before the measure, so that only the containers of the documents
+    are measured, which is the overhead of the pipeline on top of the text of the documents.
+
+    Run it from the tests directory:
+    python benchmark_document_records.py [documents]
+"""
+import sys
+import time
+import tracemalloc
+
+import support  # noqa: F401 adds the connector to the path
+from ees_microsoft_outlook.document_record import DocumentRecord
+
+
+def build_dicts(values):
+    """Builds the documents of the mails as dictionaries"""
+    return [
+        {
+            "_allow_permissions": permissions,
+            "type": "Inbox Mails",
+            "id": document_id,
+            "title": title,
+            "body": body,
+            "created_at": created_at,
+        }
+        for document_id, title, body, created_at, permissions in values
+    ]
+
+
+def build_records(values):
+    """Builds the documents of the mails as records"""
+    return [
+        DocumentRecord(
+            permissions=permissions,
+            type="Inbox Mails",
+            id=document_id,
+            title=title,
+            body=body,
+            created_at=created_at,
+        )
+        for document_id, title, body, created_at, permissions in values
+    ]
+
+
+def measure(func, values):
+    """Returns the memory in MB held by the documents and the time in ms to build them
+    :param func: Function building the documents
+    :param values: Values of the fields of the documents
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    documents = func(values)
+    elapsed = (time.perf_counter() - start) * 1000
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del documents
+    return size / 1024 / 1024, elapsed
+
+
+def main(count):
+    values = [
+        (
+            f"AAMkAGQ2ZTc0{index:012d}",
+            f"Subject {index}",
+            f"Sender Email: sender{index}@xyz.com\nBody: mail {index}",
+            "2022-04-21T12:12:30Z",
+            [f"user{index % 100}@xyz.com"],
+        )
+        for index in range(count)
+    ]
+    print(f"{'container':<12}{f'MB per {count:,} documents':>28}{'build (ms)':>14}")
+    for name, func in (("dict", build_dicts), ("record", build_records)):
+        size, elapsed = measure(func, values)
+        print(f"{name:<12}{size:>28.1f}{elapsed:>14.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
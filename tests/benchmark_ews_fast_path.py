@@ -0,0 +1,90 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""Compares the time to parse a GetItem response into mails with the fast path and with exchangelib.
+
+    The response is built from the mail of the recorded response of the fast path tests, repeated with
+    distinct ids, bodies and recipients.
+
+    Run it from the tests directory:
+    python benchmark_ews_fast_path.py [mails]
+"""
+import io
+import logging
+import statistics
+import sys
+import time
+
+import support  # noqa: F401 adds the connector to the path
+from ees_microsoft_outlook.ews_fast_path import M_ITEMS, parse_get_item_response
+from exchangelib.items import Message
+from exchangelib.util import to_xml
+
+MESSAGE = """<t:Message>
+  <t:ItemId Id="AAMkAD{index:08d}" ChangeKey="CQAAABYA{index:08d}"/>
+  <t:Subject>Weekly report {index}</t:Subject>
+  <t:Body BodyType="HTML">&lt;html&gt;&lt;body&gt;{body}&lt;/body&gt;&lt;/html&gt;</t:Body>
+  <t:Importance>Normal</t:Importance>
+  <t:Categories><t:String>Reports</t:String></t:Categories>
+  <t:HasAttachments>false</t:HasAttachments>
+  <t:LastModifiedTime>2022-04-21T12:12:30Z</t:LastModifiedTime>
+  <t:Sender><t:Mailbox><t:Name>abc</t:Name><t:EmailAddress>abc{index}@xyz.com</t:EmailAddress></t:Mailbox></t:Sender>
+  <t:ToRecipients>
+    <t:Mailbox><t:EmailAddress>pqr{index}@xyz.com</t:EmailAddress></t:Mailbox>
+    <t:Mailbox><t:EmailAddress>lmn{index}@xyz.com</t:EmailAddress></t:Mailbox>
+  </t:ToRecipients>
+  <t:InternetMessageId>&lt;{index}@xyz.com&gt;</t:InternetMessageId>
+</t:Message>"""
+
+RESPONSE = """<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+  <s:Body>
+    <m:GetItemResponse xmlns:m="http://schemas.microsoft.com/exchange/services/2006/messages"
+        xmlns:t="http://schemas.microsoft.com/exchange/services/2006/types">
+      <m:ResponseMessages>
+        <m:GetItemResponseMessage ResponseClass="Success">
+          <m:ResponseCode>NoError</m:ResponseCode>
+          <m:Items>{messages}</m:Items>
+        </m:GetItemResponseMessage>
+      </m:ResponseMessages>
+    </m:GetItemResponse>
+  </s:Body>
+</s:Envelope>"""
+
+
+def parse_with_fast_path(content):
+    """Parses the mails with the streaming parser of the fast path"""
+    return list(parse_get_item_response(io.BytesIO(content), logging.getLogger("benchmark")))
+
+
+def parse_with_exchangelib(content):
+    """Parses the mails into exchangelib messages, like the default path does"""
+    tree = to_xml(content)
+    return [Message.from_xml(element, None) for items in tree.iter(M_ITEMS) for element in items]
+
+
+def measure(func, content, iterations=5):
+    """Returns the median time in ms of a parse"""
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(content)
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def main(count):
+    body = "Lorem ipsum dolor sit amet. " * 40
+    content = RESPONSE.format(
+        messages="".join(MESSAGE.format(index=index, body=body) for index in range(count))
+    ).encode("utf-8")
+    assert len(parse_with_fast_path(content)) == len(parse_with_exchangelib(content)) == count
+    print(f"{'parser':<14}{f'ms per {count:,} mails':>24}")
+    for name, func in (("fast path", parse_with_fast_path), ("exchangelib", parse_with_exchangelib)):
+        print(f"{name:<14}{measure(func, content):>24.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
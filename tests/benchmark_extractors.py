@@ -0,0 +1,57 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""Compares the latency of the native extractors with Tika for each format.
+
+    Run it from the tests directory with a Tika server reachable, as configured for the connector:
+    python benchmark_extractors.py [iterations]
+"""
+import sys
+import time
+
+from support import create_docx, create_pptx, create_xlsx
+
+from ees_microsoft_outlook.extractors import get_native_extractor
+from ees_microsoft_outlook.utils import extract
+
+SAMPLES = {
+    "notes.txt": b"Quarterly report of the sales team.\n" * 2000,
+    "page.html": b"<html><body>" + b"<p>Quarterly <b>report</b> of the sales team.</p>" * 2000 + b"</body></html>",
+    "users.csv": b"id,name,email\n" + b'1,"Doe, John",john@xyz.com\n' * 2000,
+    "data.json": b"[" + b",".join(b'{"id": 1, "name": "John Doe"}' for _ in range(2000)) + b"]",
+    "mail.eml": b"From: abc@xyz.com\nSubject: Report\nContent-Type: text/plain\n\n" + b"Quarterly report.\n" * 2000,
+    "report.docx": create_docx(["Quarterly report of the sales team."] * 2000),
+    "sheet.xlsx": create_xlsx(["Name", "Total"] * 1000, list(range(2000))),
+    "deck.pptx": create_pptx(["Quarterly report of the sales team."] * 200),
+}
+
+
+def measure(func, content, iterations):
+    """Returns the median latency in milliseconds of an extraction
+    :param func: Extraction function
+    :param content: Content to extract
+    :param iterations: Number of extractions
+    """
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(content)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies)[len(latencies) // 2]
+
+
+def main(iterations):
+    print(f"{'format':<12}{'native (ms)':>14}{'tika (ms)':>20}")
+    for name, content in SAMPLES.items():
+        native_latency = measure(get_native_extractor("", name), content, iterations)
+        try:
+            tika_latency = f"{measure(extract, content, iterations):.2f}"
+        except Exception as exception:
+            tika_latency = f"n/a ({type(exception).__name__})"
+        print(f"{name:<12}{native_latency:>14.2f}{tika_latency:>20}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
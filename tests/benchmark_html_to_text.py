@@ -0,0 +1,68 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""Compares the latency of the engines converting HTML to text on the usual shapes of email HTML.
+
+    Run it from the tests directory:
+    python benchmark_html_to_text.py [iterations]
+"""
+import sys
+import time
+
+import support  # noqa: F401 adds the connector to the path
+from ees_microsoft_outlook.html_text import HTML_ENGINES
+
+STYLE = "<style>" + "".join(f".c{index} {{ color: #{index:06x}; margin: 0; }}" for index in range(300)) + "</style>"
+
+NEWSLETTER_ROWS = "".join(
+    f'<tr><td style="padding:8px"><table><tr><td class="c{index}"><a href="https://xyz.com/{index}">'
+    f'<img src="https://xyz.com/{index}.png"/>Article {index}</a><p>Summary of the article {index} '
+    "with a few sentences of text.</p></td></tr></table></td></tr>"
+    for index in range(200)
+)
+THREAD_REPLIES = "".join(
+    f'<div>Reply number {index}, see below.</div><hr><div id="divRplyFwdMsg"><b>From:</b> user{index}@xyz.com'
+    '<br><b>Sent:</b> Monday</div><blockquote type="cite">'
+    for index in range(50)
+)
+PLAIN_LINES = "A line of a plain text mail.\n" * 2000
+
+CORPUS = {
+    # A short message written in Outlook
+    "short": "<html><head><style>p { margin: 0; }</style></head><body><div><p>Hi team,</p>"
+    "<p>The build is green.</p></div></body></html>",
+    # A newsletter made of nested tables with inline styles and tracking scripts
+    "newsletter": f"<html><head>{STYLE}</head><body><table>{NEWSLETTER_ROWS}</table>"
+    f"<script>{'track();' * 500}</script></body></html>",
+    # A long thread where each reply quotes the previous ones
+    "thread": f"<html><body>{THREAD_REPLIES}First message{'</blockquote>' * 50}</body></html>",
+    # A plain text mail converted to HTML by the client
+    "plain": f"<html><body><pre>{PLAIN_LINES}</pre></body></html>",
+}
+
+
+def measure(func, content, iterations):
+    """Returns the median latency in milliseconds of a conversion
+    :param func: Conversion function
+    :param content: HTML to convert
+    :param iterations: Number of conversions
+    """
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(content, True)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies)[len(latencies) // 2]
+
+
+def main(iterations):
+    print(f"{'shape':<12}{'size (kB)':>10}" + "".join(f"{engine:>16}" for engine in HTML_ENGINES))
+    for shape, content in CORPUS.items():
+        latencies = [measure(func, content, iterations) for func in HTML_ENGINES.values()]
+        print(f"{shape:<12}{len(content) / 1024:>10.1f}" + "".join(f"{latency:>13.2f} ms" for latency in latencies))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
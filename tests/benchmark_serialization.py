@@ -0,0 +1,89 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+"""Compares the time to measure and encode the batches of documents sent to Workplace Search.
+
+    The previous pipeline serialized each document to measure it in the queue and in the batch, and the
+    Enterprise Search client serialized the batch again on each attempt. The documents are now encoded once,
+    with orjson when it is installed, and the body of a batch is the join of the encoded documents.
+
+    Run it from the tests directory:
+    python benchmark_serialization.py [documents]
+"""
+import json
+import sys
+import time
+from unittest.mock import patch
+
+import support  # noqa: F401 adds the connector to the path
+from ees_microsoft_outlook import serialization
+from ees_microsoft_outlook.batching import DocumentBatcher
+from ees_microsoft_outlook.document_record import DocumentRecord, to_dict
+
+BATCH_SIZE = 100
+MAX_BYTES = 10000000
+
+
+def get_json_size(document):
+    """Returns the size of a document serialized to JSON, as the previous pipeline measured it"""
+    return len(json.dumps(to_dict(document), ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"))
+
+
+def previous_pipeline(documents, attempts):
+    """Measures each document twice and serializes the batches on each attempt, like the client did"""
+    for document in documents:
+        get_json_size(document)
+    for index in range(0, len(documents), BATCH_SIZE):
+        batch = documents[index: index + BATCH_SIZE]
+        sum(get_json_size(document) for document in batch)
+        batch = [to_dict(document) for document in batch]
+        for _ in range(attempts):
+            json.dumps(batch, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def current_pipeline(documents, attempts):
+    """Estimates the documents in the queue and encodes them once into the bodies of the batches"""
+    for document in documents:
+        serialization.estimate_document_size(document)
+    batcher = DocumentBatcher(BATCH_SIZE, MAX_BYTES)
+    for document in documents:
+        batch = batcher.add(document)
+        if batch:
+            batch.get_body()
+
+
+def measure(func, documents, attempts):
+    """Returns the time in ms of a pipeline"""
+    start = time.perf_counter()
+    func(documents, attempts)
+    return (time.perf_counter() - start) * 1000
+
+
+def main(count):
+    documents = [
+        DocumentRecord(
+            permissions=[f"user{index % 100}@xyz.com"],
+            type="Inbox Mails",
+            id=f"AAMkAGQ2ZTc0{index:012d}",
+            title=f"Réunion {index}",
+            body=f"Sender Email: sender{index}@xyz.com\nBody: {'Lorem ipsum dolor sit amet. ' * 40}",
+            created_at="2022-04-21T12:12:30Z",
+        )
+        for index in range(count)
+    ]
+    encoders = [("json", None)]
+    if serialization.orjson:
+        encoders.append(("orjson", serialization.orjson))
+    print(f"{'pipeline':<24}{'attempts':>10}{f'ms per {count:,} documents':>28}")
+    for attempts in (1, 3):
+        print(f"{'previous':<24}{attempts:>10}{measure(previous_pipeline, documents, attempts):>28.1f}")
+        for name, orjson in encoders:
+            with patch.object(serialization, "orjson", orjson):
+                elapsed = measure(current_pipeline, documents, attempts)
+            print(f"{'encoded once, ' + name:<24}{attempts:>10}{elapsed:>28.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
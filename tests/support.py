@@ -3,8 +3,10 @@
 # or more contributor license agreements. Licensed under the Elastic License 2.0;
 # you may not use this file except in compliance with the Elastic License 2.0.
 #
+import io
 import os
 import sys
+import zipfile
 from collections import namedtuple
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -24,3 +26,59 @@ def get_args(command_name, *args):
 
     args.config_file = CONFIG_FILE
     return args
+
+
+def create_ooxml(parts):
+    """Creates the content of an Office Open XML document
+    :param parts: Dictionary of the names and the XML content of the parts of the document
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, xml in parts.items():
+            archive.writestr(name, xml)
+    return buffer.getvalue()
+
+
+def create_docx(paragraphs):
+    """Creates the content of a Word document
+    :param paragraphs: Texts of the paragraphs of the document
+    """
+    body = "".join(f"<w:p><w:r><w:t>{paragraph}</w:t></w:r></w:p>" for paragraph in paragraphs)
+    return create_ooxml(
+        {
+            "word/document.xml": '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{body}</w:body></w:document>"
+        }
+    )
+
+
+def create_xlsx(shared_strings, numbers):
+    """Creates the content of an Excel workbook with one sheet
+    :param shared_strings: Strings of the cells of the first row
+    :param numbers: Numbers of the cells of the second row
+    """
+    namespace = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    strings = "".join(f"<si><t>{string}</t></si>" for string in shared_strings)
+    string_cells = "".join(f'<c t="s"><v>{index}</v></c>' for index in range(len(shared_strings)))
+    number_cells = "".join(f"<c><v>{number}</v></c>" for number in numbers)
+    return create_ooxml(
+        {
+            "xl/sharedStrings.xml": f'<sst xmlns="{namespace}">{strings}</sst>',
+            "xl/worksheets/sheet1.xml": f'<worksheet xmlns="{namespace}"><sheetData>'
+            f"<row>{string_cells}</row><row>{number_cells}</row></sheetData></worksheet>",
+        }
+    )
+
+
+def create_pptx(slides):
+    """Creates the content of a PowerPoint presentation with one paragraph per slide
+    :param slides: Texts of the slides of the presentation
+    """
+    return create_ooxml(
+        {
+            f"ppt/slides/slide{index}.xml": '<p:sld xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" '
+            'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+            f"<a:p><a:r><a:t>{slide}</a:t></a:r></a:p></p:sld>"
+            for index, slide in enumerate(slides, 1)
+        }
+    )
@@ -0,0 +1,48 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+from ees_microsoft_outlook.adaptive_batching import MIN_SAMPLES, AdaptiveBatchSize
+
+
+def test_batches_shrink_on_errors_and_slow_requests():
+    """Test method to check that the batches are halved by an overloaded request, are not resized by other
+    errors, and shrink by a quarter once the 95th percentile of the latencies is above the target"""
+    # Setup
+    batch_size = AdaptiveBatchSize(100, 10000000, 20)
+
+    # Execute
+    resized_by_overload = batch_size.record_failure(True)
+    resized_by_error = batch_size.record_failure(False)
+    sizes_after_errors = (batch_size.max_documents, batch_size.max_bytes)
+    for _ in range(MIN_SAMPLES - 1):
+        batch_size.record_success(1)
+    resized_by_latency = batch_size.record_success(30)
+
+    # Assert
+    assert (resized_by_overload, resized_by_error, resized_by_latency) == (True, False, True)
+    assert sizes_after_errors == (50, 5000000)
+    assert (batch_size.max_documents, batch_size.max_bytes) == (37, 3750000)
+    assert batch_size.get_metrics()["shrinks"] == 2
+
+
+def test_batches_grow_back_up_to_the_largest_size():
+    """Test method to check that the batches grow once enough requests are fast and successful, up to the size
+    they started at, and that the smallest batches grow too"""
+    # Setup
+    batch_size = AdaptiveBatchSize(100, 10000000, 20)
+    for _ in range(10):
+        batch_size.record_failure(True)
+    smallest_sizes = (batch_size.max_documents, batch_size.max_bytes)
+
+    # Execute
+    for _ in range(MIN_SAMPLES * 40):
+        batch_size.record_success(1)
+
+    # Assert
+    assert smallest_sizes == (1, 256 * 1024)
+    assert (batch_size.max_documents, batch_size.max_bytes) == (100, 10000000)
+    assert batch_size.get_metrics()["p95_latency"] == 1
+    assert batch_size.get_metrics()["error_rate"] == 0
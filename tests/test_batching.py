@@ -0,0 +1,55 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import json
+
+from ees_microsoft_outlook.batching import DocumentBatcher
+from ees_microsoft_outlook.utils import get_document_size
+
+
+def test_batches_are_bounded_in_documents_and_bytes():
+    """Test method to check that a batch is closed once it holds the maximum number of documents or its body the
+    maximum number of bytes, and that a document larger than a batch is truncated"""
+    # Setup
+    batcher = DocumentBatcher(3, 100)
+    documents = [{"id": str(index), "body": "a" * 10} for index in range(4)]
+    large_document = {"id": "4", "body": "b" * 200}
+    document_size = get_document_size(documents[0])
+
+    # Execute
+    closed_batches = [batcher.add(document) for document in documents]
+    closed_batches.append(batcher.add(large_document))
+    last_batch = batcher.flush()
+
+    # Assert
+    assert [batch and len(batch.documents) for batch in closed_batches] == [None, None, None, 3, 1]
+    assert closed_batches[3].size == len(closed_batches[3].get_body()) == 3 * document_size + 4
+    assert json.loads(closed_batches[3].get_body()) == documents[:3]
+    assert last_batch.documents == [large_document]
+    assert large_document["body_truncated"] == "true"
+    assert json.loads(last_batch.get_body()) == [large_document]
+    assert last_batch.size == get_document_size(large_document) + 2 <= 100
+
+
+def test_checkpoint_is_released_with_the_documents_received_before_it():
+    """Test method to check that a checkpoint is released along with the batch of the documents received before
+    it, or at once if no document is waiting"""
+    # Setup
+    batcher = DocumentBatcher(2, 1000)
+
+    # Execute
+    released_batch = batcher.add_checkpoint({"object_type": "mails"})
+    batcher.add({"id": "1", "type": "Calendar"})
+    pending_batch = batcher.add_checkpoint({"object_type": "calendar"})
+    batcher.add({"id": "2", "type": "Contacts"})
+    closed_batch = batcher.add({"id": "3", "type": "Contacts"})
+
+    # Assert
+    assert released_batch.documents == []
+    assert released_batch.checkpoints == [{"object_type": "mails"}]
+    assert pending_batch is None
+    assert [document["id"] for document in closed_batch.documents] == ["1", "2"]
+    assert closed_batch.checkpoints == [{"object_type": "calendar"}]
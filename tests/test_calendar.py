@@ -34,8 +34,8 @@ def create_calendar_obj():
     return MicrosoftOutlookCalendar(logger, config)
 
 
-def test_get_calendar():
-    """Test method to get calendars from Microsoft Outlook"""
+def test_get_folder_calendar():
+    """Test method to get the calendar events of a calendar folder from Microsoft Outlook"""
     calendar_response = {
         "_allow_permissions": [],
         "type": "Calendar",
@@ -77,7 +77,6 @@ Descriptions: demo calendar event\n",
         },
     ]
     account = Mock()
-    account_list = [account]
     account.primary_smtp_address = "abc@xyz.com"
     calendar_obj = create_calendar_obj()
     calendar_obj.calendar_to_docs = Mock(
@@ -86,8 +85,8 @@ Descriptions: demo calendar event\n",
     start_date = "2022-04-21T12:10:00Z"
     end_date = "2022-04-21T12:13:00Z"
     account.calendar.filter().only = Mock(return_value=[Mock()])
-    source_calendar_events = calendar_obj.get_calendar(
-        [], account_list, start_date, end_date
+    source_calendar_events = calendar_obj.get_folder_calendar(
+        [], account, account.calendar, start_date, end_date
     )
     assert expected_calendar_events == source_calendar_events
 
@@ -129,7 +128,6 @@ def test_calendar_to_docs():
         }
     ]
     microsoft_outlook_cal_obj = create_calendar_obj()
-    microsoft_outlook_cal_obj.time_zone = EWSTimeZone("Asia/Calcutta")
     calendar_obj = CalendarItem(
         required_attendees=[Mock()],
         type="RecurringMaster",
@@ -154,7 +152,7 @@ def test_calendar_to_docs():
         source_calendar,
         source_calendar_attachments,
     ) = microsoft_outlook_cal_obj.calendar_to_docs(
-        [], calendar_obj, "abc@xyz.com", calendar_obj.start, calendar_obj.end, ""
+        [], calendar_obj, "abc@xyz.com", EWSTimeZone("Asia/Calcutta"), calendar_obj.start, calendar_obj.end, ""
     )
     assert expected_calendar_document == source_calendar
     assert expected_attachments_documents == source_calendar_attachments
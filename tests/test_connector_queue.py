@@ -7,6 +7,8 @@
 import logging
 import os
 import sys
+import threading
+import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
@@ -72,3 +74,101 @@ def test_append_to_queue():
 
     # Assert
     assert current_message == expected_message
+
+
+def test_put_waits_for_the_consumers_once_the_queue_is_full():
+    """Tests that a producer waits while the queue holds the maximum number of items or bytes, and that an item
+    larger than the byte limit is accepted by an empty queue"""
+    # Setup
+    queue = ConnectorQueue(logging.getLogger("unit_test_connector_queue"), max_items=2, max_bytes=100)
+    queue.put("first", 10)
+    queue.put("second", 10)
+    producer = threading.Thread(target=queue.put, args=("third", 10))
+
+    # Execute
+    producer.start()
+    time.sleep(0.1)
+    blocked = producer.is_alive()
+    first_item = queue.get()
+    producer.join(1)
+    queue.get()
+    queue.get()
+    queue.put("oversized", 1000)
+    metrics = queue.get_metrics()
+
+    # Assert
+    assert blocked
+    assert first_item == "first"
+    assert not producer.is_alive()
+    assert metrics["depth"] == 1
+    assert metrics["depth_bytes"] == 1000
+    assert metrics["max_depth"] == 2
+    assert metrics["blocked_puts"] == 1
+    assert metrics["put_wait_time"] > 0
+
+
+def test_close_releases_the_producers():
+    """Tests that the producers waiting on a full queue are released once the consumers are stopped"""
+    # Setup
+    queue = ConnectorQueue(logging.getLogger("unit_test_connector_queue"), max_items=1)
+    queue.append_to_queue("mails", [{"id": "1", "type": "Inbox Mails"}])
+    producer = threading.Thread(target=queue.end_signal)
+    producer.start()
+
+    # Execute
+    queue.close()
+    producer.join(1)
+
+    # Assert
+    assert not producer.is_alive()
+    assert queue.qsize() == 2
+
+
+def test_spill_keeps_the_order_of_the_items(tmp_path):
+    """Tests that the items not fitting in memory are written to the disk and read back in order, and that the
+    next items go to the disk until the consumers read the items of the disk"""
+    # Setup
+    queue = ConnectorQueue(
+        logging.getLogger("unit_test_connector_queue"), max_items=1, spill_path=str(tmp_path)
+    )
+
+    # Execute
+    queue.append_to_queue("mails", [{"id": "1", "type": "Inbox Mails"}])
+    queue.append_to_queue("mails", [{"id": "2", "type": "Inbox Mails"}])
+    queue.put_checkpoint("mails", "2022-04-21T12:12:30Z", "full")
+    spilled_depth = queue.get_metrics()["spilled_depth"]
+    items = [queue.get() for _ in range(3)]
+    queue.end_signal()
+
+    # Assert
+    assert spilled_depth == 2
+    assert [item["type"] for item in items] == ["mails", "mails", "checkpoint"]
+    assert [item["data"][0]["id"] for item in items[:2]] == ["1", "2"]
+    assert queue.get() == {"type": "signal_close"}
+    assert queue.get_metrics()["spilled_items"] == 2
+    assert os.listdir(tmp_path) == []
+
+
+def test_spill_is_resumed_by_the_next_run(tmp_path):
+    """Tests that the items left on the disk by a stopped run are read first by the next run, without the end
+    signals of the stopped run"""
+    # Setup
+    logger = logging.getLogger("unit_test_connector_queue")
+    stopped_queue = ConnectorQueue(logger, max_items=1, spill_path=str(tmp_path))
+    stopped_queue.append_to_queue("mails", [{"id": "1", "type": "Inbox Mails"}])
+    stopped_queue.append_to_queue("mails", [{"id": "2", "type": "Inbox Mails"}])
+    stopped_queue.end_signal()
+    with open(os.path.join(tmp_path, os.listdir(tmp_path)[0]), "ab") as segment_file:
+        # An item cut by the end of the stopped run
+        segment_file.write(b"\x00\x00\x01\x00\x78")
+
+    # Execute
+    queue = ConnectorQueue(logger, max_items=1, spill_path=str(tmp_path))
+    queue.append_to_queue("calendar", [{"id": "3", "type": "Calendar"}])
+    queue.end_signal()
+    items = [queue.get() for _ in range(3)]
+
+    # Assert
+    assert [item["data"][0]["id"] for item in items[:2]] == ["2", "3"]
+    assert items[2] == {"type": "signal_close"}
+    assert queue.qsize() == 0
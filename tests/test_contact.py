@@ -34,8 +34,8 @@ def create_contact_obj():
     return MicrosoftOutlookContacts(logger, config)
 
 
-def test_get_contacts():
-    """Test method to get contacts from Microsoft Outlook"""
+def test_get_account_contacts():
+    """Test method to get the contacts of an account from Microsoft Outlook"""
     contact_response = {
         "_allow_permissions": [],
         "type": "Contacts",
@@ -57,7 +57,6 @@ def test_get_contacts():
     account = Mock()
     account.root = MagicMock()
     account.primary_smtp_address = "abc@xyz.com"
-    account_list = [account]
     microsoft_outlook_con_obj = create_contact_obj()
     microsoft_outlook_con_obj.convert_contacts_to_workplace_search_documents = Mock(
         return_value=(contact_response)
@@ -68,8 +67,8 @@ def test_get_contacts():
     updated_account.all().filter().only = Mock(
         return_value=[Mock(spec_set=exchangelib.items.contact.Contact)]
     )
-    source_contacts = microsoft_outlook_con_obj.get_contacts(
-        [], account_list, start_date, end_date
+    source_contacts = microsoft_outlook_con_obj.get_account_contacts(
+        [], account, start_date, end_date
     )
 
     assert expected_contacts == source_contacts
@@ -87,7 +86,6 @@ def test_convert_contact_to_workplace_search_document():
         "Created": "2022-04-11"
     }
     microsoft_outlook_con_obj = create_contact_obj()
-    microsoft_outlook_con_obj.time_zone = EWSTimeZone("Asia/Calcutta")
     contact_obj = Contact(
         email_addresses=[Mock()],
         phone_numbers=[Mock()],
@@ -101,7 +99,7 @@ def test_convert_contact_to_workplace_search_document():
     contact_obj.phone_numbers[0].phone_number = "123456789"
     source_contact = (
         microsoft_outlook_con_obj.convert_contacts_to_workplace_search_documents(
-            contact_obj
+            contact_obj, EWSTimeZone("Asia/Calcutta")
         )
     )
     assert expected_contact == source_contact
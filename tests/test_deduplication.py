@@ -0,0 +1,413 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import logging
+import os
+from unittest.mock import Mock, PropertyMock
+
+import pytest
+import requests
+from ees_microsoft_outlook.configuration import Configuration
+from ees_microsoft_outlook.deduplication import DocumentDeduplicator
+from ees_microsoft_outlook.extraction import ExtractionStage
+from ees_microsoft_outlook.extraction_cache import get_content_digest
+from ees_microsoft_outlook.microsoft_outlook_calendar import MicrosoftOutlookCalendar
+from ees_microsoft_outlook.microsoft_outlook_mails import MAIL_TYPES, MicrosoftOutlookMails
+from exchangelib.ewsdatetime import EWSDateTime, EWSTimeZone
+
+logger = logging.getLogger("unit_test_deduplication")
+
+
+def settings():
+    """This function loads configuration from the file and returns it"""
+    return Configuration(
+        file_name=os.path.join(os.path.dirname(__file__), "config", "microsoft_outlook_connector.yml")
+    )
+
+
+def create_mail_obj(message_deduplicator):
+    """This function create object of MicrosoftOutlookMails class in the dedup mode"""
+    config = settings()
+    config._Configuration__configurations["enable_message_dedup"] = True
+    mail_obj = MicrosoftOutlookMails(logger, config, message_deduplicator=message_deduplicator)
+    mail_obj.mails_to_docs = Mock(
+        side_effect=lambda ids_list, mail_type, mail, *args: (
+            {
+                "type": mail_type,
+                "Id": mail.message_id,
+                "DisplayName": "Quarterly results",
+                "Description": "Body: results",
+                "Created": "2022-04-21T12:12:30Z",
+            },
+            [{"type": "Mails Attachments", "id": f"{mail.message_id}/0", "_allow_permissions": []}],
+        )
+    )
+    return mail_obj
+
+
+def fetch_copies(mail_obj, copies):
+    """Fetches the copies of the mails from the mailboxes holding them
+    :param mail_obj: Object of MicrosoftOutlookMails
+    :param copies: List of tuples of the mailbox and the internet message id of a copy
+    """
+    documents = []
+    for mailbox, message_id in copies:
+        account = Mock()
+        account.primary_smtp_address = mailbox
+        documents.extend(
+            mail_obj.get_mail_documents(
+                account,
+                [],
+                "Inbox Mails",
+                [Mock(id=f"{mailbox}-{message_id}", message_id=message_id)],
+                EWSDateTime(2022, 4, 11, 2, 13, 00),
+                EWSDateTime(2022, 4, 13, 2, 13, 00),
+            )
+        )
+    return documents
+
+
+def create_deduplicator(tmp_path, membership_path=None, name="membership"):
+    """This function creates a DocumentDeduplicator indexing the documents with permissions"""
+    return DocumentDeduplicator(
+        logger, membership_path or str(tmp_path / f"{name}.json"), True, str(tmp_path / f"{name}_spill")
+    )
+
+
+def flush_documents(deduplicator, replace_membership=False, holders=None):
+    """Returns the documents indexed again at the end of the run, in their order"""
+    return [
+        document
+        for documents in deduplicator.flush(replace_membership=replace_membership, holders=holders)
+        for document in documents
+    ]
+
+
+def test_mail_held_by_several_mailboxes_is_indexed_once(tmp_path):
+    """Test method to check that the first copy of a mail is indexed right away, and indexed again as one
+    document with the permissions of all the mailboxes at the end of the run"""
+    # Setup
+    message_deduplicator = create_deduplicator(tmp_path)
+    mail_obj = create_mail_obj(message_deduplicator)
+
+    # Execute
+    fetched_documents = fetch_copies(
+        mail_obj, [("sender@xyz.com", "<1@xyz.com>"), ("abc@xyz.com", "<1@xyz.com>"), ("pqr@xyz.com", "<1@xyz.com>")]
+    )
+    documents = flush_documents(message_deduplicator)
+
+    # Assert
+    assert mail_obj.mails_to_docs.call_count == 1
+    assert [document["id"] for document in fetched_documents] == ["<1@xyz.com>", "<1@xyz.com>/0"]
+    for document in fetched_documents:
+        assert document["_allow_permissions"] == ["sender@xyz.com"]
+    assert [document["id"] for document in documents] == ["<1@xyz.com>", "<1@xyz.com>/0"]
+    for document in documents:
+        assert document["_allow_permissions"] == ["abc@xyz.com", "pqr@xyz.com", "sender@xyz.com"]
+    assert flush_documents(message_deduplicator) == []
+
+
+def fail_after(items):
+    """Yields the items of a page fetched before the next page fails"""
+    yield from items
+    raise requests.exceptions.RequestException("Error while fetching the next page")
+
+
+def test_retried_work_unit_converts_the_items_claimed_by_its_failed_attempt(tmp_path):
+    """Test method to check that the mails claimed by a work unit failing on a page are converted again by the
+    retry of the unit"""
+    # Setup
+    message_deduplicator = create_deduplicator(tmp_path)
+    mail_obj = create_mail_obj(message_deduplicator)
+    mails = [Mock(id=f"abc@xyz.com-{message_id}", message_id=message_id) for message_id in ["<1@x>", "<2@x>", "<3@x>"]]
+    account = Mock(primary_smtp_address="abc@xyz.com")
+    account.inbox.all().filter().only = Mock(side_effect=[fail_after(mails[:2]), iter(mails)])
+
+    # Execute
+    with pytest.raises(requests.exceptions.RequestException):
+        mail_obj.get_folder_mails([], account, MAIL_TYPES[0], "2022-04-11T02:13:00Z", "2022-04-13T02:13:00Z")
+    documents = mail_obj.get_folder_mails(
+        [], account, MAIL_TYPES[0], "2022-04-11T02:13:00Z", "2022-04-13T02:13:00Z"
+    )
+
+    # Assert
+    assert [document["id"] for document in documents[::2]] == ["<1@x>", "<2@x>", "<3@x>"]
+    assert flush_documents(message_deduplicator) == []
+
+
+def test_membership_across_runs(tmp_path):
+    """Test method to check that an incremental sync keeps the mailboxes of the previous runs, while a full sync
+    and the deletion sync replace them, and that only the items whose mailboxes changed are indexed again"""
+    # Setup
+    membership_path = str(tmp_path / "membership.json")
+    first_run = create_deduplicator(tmp_path, membership_path)
+    fetch_copies(create_mail_obj(first_run), [("abc@xyz.com", "<1@xyz.com>"), ("pqr@xyz.com", "<1@xyz.com>")])
+    first_run.flush(replace_membership=True)
+    first_run.save()
+
+    # Execute
+    incremental_run = create_deduplicator(tmp_path, membership_path)
+    incremental_fetched = fetch_copies(create_mail_obj(incremental_run), [("xyz@xyz.com", "<1@xyz.com>")])
+    incremental_documents = flush_documents(incremental_run)
+    full_run = create_deduplicator(tmp_path, membership_path)
+    full_fetched = fetch_copies(
+        create_mail_obj(full_run), [("pqr@xyz.com", "<1@xyz.com>"), ("abc@xyz.com", "<2@xyz.com>")]
+    )
+    full_documents = flush_documents(full_run, replace_membership=True)
+    full_run.remove(["<1@xyz.com>"])
+    full_run.save()
+    deletion_run = create_deduplicator(tmp_path, membership_path)
+
+    # Assert
+    assert incremental_fetched[0]["_allow_permissions"] == ["abc@xyz.com", "pqr@xyz.com", "xyz@xyz.com"]
+    assert incremental_documents == []
+    assert [document["_allow_permissions"] for document in full_fetched[::2]] == [
+        ["abc@xyz.com", "pqr@xyz.com"],
+        ["abc@xyz.com"],
+    ]
+    assert [(document["id"], document["_allow_permissions"]) for document in full_documents] == [
+        ("<1@xyz.com>", ["pqr@xyz.com"]),
+        ("<1@xyz.com>/0", ["pqr@xyz.com"]),
+    ]
+    assert flush_documents(deletion_run) == []
+    deletion_run.save()
+    with open(membership_path, encoding="utf-8") as membership_file:
+        assert membership_file.read() == '{"<2@xyz.com>": ["abc@xyz.com"]}'
+
+
+def create_attachment(attachment_id, content):
+    """Creates a mock text attachment, modified in the time range of the tests"""
+    attachment = Mock()
+    attachment.attachment_id.id = attachment_id
+    attachment.name = "report.txt"
+    attachment.content_type = "text/plain"
+    attachment.size = len(content)
+    attachment.last_modified_time = EWSDateTime(2022, 4, 12, 2, 13, 00)
+    type(attachment).content = PropertyMock(return_value=content)
+    return attachment
+
+
+def test_attachment_held_by_several_mails_is_indexed_once(tmp_path):
+    """Test method to check that the same attachment held by mails of several mailboxes is indexed as one
+    document keyed by its content, indexed again with its extracted text and the permissions of all the
+    mailboxes at the end of the run, and referenced by every mail in the ids store"""
+    # Setup
+    config = settings()
+    config._Configuration__configurations["enable_attachment_dedup"] = True
+    attachment_deduplicator = create_deduplicator(tmp_path)
+    extraction_stage = ExtractionStage(logger, 1, 10, native_extraction=True)
+    mail_obj = MicrosoftOutlookMails(
+        logger, config, extraction_stage, attachment_deduplicator=attachment_deduplicator
+    )
+    ids_list = []
+    mails = [
+        ("abc@xyz.com", Mock(id="mail-1", attachments=[create_attachment("attachment-1", b"Quarterly results")])),
+        ("pqr@xyz.com", Mock(id="mail-2", attachments=[create_attachment("attachment-2", b"Quarterly results")])),
+    ]
+
+    # Execute
+    fetched_documents = [
+        mail_obj.get_mail_attachments(
+            ids_list,
+            mail,
+            mailbox,
+            EWSTimeZone("Asia/Calcutta"),
+            EWSDateTime(2022, 4, 11, 2, 13, 00),
+            EWSDateTime(2022, 4, 13, 2, 13, 00),
+        )
+        for mailbox, mail in mails
+    ]
+    documents = flush_documents(attachment_deduplicator)
+
+    # Assert
+    digest = get_content_digest(b"Quarterly results")
+    assert [[document["id"] for document in mail_documents] for mail_documents in fetched_documents] == [[digest], []]
+    assert fetched_documents[0][0]["_allow_permissions"] == ["abc@xyz.com"]
+    assert fetched_documents[0][0]["body"].result() == "Quarterly results"
+    assert len(documents) == 1
+    assert documents[0]["id"] == digest
+    assert documents[0]["_allow_permissions"] == ["abc@xyz.com", "pqr@xyz.com"]
+    assert documents[0]["body"] == "Quarterly results"
+    assert [(item["id"], item["parent id"]) for item in ids_list] == [(digest, "mail-1"), (digest, "mail-2")]
+
+
+def test_attachment_held_by_one_mailbox_is_not_indexed_again(tmp_path):
+    """Test method to check that an attachment held by several mails of the same mailbox is indexed once, with
+    no update at the end of the run"""
+    # Setup
+    config = settings()
+    config._Configuration__configurations["enable_attachment_dedup"] = True
+    attachment_deduplicator = create_deduplicator(tmp_path)
+    extraction_stage = ExtractionStage(logger, 1, 10, native_extraction=True)
+    mail_obj = MicrosoftOutlookMails(
+        logger, config, extraction_stage, attachment_deduplicator=attachment_deduplicator
+    )
+    mails = [
+        Mock(id="mail-1", attachments=[create_attachment("attachment-1", b"Quarterly results")]),
+        Mock(id="mail-2", attachments=[create_attachment("attachment-2", b"Quarterly results")]),
+    ]
+
+    # Execute
+    fetched_documents = [
+        document
+        for mail in mails
+        for document in mail_obj.get_mail_attachments(
+            [],
+            mail,
+            "abc@xyz.com",
+            EWSTimeZone("Asia/Calcutta"),
+            EWSDateTime(2022, 4, 11, 2, 13, 00),
+            EWSDateTime(2022, 4, 13, 2, 13, 00),
+        )
+    ]
+
+    # Assert
+    assert [document["_allow_permissions"] for document in fetched_documents] == [["abc@xyz.com"]]
+    assert flush_documents(attachment_deduplicator) == []
+
+
+def test_attachment_of_a_deduplicated_mail_gets_the_mailboxes_of_all_its_copies(tmp_path):
+    """Test method to check that the attachment of a mail held by several mailboxes is indexed again with the
+    mailboxes of the copies of the mail which are not converted"""
+    # Setup
+    config = settings()
+    config._Configuration__configurations["enable_message_dedup"] = True
+    config._Configuration__configurations["enable_attachment_dedup"] = True
+    message_deduplicator = create_deduplicator(tmp_path, name="messages")
+    attachment_deduplicator = create_deduplicator(tmp_path, name="attachments")
+    extraction_stage = ExtractionStage(logger, 1, 10, native_extraction=True)
+    mail_obj = MicrosoftOutlookMails(
+        logger, config, extraction_stage, message_deduplicator, attachment_deduplicator
+    )
+    fetched_documents = []
+
+    # Execute
+    for mailbox in ["abc@xyz.com", "pqr@xyz.com"]:
+        account = Mock(primary_smtp_address=mailbox, default_timezone=EWSTimeZone("Asia/Calcutta"))
+        mail = Mock(
+            id=f"{mailbox}-mail",
+            message_id="<1@xyz.com>",
+            sender=None,
+            to_recipients=None,
+            cc_recipients=None,
+            bcc_recipients=None,
+            last_modified_time=None,
+            categories=None,
+            importance="Normal",
+            subject="Quarterly results",
+            body="",
+            has_attachments=True,
+            attachments=[create_attachment(f"{mailbox}-attachment", b"Quarterly results")],
+        )
+        fetched_documents.extend(
+            mail_obj.get_mail_documents(
+                account,
+                [],
+                "Inbox Mails",
+                [mail],
+                EWSDateTime(2022, 4, 11, 2, 13, 00),
+                EWSDateTime(2022, 4, 13, 2, 13, 00),
+            )
+        )
+    message_documents = flush_documents(message_deduplicator)
+    attachment_documents = flush_documents(attachment_deduplicator, holders=message_deduplicator)
+
+    # Assert
+    digest = get_content_digest(b"Quarterly results")
+    assert [(document["id"], document["_allow_permissions"]) for document in fetched_documents] == [
+        ("<1@xyz.com>", ["abc@xyz.com"]),
+        (digest, ["abc@xyz.com"]),
+    ]
+    assert [(document["id"], document["_allow_permissions"]) for document in message_documents] == [
+        ("<1@xyz.com>", ["abc@xyz.com", "pqr@xyz.com"]),
+    ]
+    assert [(document["id"], document["_allow_permissions"]) for document in attachment_documents] == [
+        (digest, ["abc@xyz.com", "pqr@xyz.com"]),
+    ]
+
+
+def create_calendar_obj(meeting_deduplicator):
+    """This function create object of MicrosoftOutlookCalendar class in the dedup mode"""
+    config = settings()
+    config._Configuration__configurations["enable_meeting_dedup"] = True
+    calendar_obj = MicrosoftOutlookCalendar(logger, config, meeting_deduplicator=meeting_deduplicator)
+    calendar_obj.calendar_to_docs = Mock(
+        side_effect=lambda ids_list, calendar, *args: (
+            {
+                "type": "Calendar",
+                "Id": calendar_obj.get_calendar_id(calendar),
+                "DisplayName": "All hands",
+                "Description": "Organizer: organizer@xyz.com",
+                "Created": "2022-04-21T12:12:30Z",
+            },
+            [],
+        )
+    )
+    return calendar_obj
+
+
+def test_meeting_held_by_several_calendars_is_indexed_once(tmp_path):
+    """Test method to check that a meeting is indexed with the first calendar holding it and updated once with
+    the permissions of all the calendars of its attendees, while the occurrences of a recurring meeting are
+    indexed per calendar"""
+    # Setup
+    meeting_deduplicator = create_deduplicator(tmp_path)
+    calendar_obj = create_calendar_obj(meeting_deduplicator)
+    ids_list = []
+    documents = []
+
+    # Execute
+    for mailbox in ["organizer@xyz.com", "abc@xyz.com", "pqr@xyz.com"]:
+        account = Mock(primary_smtp_address=mailbox)
+        account.calendar.filter().only = Mock(
+            return_value=[
+                Mock(id=f"{mailbox}-meeting", uid="meeting-uid", type="Single"),
+                Mock(id=f"{mailbox}-occurrence", uid="series-uid", type="Occurrence"),
+            ]
+        )
+        documents.extend(
+            calendar_obj.get_folder_calendar(
+                ids_list, account, account.calendar, "2022-04-11T02:13:00Z", "2022-04-13T02:13:00Z"
+            )
+        )
+    meeting_documents = flush_documents(meeting_deduplicator)
+
+    # Assert
+    assert calendar_obj.calendar_to_docs.call_count == 4
+    assert [document["id"] for document in documents] == [
+        "meeting-uid",
+        "organizer@xyz.com-occurrence",
+        "abc@xyz.com-occurrence",
+        "pqr@xyz.com-occurrence",
+    ]
+    assert documents[0]["_allow_permissions"] == ["organizer@xyz.com"]
+    assert [document["id"] for document in meeting_documents] == ["meeting-uid"]
+    assert meeting_documents[0]["_allow_permissions"] == ["abc@xyz.com", "organizer@xyz.com", "pqr@xyz.com"]
+    assert [item["id"] for item in ids_list].count("meeting-uid") == 1
+
+
+def test_retried_calendar_unit_converts_the_meetings_claimed_by_its_failed_attempt(tmp_path):
+    """Test method to check that the meetings claimed by a calendar folder failing on a page are converted again
+    by the retry of the folder"""
+    # Setup
+    meeting_deduplicator = create_deduplicator(tmp_path)
+    calendar_obj = create_calendar_obj(meeting_deduplicator)
+    meetings = [Mock(id=f"abc@xyz.com-{uid}", uid=uid, type="Single") for uid in ["uid-1", "uid-2", "uid-3"]]
+    account = Mock(primary_smtp_address="abc@xyz.com")
+    account.calendar.filter().only = Mock(side_effect=[fail_after(meetings[:2]), iter(meetings)])
+
+    # Execute
+    with pytest.raises(requests.exceptions.RequestException):
+        calendar_obj.get_folder_calendar(
+            [], account, account.calendar, "2022-04-11T02:13:00Z", "2022-04-13T02:13:00Z"
+        )
+    documents = calendar_obj.get_folder_calendar(
+        [], account, account.calendar, "2022-04-11T02:13:00Z", "2022-04-13T02:13:00Z"
+    )
+
+    # Assert
+    assert [document["id"] for document in documents] == ["uid-1", "uid-2", "uid-3"]
+    assert flush_documents(meeting_deduplicator) == []
@@ -0,0 +1,63 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import os
+
+from ees_microsoft_outlook.configuration import Configuration
+from ees_microsoft_outlook.document_builder import compile_document_builder
+
+SOURCE_DOCUMENT = {
+    "type": "Inbox Mails",
+    "Id": "mail-1",
+    "DisplayName": "Quarterly results",
+    "Description": "Body: results",
+    "Created": "2022-04-21T12:12:30Z",
+}
+
+
+def settings():
+    """This function loads configuration from the file and returns it"""
+    return Configuration(
+        file_name=os.path.join(os.path.dirname(__file__), "config", "microsoft_outlook_connector.yml")
+    )
+
+
+def test_document_builder_maps_all_the_fields():
+    """Test method to check that the compiled builder maps every field of the schema with the permissions of
+    the mailbox and the type of the object"""
+    # Setup
+    config = settings()
+    config._Configuration__configurations["enable_document_permission"] = True
+    build_document = compile_document_builder(config, "mails")
+
+    # Execute
+    document = build_document(SOURCE_DOCUMENT, "abc@xyz.com")
+
+    # Assert
+    assert document == {
+        "_allow_permissions": ["abc@xyz.com"],
+        "type": "Inbox Mails",
+        "id": "mail-1",
+        "title": "Quarterly results",
+        "body": "Body: results",
+        "created_at": "2022-04-21T12:12:30Z",
+    }
+
+
+def test_document_builder_with_included_fields():
+    """Test method to check that the compiled builder keeps the included fields and the id, with the given
+    type and without permissions"""
+    # Setup
+    config = settings()
+    config._Configuration__configurations["enable_document_permission"] = False
+    config._Configuration__configurations["objects"]["tasks"]["include_fields"] = ["DisplayName"]
+    build_document = compile_document_builder(config, "tasks", "Tasks")
+
+    # Execute
+    document = build_document(dict(SOURCE_DOCUMENT, type="Mails"), "abc@xyz.com")
+
+    # Assert
+    assert document == {"_allow_permissions": [], "type": "Tasks", "title": "Quarterly results", "id": "mail-1"}
@@ -0,0 +1,64 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import pickle
+
+import pytest
+from ees_microsoft_outlook.document_record import DocumentRecord, to_dict
+from ees_microsoft_outlook.utils import get_document_size
+
+ATTACHMENT_DOCUMENT = {
+    "_allow_permissions": ["abc@xyz.com"],
+    "type": "Mails Attachments",
+    "id": "987654321",
+    "title": "report.txt",
+    "created": "2022-04-22T10:11:38Z",
+    "body": "Quarterly results",
+}
+
+
+def test_record_fields_are_read_and_written_as_document_keys():
+    """Test method to check that the fields of a record are accessed with the keys of the Workplace Search
+    document, and that only the fields set on the record are part of the document"""
+    # Setup
+    record = DocumentRecord(permissions=[], type="Tasks", id="123", title="Review the budget")
+
+    # Execute
+    record["body"] = "Due Date: 2022-04-22"
+    record["_allow_permissions"] = ["abc@xyz.com"]
+
+    # Assert
+    assert record["id"] == "123"
+    assert record.permissions == ["abc@xyz.com"]
+    assert "body" in record
+    assert "created_at" not in record
+    assert record.get("created_at") is None
+    with pytest.raises(KeyError):
+        record["created_at"]
+    with pytest.raises(KeyError):
+        record["unknown"] = "value"
+    assert to_dict(record) == {
+        "_allow_permissions": ["abc@xyz.com"],
+        "type": "Tasks",
+        "id": "123",
+        "title": "Review the budget",
+        "body": "Due Date: 2022-04-22",
+    }
+
+
+def test_record_round_trip():
+    """Test method to check that a record is converted from and to the dictionary of its document, pickled
+    through the queue and sized as its document"""
+    # Execute
+    record = DocumentRecord.from_dict(ATTACHMENT_DOCUMENT)
+    unpickled_record = pickle.loads(pickle.dumps(record))
+
+    # Assert
+    assert record.to_dict() == ATTACHMENT_DOCUMENT
+    assert record == ATTACHMENT_DOCUMENT
+    assert unpickled_record == record
+    assert not hasattr(record, "__dict__")
+    assert get_document_size(record) == get_document_size(ATTACHMENT_DOCUMENT)
@@ -0,0 +1,158 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import io
+import logging
+import os
+from unittest.mock import Mock, patch
+
+from ees_microsoft_outlook.configuration import Configuration
+from ees_microsoft_outlook.ews_fast_path import (EWSFastPath,
+                                                 parse_find_item_response,
+                                                 parse_get_item_response)
+from ees_microsoft_outlook.microsoft_outlook_mails import MicrosoftOutlookMails
+from exchangelib.ewsdatetime import EWSDateTime, EWSTimeZone
+
+FIND_ITEM_RESPONSE = b"""<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+  <s:Body>
+    <m:FindItemResponse xmlns:m="http://schemas.microsoft.com/exchange/services/2006/messages"
+        xmlns:t="http://schemas.microsoft.com/exchange/services/2006/types">
+      <m:ResponseMessages>
+        <m:FindItemResponseMessage ResponseClass="Success">
+          <m:ResponseCode>NoError</m:ResponseCode>
+          <m:RootFolder IndexedPagingOffset="2" TotalItemsInView="2" IncludesLastItemInRange="true">
+            <t:Items>
+              <t:Message><t:ItemId Id="AAMkADAx" ChangeKey="CQAAABYA"/></t:Message>
+              <t:Message><t:ItemId Id="AAMkADAy" ChangeKey="CQAAABYB"/></t:Message>
+            </t:Items>
+          </m:RootFolder>
+        </m:FindItemResponseMessage>
+      </m:ResponseMessages>
+    </m:FindItemResponse>
+  </s:Body>
+</s:Envelope>"""
+
+GET_ITEM_RESPONSE = b"""<?xml version="1.0" encoding="utf-8"?>
+<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">
+  <s:Body>
+    <m:GetItemResponse xmlns:m="http://schemas.microsoft.com/exchange/services/2006/messages"
+        xmlns:t="http://schemas.microsoft.com/exchange/services/2006/types">
+      <m:ResponseMessages>
+        <m:GetItemResponseMessage ResponseClass="Success">
+          <m:ResponseCode>NoError</m:ResponseCode>
+          <m:Items>
+            <t:Message>
+              <t:ItemId Id="AAMkADAx" ChangeKey="CQAAABYA"/>
+              <t:Subject>demo for attachments</t:Subject>
+              <t:Body BodyType="HTML">&lt;html&gt;&lt;body&gt;demo body&lt;/body&gt;&lt;/html&gt;</t:Body>
+              <t:Importance>Normal</t:Importance>
+              <t:HasAttachments>false</t:HasAttachments>
+              <t:LastModifiedTime>2022-04-21T12:12:30Z</t:LastModifiedTime>
+              <t:Sender><t:Mailbox><t:Name>abc</t:Name><t:EmailAddress>abc@xyz.com</t:EmailAddress></t:Mailbox></t:Sender>
+              <t:ToRecipients>
+                <t:Mailbox><t:EmailAddress>pqr@xyz.com</t:EmailAddress></t:Mailbox>
+                <t:Mailbox><t:EmailAddress>lmn@xyz.com</t:EmailAddress></t:Mailbox>
+              </t:ToRecipients>
+            </t:Message>
+          </m:Items>
+        </m:GetItemResponseMessage>
+        <m:GetItemResponseMessage ResponseClass="Error">
+          <m:MessageText>The specified object was not found in the store.</m:MessageText>
+          <m:ResponseCode>ErrorItemNotFound</m:ResponseCode>
+          <m:Items/>
+        </m:GetItemResponseMessage>
+      </m:ResponseMessages>
+    </m:GetItemResponse>
+  </s:Body>
+</s:Envelope>"""
+
+
+def settings():
+    """This function loads configuration from the file and returns it along with retry_count setting."""
+    configuration = Configuration(
+        file_name=os.path.join(
+            os.path.join(os.path.dirname(__file__), "config"),
+            "microsoft_outlook_connector.yml",
+        )
+    )
+    logger = logging.getLogger("unit_test_ews_fast_path")
+    return configuration, logger
+
+
+def test_parse_find_item_response():
+    """Test method to parse the item ids from a recorded FindItem response"""
+    # Execute
+    item_ids, includes_last_item = parse_find_item_response(
+        io.BytesIO(FIND_ITEM_RESPONSE)
+    )
+
+    # Assert
+    assert item_ids == [("AAMkADAx", "CQAAABYA"), ("AAMkADAy", "CQAAABYB")]
+    assert includes_last_item
+
+
+def test_parse_get_item_response():
+    """Test method to parse the mails from a recorded GetItem response"""
+    # Setup
+    _, logger = settings()
+
+    # Execute
+    mail_records = list(
+        parse_get_item_response(io.BytesIO(GET_ITEM_RESPONSE), logger)
+    )
+
+    # Assert
+    assert len(mail_records) == 1
+    assert mail_records[0].id == "AAMkADAx"
+    assert mail_records[0].sender.email_address == "abc@xyz.com"
+    assert [
+        recipient.email_address for recipient in mail_records[0].to_recipients
+    ] == ["pqr@xyz.com", "lmn@xyz.com"]
+    assert mail_records[0].cc_recipients is None
+    assert mail_records[0].last_modified_time == EWSDateTime(
+        2022, 4, 21, 12, 12, 30, tzinfo=EWSTimeZone("UTC")
+    )
+
+
+@patch(
+    "ees_microsoft_outlook.microsoft_outlook_mails.change_datetime_format",
+    Mock(return_value="2022-04-21T12:12:30Z"),
+)
+def test_get_mail_documents_with_fast_path():
+    """Test method to convert the mails fetched by the fast path into documents"""
+    # Setup
+    config, logger = settings()
+    mails_obj = MicrosoftOutlookMails(logger, config)
+    fast_path = EWSFastPath(logger)
+    fast_path.post = Mock(
+        side_effect=lambda account, payload, parse: parse(
+            io.BytesIO(FIND_ITEM_RESPONSE if "FindItem" in payload else GET_ITEM_RESPONSE)
+        )
+    )
+    account = Mock()
+    account.primary_smtp_address = "abc@xyz.com"
+    account.default_timezone = EWSTimeZone("UTC")
+    start_time = EWSDateTime(2022, 4, 21, 12, 10, 0, tzinfo=EWSTimeZone("UTC"))
+    end_time = EWSDateTime(2022, 4, 21, 12, 13, 0, tzinfo=EWSTimeZone("UTC"))
+
+    # Execute
+    documents = mails_obj.get_mail_documents(
+        account,
+        [],
+        "Inbox Mails",
+        fast_path.get_mails(account, "inbox", start_time, end_time),
+        start_time,
+        end_time,
+    )
+
+    # Assert
+    assert len(documents) == 1
+    assert documents[0]["id"] == "AAMkADAx"
+    assert documents[0]["title"] == "demo for attachments"
+    assert documents[0]["created_at"] == "2022-04-21T12:12:30Z"
+    assert "Receiver Email: pqr@xyz.com, lmn@xyz.com" in documents[0]["body"]
+    assert "Body: demo body" in documents[0]["body"]
@@ -0,0 +1,138 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import logging
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+from ees_microsoft_outlook.extraction import ExtractionStage
+
+logger = logging.getLogger("unit_test_extraction")
+
+
+def test_documents_are_appended_after_extraction():
+    """Test method to check that the documents are appended to the queue once their attachments are extracted"""
+    # Setup
+    queue = Mock()
+    extraction_done = threading.Event()
+
+    def extract(content, timeout):
+        extraction_done.wait()
+        return content.decode()
+
+    stage = ExtractionStage(logger, 2, 60)
+
+    # Execute
+    with patch("ees_microsoft_outlook.extraction.extract", extract):
+        documents = [
+            {"id": "1", "type": "Inbox Mails", "body": "mail body"},
+            {"id": "2", "type": "Mails Attachments", "body": stage.submit(b"attachment body")},
+        ]
+        stage.append_to_queue(queue, "mails", documents)
+        appended_before_extraction = queue.append_to_queue.called
+        extraction_done.set()
+        stage.wait()
+
+    # Assert
+    assert not appended_before_extraction
+    queue.append_to_queue.assert_called_once_with(
+        "mails",
+        [
+            {"id": "1", "type": "Inbox Mails", "body": "mail body"},
+            {"id": "2", "type": "Mails Attachments", "body": "attachment body"},
+        ],
+    )
+
+
+@patch(
+    "ees_microsoft_outlook.extraction.extract",
+    Mock(side_effect=TimeoutError("Read timed out")),
+)
+def test_failed_extraction_is_indexed_without_body():
+    """Test method to check that an attachment which can not be extracted is indexed without body"""
+    # Setup
+    queue = Mock()
+    stage = ExtractionStage(logger, 1, 60)
+    documents = [{"id": "2", "type": "Tasks Attachments", "body": stage.submit(b"...")}]
+
+    # Execute
+    stage.append_to_queue(queue, "tasks", documents)
+    stage.wait()
+
+    # Assert
+    queue.append_to_queue.assert_called_once_with(
+        "tasks", [{"id": "2", "type": "Tasks Attachments", "body": None}]
+    )
+
+
+@patch("ees_microsoft_outlook.extraction.extract", Mock(return_value="attachment body"))
+def test_failed_append_releases_the_waiting_producers():
+    """Test method to check that the stage does not wait forever for documents which could not be queued, and
+    that closing the stage stops its pool of threads"""
+    # Setup
+    queue = Mock()
+    queue.append_to_queue.side_effect = RuntimeError("queue is closed")
+    stage = ExtractionStage(logger, 1, 60)
+    documents = [{"id": "2", "type": "Mails Attachments", "body": stage.submit(b"...")}]
+    waiter = threading.Thread(target=stage.wait)
+
+    # Execute
+    stage.append_to_queue(queue, "mails", documents)
+    waiter.start()
+    waiter.join(timeout=5)
+    stage.close()
+
+    # Assert
+    assert not waiter.is_alive()
+    with pytest.raises(RuntimeError):
+        stage.submit(b"...")
+
+
+def test_downloaded_attachments_are_bounded_by_the_pool():
+    """Test method to check that the attachments are downloaded on the pool of threads, and that the contents
+    downloaded ahead of their extraction wait for a slot of the pool"""
+    # Setup
+    extraction_done = threading.Event()
+    reading_threads = {}
+
+    def extract(content, timeout):
+        extraction_done.wait()
+        return content.decode()
+
+    def create_attachment(content):
+        attachment = Mock(content_type="text/plain", size=len(content))
+        type(attachment).content = property(lambda _: reading_threads.setdefault(content, threading.current_thread()) and content)
+        return attachment
+
+    stage = ExtractionStage(logger, 1, 60)
+    first_attachment = create_attachment(b"first")
+    second_attachment = create_attachment(b"second")
+    third_attachment = create_attachment(b"third")
+
+    # Execute
+    with patch("ees_microsoft_outlook.extraction.extract", extract):
+        _, content = stage.get_attachment_digest(first_attachment)
+        first_body = stage.submit_attachment(first_attachment, content=content)
+        second_digest = []
+        downloader = threading.Thread(
+            target=lambda: second_digest.append(stage.get_attachment_digest(second_attachment))
+        )
+        downloader.start()
+        downloader.join(timeout=0.2)
+        waiting_for_slot = downloader.is_alive()
+        third_body = stage.submit_attachment(third_attachment)
+        extraction_done.set()
+        downloader.join(timeout=5)
+        stage.release_content(second_digest[0][1])
+        bodies = [first_body.result(timeout=5), third_body.result(timeout=5)]
+    stage.close()
+
+    # Assert
+    assert waiting_for_slot
+    assert bodies == ["first", "third"]
+    assert reading_threads[b"first"] is threading.current_thread()
+    assert reading_threads[b"third"] is not threading.current_thread()
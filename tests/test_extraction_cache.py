@@ -0,0 +1,86 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import logging
+import os
+from unittest.mock import Mock, PropertyMock, patch
+
+from ees_microsoft_outlook.extraction import ExtractionStage
+from ees_microsoft_outlook.extraction_cache import (
+    AttachmentIndex,
+    ExtractionCache,
+    get_content_digest,
+)
+
+logger = logging.getLogger("unit_test_extraction_cache")
+
+
+def test_same_content_is_extracted_once(tmp_path):
+    """Test method to check that an attachment sent to several mailboxes is extracted once"""
+    # Setup
+    cache = ExtractionCache(logger, str(tmp_path), 1024 * 1024)
+    stage = ExtractionStage(logger, 1, 60, cache)
+    extract = Mock(return_value="attachment body")
+
+    # Execute
+    with patch("ees_microsoft_outlook.extraction.extract", extract):
+        bodies = [stage.extract(b"attachment content") for _ in range(3)]
+
+    # Assert
+    assert bodies == ["attachment body"] * 3
+    assert extract.call_count == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    """Test method to check that the least recently used entries are evicted once the cache is full"""
+    # Setup
+    cache = ExtractionCache(logger, str(tmp_path), 250)
+    digests = [get_content_digest(str(index).encode()) for index in range(3)]
+    cache.put(digests[0], "a" * 100)
+    cache.put(digests[1], "b" * 100)
+    entry_path = os.path.join(str(tmp_path), digests[0][:2], digests[0])
+    os.utime(entry_path, (0, 0))
+    os.utime(os.path.join(str(tmp_path), digests[1][:2], digests[1]), (1, 1))
+    cache.get(digests[0])
+
+    # Execute
+    cache.put(digests[2], "c" * 100)
+
+    # Assert
+    assert cache.get(digests[0]) == "a" * 100
+    assert cache.get(digests[1]) is None
+    assert cache.get(digests[2]) == "c" * 100
+    assert cache.evictions == 1
+
+
+def test_unchanged_attachment_is_not_downloaded_again(tmp_path):
+    """Test method to check that an unchanged attachment of a changed item is neither downloaded nor extracted again"""
+    # Setup
+    cache = ExtractionCache(logger, str(tmp_path / "cache"), 1024 * 1024)
+    attachment_index = AttachmentIndex(logger, str(tmp_path / "attachment_index.json"))
+    stage = ExtractionStage(logger, 1, 60, cache, attachment_index)
+    attachment = Mock(size=18, last_modified_time="2022-04-01T00:00:00Z", content_type="text/plain")
+    attachment.attachment_id.id = "attachment_1"
+    content = PropertyMock(return_value=b"attachment content")
+    type(attachment).content = content
+    extract = Mock(return_value="attachment body")
+
+    # Execute
+    with patch("ees_microsoft_outlook.extraction.extract", extract):
+        first_body = stage.submit_attachment(attachment).result()
+        stage.close()
+        second_stage = ExtractionStage(
+            logger, 1, 60, cache, AttachmentIndex(logger, str(tmp_path / "attachment_index.json"))
+        )
+        second_body = second_stage.submit_attachment(attachment).result()
+        attachment.size = 20
+        changed_body = second_stage.submit_attachment(attachment).result()
+
+    # Assert
+    assert first_body == second_body == changed_body == "attachment body"
+    assert content.call_count == 2
+    assert extract.call_count == 1
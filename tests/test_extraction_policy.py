@@ -0,0 +1,135 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import io
+import mmap
+import threading
+import logging
+from unittest.mock import MagicMock, Mock, PropertyMock, patch
+
+from ees_microsoft_outlook.extraction import ExtractionStage
+from ees_microsoft_outlook.extraction_policy import ExtractionPolicy
+
+logger = logging.getLogger("unit_test_extraction_policy")
+
+
+def create_attachment(name, content_type, content):
+    """Creates a mock attachment whose content can be read whole or streamed"""
+    attachment = Mock(content_type=content_type, size=len(content))
+    attachment.name = name
+    attachment.content_property = PropertyMock(return_value=content)
+    type(attachment).content = attachment.content_property
+    attachment.fp = MagicMock()
+    attachment.fp.__enter__.return_value = io.BytesIO(content)
+    return attachment
+
+
+@patch("ees_microsoft_outlook.extraction.extract", Mock(side_effect=lambda content, timeout: content.decode()))
+def test_extraction_policy_bounds_attachments():
+    """Test method to check that the attachments are skipped, streamed or truncated within the policy"""
+    # Setup
+    policy = ExtractionPolicy(
+        logger, {"max_size": 1, "denied_mime_types": ["video/*"], "max_text_length": 5}, 60
+    )
+    stage = ExtractionStage(logger, 1, 60, policies={"mails": policy})
+    video = create_attachment("movie.mp4", "video/mp4", b"...")
+    archive = create_attachment("archive.zip", "application/zip", b"0" * (1024 * 1024 + 1))
+    log = create_attachment("server.log", "text/x-log", b"a" * (1024 * 1024 + 1))
+    report = create_attachment("report.txt", "text/plain; charset=utf-8", b"abcdefgh")
+
+    # Execute
+    bodies = [
+        stage.submit_attachment(attachment, "mails").result()
+        for attachment in (video, archive, log, report)
+    ]
+
+    # Assert
+    assert bodies == [None, None, "aaaaa", "abcde"]
+    assert not video.fp.__enter__.called and not archive.fp.__enter__.called
+    assert log.fp.__enter__.called
+    assert not log.content_property.called
+
+
+def test_allowed_mime_types():
+    """Test method to check that only the allowed content types are extracted when the allow list is set"""
+    # Setup
+    policy = ExtractionPolicy(logger, {"allowed_mime_types": ["application/*"]}, 60)
+
+    # Execute and assert
+    assert policy.is_allowed(create_attachment("report.pdf", "application/pdf", b"..."))
+    assert not policy.is_allowed(create_attachment("photo.png", "image/png", b"..."))
+
+
+def test_large_attachment_is_spooled_to_a_memory_mapped_file():
+    """Test method to check that an attachment above the spool threshold is extracted from a memory-mapped file"""
+    # Setup
+    policy = ExtractionPolicy(logger, {}, 60, spool_threshold=16)
+    stage = ExtractionStage(logger, 1, 60, native_extraction=True, policies={"mails": policy})
+    attachment = create_attachment("notes.txt", "text/plain", "é".encode("utf-8") * 1000)
+    contents = []
+
+    def extract_content(content, attachment, policy):
+        contents.append(content)
+        return ExtractionStage.extract_content(stage, content, attachment, policy)
+
+    # Execute
+    with patch.object(stage, "extract_content", extract_content):
+        body = stage.submit_attachment(attachment, "mails").result()
+
+    # Assert
+    assert body == "é" * 1000
+    assert not attachment.content_property.called
+    assert isinstance(contents[0], mmap.mmap) and contents[0].closed
+
+
+def test_spooled_attachments_are_bounded_by_the_pool():
+    """Test method to check that the attachments are spooled by the pool of threads, so that the number of
+    open spools does not grow with the number of attachments waiting for their extraction"""
+    # Setup
+    policy = ExtractionPolicy(logger, {}, 60, spool_threshold=4)
+    stage = ExtractionStage(logger, 2, 60, native_extraction=True, policies={"mails": policy})
+    attachments = [create_attachment(f"notes{index}.txt", "text/plain", b"notes" * 10) for index in range(6)]
+    open_spools = [0, 0]
+    lock = threading.Lock()
+
+    def spool(stream):
+        with lock:
+            open_spools[0] += 1
+            open_spools[1] = max(open_spools)
+        return ExtractionPolicy.spool(policy, stream)
+
+    def close_content(content):
+        with lock:
+            open_spools[0] -= 1
+        content.close()
+
+    # Execute
+    with patch.object(policy, "spool", spool), patch.object(stage, "close_content", close_content):
+        bodies = [stage.submit_attachment(attachment, "mails") for attachment in attachments]
+        bodies = [body.result(timeout=5) for body in bodies]
+
+    # Assert
+    assert bodies == ["notes" * 10] * 6
+    assert open_spools[0] == 0 and open_spools[1] <= 2
+
+
+def test_truncated_text_drops_the_cut_character():
+    """Test method to check that a text truncated in the middle of a UTF-8 character is still decoded as UTF-8,
+    whether it is read in memory or spooled to a memory-mapped file"""
+    # Setup
+    content = ("a" + "é" * 1024 * 1024).encode("utf-8")
+    expected_text = "a" + "é" * (512 * 1024 - 1)
+    bodies = []
+
+    # Execute
+    for spool_threshold in (None, 16):
+        policy = ExtractionPolicy(logger, {"max_size": 1}, 60, spool_threshold=spool_threshold)
+        stage = ExtractionStage(logger, 1, 60, native_extraction=True, policies={"mails": policy})
+        attachment = create_attachment("notes.txt", "text/plain", content)
+        bodies.append(stage.submit_attachment(attachment, "mails").result())
+
+    # Assert
+    assert bodies == [expected_text, expected_text]
@@ -0,0 +1,88 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import logging
+from unittest.mock import Mock, patch
+
+import pytest
+from support import create_docx, create_ooxml, create_pptx, create_xlsx
+
+from ees_microsoft_outlook.extraction import ExtractionStage
+from ees_microsoft_outlook.extractors import get_native_extractor
+
+logger = logging.getLogger("unit_test_extractors")
+
+EML = b"""From: abc@xyz.com
+To: pqr@xyz.com
+Subject: Quarterly report
+Content-Type: text/html; charset=utf-8
+
+<html><body><p>Revenue grew</p></body></html>
+"""
+
+
+@pytest.mark.parametrize(
+    "content_type, name, content, expected_text",
+    [
+        ("text/plain; charset=utf-8", "notes.txt", "café".encode("utf-8"), "café"),
+        ("text/plain", "cut.txt", "café déjà".encode("utf-8")[:-1], "café déj\ufffd"),
+        ("text/plain", "bad.txt", "café".encode("utf-8") + b" \xff " + "déjà vu".encode("utf-8"), "café \ufffd déjà vu"),
+        ("text/plain", "legacy.txt", "café déjà vu".encode("cp1252"), "café déjà vu"),
+        ("application/octet-stream", "page.htm", b"<p>Hello <b>world</b></p>", "Hello world"),
+        ("text/csv", "users.csv", b'id,name\n1,"Doe, John"\n', "id name\n1 Doe, John"),
+        ("application/json", "data.json", b'{"a": "x", "b": [1, {"c": null}]}', "x\n1"),
+        ("message/rfc822", "mail.eml", EML, "From: abc@xyz.com\nTo: pqr@xyz.com\nSubject: Quarterly report\nRevenue grew"),
+        ("", "report.docx", create_docx(["First", "Second"]), "First\nSecond"),
+        ("", "sheet.xlsx", create_xlsx(["Name", "Total"], [42]), "Name\nTotal\n42"),
+        ("", "deck.pptx", create_pptx(["Title", "Agenda"]), "Title\nAgenda"),
+    ],
+)
+def test_native_extractors(content_type, name, content, expected_text):
+    """Test method to check the text extracted in process for each format"""
+    # Execute
+    text = get_native_extractor(content_type, name)(content)
+
+    # Assert
+    assert text.strip() == expected_text
+
+
+@patch("ees_microsoft_outlook.extraction.extract", Mock(return_value="tika text"))
+def test_other_and_broken_attachments_are_extracted_by_tika():
+    """Test method to check that the formats without native extractor and the broken attachments fall back to Tika"""
+    # Setup
+    stage = ExtractionStage(logger, 1, 60, native_extraction=True)
+    pdf = Mock(content_type="application/pdf")
+    pdf.name = "report.pdf"
+    broken_docx = Mock(content_type="application/octet-stream")
+    broken_docx.name = "report.docx"
+    text = Mock(content_type="text/plain")
+    text.name = "notes.txt"
+
+    # Execute and assert
+    assert stage.extract(b"%PDF-1.4", pdf) == "tika text"
+    assert stage.extract(b"not a zip file", broken_docx) == "tika text"
+    assert stage.extract(b"plain text", text) == "plain text"
+
+
+def test_entities_of_the_xml_parts_are_not_resolved(tmp_path):
+    """Test method to check that an external entity declared by an XML part of an attachment is not read"""
+    # Setup
+    secret = tmp_path / "secret.txt"
+    secret.write_text("secret text")
+    content = create_ooxml(
+        {
+            "word/document.xml": f'<!DOCTYPE d [<!ENTITY secret SYSTEM "{secret.as_uri()}">]>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            "<w:body><w:p><w:r><w:t>Visible &secret;</w:t></w:r></w:p></w:body></w:document>"
+        }
+    )
+
+    # Execute
+    text = get_native_extractor("", "report.docx")(content)
+
+    # Assert
+    assert "Visible" in text
+    assert "secret text" not in text
@@ -0,0 +1,55 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import pytest
+
+from ees_microsoft_outlook.utils import html_to_text
+
+OUTLOOK_REPLY = """<html><head><style>p { color: red; }</style></head><body>
+<div>Sounds good,<br>see you then</div>
+<hr><div id="divRplyFwdMsg"><b>From:</b> abc@xyz.com</div>
+<div>Shall we meet on Monday?</div>
+<script>track();</script>
+</body></html>"""
+
+# A reply whose Outlook separator is nested in the blocks of the body, followed by the rest of the thread
+NESTED_OUTLOOK_REPLY = """<html><body><div class="WordSection1"><p>Approved.</p>
+<div><div style="border:none"><p id="divRplyFwdMsg"><b>From:</b> abc@xyz.com</p></div>
+<p>Please approve the budget.</p></div>tail of the section</div>
+<div>Previous message</div>trailing text
+</body></html>"""
+
+GMAIL_REPLY = """<div dir="ltr">Thanks &amp; regards</div><br>
+<div class="gmail_quote"><div class="gmail_attr">On Mon, abc wrote:</div>
+<blockquote class="gmail_quote">Here is the <b>report</b></blockquote></div>"""
+
+
+@pytest.mark.parametrize("engine", ["html_parser", "lxml"])
+def test_html_to_text_drops_style_and_script(engine):
+    """Test method to check that the style and script elements are dropped and the blocks kept on their own line"""
+    # Execute
+    text = html_to_text(OUTLOOK_REPLY, engine)
+
+    # Assert
+    assert text == "Sounds good,\nsee you then\nFrom: abc@xyz.com\nShall we meet on Monday?"
+
+
+@pytest.mark.parametrize("engine", ["html_parser", "lxml"])
+def test_html_to_text_strips_quoted_replies(engine):
+    """Test method to check that the quoted reply chains of Outlook and Gmail are dropped when configured"""
+    # Execute and assert
+    assert html_to_text(OUTLOOK_REPLY, engine, True) == "Sounds good,\nsee you then"
+    assert html_to_text(GMAIL_REPLY, engine, True) == "Thanks & regards"
+    assert html_to_text(GMAIL_REPLY, engine) == "Thanks & regards\nOn Mon, abc wrote:\nHere is the report"
+
+
+def test_engines_strip_the_same_text_after_a_nested_separator():
+    """Test method to check that both engines drop everything after a separator nested in the body"""
+    # Execute
+    texts = {engine: html_to_text(NESTED_OUTLOOK_REPLY, engine, True) for engine in ("html_parser", "lxml")}
+
+    # Assert
+    assert texts == {"html_parser": "Approved.", "lxml": "Approved."}
@@ -9,7 +9,7 @@ import os
 from unittest.mock import Mock
 
 from ees_microsoft_outlook.configuration import Configuration
-from ees_microsoft_outlook.microsoft_outlook_mails import MicrosoftOutlookMails
+from ees_microsoft_outlook.microsoft_outlook_mails import MAIL_TYPES, MicrosoftOutlookMails
 from exchangelib.ewsdatetime import EWSDateTime, EWSTimeZone
 
 
@@ -31,8 +31,8 @@ def create_mail_obj():
     return MicrosoftOutlookMails(logger, config)
 
 
-def test_get_mails():
-    """Test method to get mail documents from Microsoft Outlook"""
+def test_get_folder_mails():
+    """Test method to get mail documents of a folder from Microsoft Outlook"""
     # Setup
     inbox_response = [
         {
@@ -55,15 +55,14 @@ def test_get_mails():
         }
     ]
     account = Mock()
-    accounts = [account]
     microsoft_outlook_mails_obj = create_mail_obj()
     microsoft_outlook_mails_obj.get_mail_documents = Mock(return_value=inbox_response)
     start_date = "2022-04-21T12:10:00Z"
     end_date = "2022-04-21T12:13:00Z"
 
     # Execute
-    source_mails = microsoft_outlook_mails_obj.get_mails(
-        [], accounts, start_date, end_date
+    source_mails = microsoft_outlook_mails_obj.get_folder_mails(
+        [], account, MAIL_TYPES[0], start_date, end_date
     )
 
     # Assert
@@ -108,12 +107,12 @@ def test_get_mail_documents():
     ]
     account = Mock()
     microsoft_outlook_mails_obj = create_mail_obj()
-    microsoft_outlook_mails_obj.time_zone = EWSTimeZone("Asia/Calcutta")
     microsoft_outlook_mails_obj.mails_to_docs = Mock(
         return_value=(mail_response, attachments_response)
     )
     mail_obj = [Mock()]
     account.primary_smtp_address = "abc@xyz.com"
+    account.default_timezone = EWSTimeZone("Asia/Calcutta")
 
     # Execute
     source_mails_documents = microsoft_outlook_mails_obj.get_mail_documents(
@@ -127,3 +126,5 @@ def test_get_mail_documents():
 
     # Assert
     assert expected_mails_documents == source_mails_documents
+
+    assert microsoft_outlook_mails_obj.mails_to_docs.call_args[0][4] == EWSTimeZone("Asia/Calcutta")
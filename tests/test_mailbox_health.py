@@ -0,0 +1,85 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import logging
+from unittest.mock import Mock, PropertyMock
+
+import pytest
+import requests
+from ees_microsoft_outlook.mailbox_health import MailboxHealth, create_accounts
+from exchangelib.errors import ErrorNonExistentMailbox
+
+logger = logging.getLogger("unit_test_mailbox_health")
+
+
+def create_account(email):
+    """Creates a mock account whose root folder can not be fetched for broken mailboxes"""
+    account = Mock()
+    account.primary_smtp_address = email
+    if email.startswith("broken"):
+        type(account).root = PropertyMock(side_effect=ErrorNonExistentMailbox("The SMTP address has no mailbox"))
+    return account
+
+
+def test_create_accounts_skips_broken_mailboxes(tmp_path):
+    """Test method to check that a mailbox failing the probe is skipped in the next runs"""
+    # Setup
+    mailbox_health_path = str(tmp_path / "mailbox_health.json")
+    emails = ["abc@xyz.com", "broken@xyz.com", "pqr@xyz.com"]
+    create = Mock(side_effect=create_account)
+
+    # Execute
+    first_run_accounts = create_accounts(
+        emails, create, 2, MailboxHealth(logger, mailbox_health_path)
+    )
+    second_run_accounts = create_accounts(
+        emails, create, 2, MailboxHealth(logger, mailbox_health_path)
+    )
+
+    # Assert
+    assert [account.primary_smtp_address for account in first_run_accounts] == [
+        "abc@xyz.com",
+        "pqr@xyz.com",
+    ]
+    assert [account.primary_smtp_address for account in second_run_accounts] == [
+        "abc@xyz.com",
+        "pqr@xyz.com",
+    ]
+    assert create.call_count == 5
+
+
+def test_mailbox_is_probed_again_after_backoff(tmp_path):
+    """Test method to check that a mailbox is probed again once its back-off expired"""
+    # Setup
+    mailbox_health = MailboxHealth(logger, str(tmp_path / "mailbox_health.json"))
+    mailbox_health.probe("broken@xyz.com", create_account)
+
+    # Execute
+    skipped = mailbox_health.is_skipped("broken@xyz.com")
+    account = mailbox_health.probe("broken@xyz.com", lambda email: Mock())
+
+    # Assert
+    assert skipped
+    assert account
+    assert not mailbox_health.is_skipped("broken@xyz.com")
+
+
+def test_transient_probe_error_is_raised_and_not_cached(tmp_path):
+    """Test method to check that a mailbox failing the probe with a transient error is not skipped"""
+    # Setup
+    mailbox_health_path = str(tmp_path / "mailbox_health.json")
+    mailbox_health = MailboxHealth(logger, mailbox_health_path)
+    account = Mock()
+    type(account).root = PropertyMock(side_effect=requests.exceptions.ConnectionError("Connection reset"))
+
+    # Execute
+    with pytest.raises(requests.exceptions.ConnectionError):
+        mailbox_health.probe("abc@xyz.com", lambda email: account)
+    mailbox_health.save()
+
+    # Assert
+    assert not MailboxHealth(logger, mailbox_health_path).is_skipped("abc@xyz.com")
+    assert not mailbox_health.get_skipped_mailboxes()
@@ -0,0 +1,202 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import logging
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import requests
+from ees_microsoft_outlook.base_command import BaseCommand
+from ees_microsoft_outlook.mailbox_health import MailboxHealth
+from ees_microsoft_outlook.retry_queue import (DelayedRetryQueue, RetryStore,
+                                               WorkUnit)
+from tests.support import get_args
+
+logger = logging.getLogger("unit_test_retry_queue")
+
+
+def test_failed_unit_does_not_block_other_units():
+    """Test method to check that a failed unit is retried after the units which are due"""
+    # Setup
+    processed = []
+
+    def func(name):
+        processed.append(name)
+        if name == "first" and processed.count("first") == 1:
+            raise requests.exceptions.ConnectionError("Connection reset")
+        return [name]
+
+    retry_queue = DelayedRetryQueue(
+        logger, 3, (requests.exceptions.RequestException,)
+    )
+    retry_queue.put(WorkUnit({"name": "first"}, func, ("first",)))
+    retry_queue.put(WorkUnit({"name": "second"}, func, ("second",)))
+
+    # Execute
+    results = []
+    with patch("ees_microsoft_outlook.retry_queue.get_backoff_delay", Mock(return_value=0.01)):
+        unit = retry_queue.get()
+        while unit:
+            results.append(retry_queue.process(unit))
+            unit = retry_queue.get()
+
+    # Assert
+    assert processed == ["first", "second", "first"]
+    assert results == [None, ["second"], ["first"]]
+    assert retry_queue.retried_units == 1
+    assert retry_queue.failed_units == 0
+
+
+def test_unit_is_given_up_after_retry_count(tmp_path):
+    """Test method to check that a unit failing on every attempt is recorded in the retry store"""
+    # Setup
+    retry_store = RetryStore(logger, str(tmp_path / "retry_units.json"))
+    key = {"object_type": "tasks", "account": "abc@xyz.com"}
+    func = Mock(side_effect=requests.exceptions.ConnectionError("Connection reset"))
+    retry_queue = DelayedRetryQueue(
+        logger,
+        2,
+        (requests.exceptions.RequestException,),
+        lambda unit: retry_store.record_failure("fetch", "tasks", unit.key),
+    )
+    retry_queue.put(WorkUnit(key, func, ()))
+
+    # Execute
+    with patch("ees_microsoft_outlook.retry_queue.get_backoff_delay", Mock(return_value=0)):
+        unit = retry_queue.get()
+        while unit:
+            retry_queue.process(unit)
+            unit = retry_queue.get()
+    retry_store.save()
+
+    # Assert
+    assert func.call_count == 2
+    assert retry_queue.failed_units == 1
+    assert RetryStore(logger, str(tmp_path / "retry_units.json")).pop_failures(
+        "fetch", "tasks"
+    ) == [key]
+
+
+@patch("ees_microsoft_outlook.retry_queue.get_backoff_delay", Mock(return_value=0))
+def test_create_retryable_jobs_retries_only_failed_folder():
+    """Test method to check that a transient error only refetches the failed folder of a mailbox"""
+    # Setup
+    command = BaseCommand(get_args("FullSyncCommand"))
+    account = Mock()
+    account.primary_smtp_address = "abc@xyz.com"
+    attempts = []
+
+    def get_folder_mails(ids_list, account, mail_type, start_time, end_time):
+        attempts.append(mail_type["folder"])
+        if attempts == ["inbox"]:
+            raise requests.exceptions.ConnectionError("Connection reset")
+        return [{"id": mail_type["folder"]}]
+
+    folders = command.get_work_unit_folders("mails", 1, [account])
+    keys = command.get_work_unit_keys(
+        "mails", [account], [("2022-04-21T12:10:00Z", "2022-04-21T12:13:00Z")], folders
+    )
+
+    # Execute
+    documents = command.create_retryable_jobs(
+        1, command.create_work_units(keys, get_folder_mails, ([],), [account], folders)
+    )
+
+    # Assert
+    assert sorted(attempts) == ["archive", "inbox", "inbox", "junk", "sent"]
+    assert sorted(document["id"] for document in documents) == [
+        "archive",
+        "inbox",
+        "junk",
+        "sent",
+    ]
+
+
+def test_create_retryable_jobs_bounds_folders_per_mailbox():
+    """Test method to check that the folders of a mailbox are fetched in parallel within the per-mailbox limit"""
+    # Setup
+    command = BaseCommand(get_args("FullSyncCommand"))
+    account = Mock()
+    account.primary_smtp_address = "abc@xyz.com"
+    lock = threading.Lock()
+    running = []
+    max_running = []
+
+    def get_folder_mails(ids_list, account, mail_type, start_time, end_time):
+        with lock:
+            running.append(mail_type["folder"])
+            max_running.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(mail_type["folder"])
+        return [{"id": f"{mail_type['folder']}-{start_time}"}]
+
+    folders = command.get_work_unit_folders("mails", 4, [account])
+    keys = command.get_work_unit_keys(
+        "mails",
+        [account],
+        [
+            ("2022-04-21T12:10:00Z", "2022-04-21T12:13:00Z"),
+            ("2022-04-21T12:13:00Z", "2022-04-21T12:16:00Z"),
+        ],
+        folders,
+    )
+
+    # Execute
+    documents = command.create_retryable_jobs(
+        4, command.create_work_units(keys, get_folder_mails, ([],), [account], folders)
+    )
+
+    # Assert
+    assert len(documents) == 8
+    assert max(max_running) == command.config.get_value("per_mailbox_concurrency")
+
+
+def test_units_of_skipped_mailbox_are_fetched_once_it_passes_the_probe(tmp_path):
+    """Test method to check that the time ranges of a mailbox skipped by the mailbox health are fetched in the
+    run in which the mailbox passes the probe again, although the checkpoint moved past them"""
+    # Setup
+    account = Mock()
+    account.primary_smtp_address = "abc@xyz.com"
+    fetched = []
+
+    def get_folder_mails(ids_list, account, mail_type, start_time, end_time):
+        fetched.append((mail_type["folder"], start_time, end_time))
+        return []
+
+    def run(time_range_list, skipped):
+        command = BaseCommand(get_args("FullSyncCommand"))
+        command.retry_store = RetryStore(logger, str(tmp_path / "retry_store.json"))
+        command.mailbox_health = Mock(spec=MailboxHealth)
+        command.mailbox_health.get_skipped_mailboxes.return_value = {"abc@xyz.com"} if skipped else set()
+        users_accounts = [] if skipped else [account]
+        folders = command.get_work_unit_folders("mails", 1, users_accounts)
+        keys = command.get_work_unit_keys("mails", users_accounts, time_range_list, folders)
+        keys.extend(command.retry_store.pop_failures("fetch", "mails"))
+        command.create_retryable_jobs(
+            1, command.create_work_units(keys, get_folder_mails, ([],), users_accounts, folders)
+        )
+        command.retry_store.save()
+
+    # Execute
+    run(
+        [("2022-04-21T12:00:00Z", "2022-04-21T12:05:00Z"), ("2022-04-21T12:05:00Z", "2022-04-21T12:10:00Z")],
+        True,
+    )
+    run([("2022-04-21T12:10:00Z", "2022-04-21T12:20:00Z")], True)
+    run([("2022-04-21T12:20:00Z", "2022-04-21T12:30:00Z")], False)
+
+    # Assert
+    assert sorted(fetched) == sorted(
+        (folder, start_time, end_time)
+        for folder in ("inbox", "sent", "junk", "archive")
+        for start_time, end_time in (
+            ("2022-04-21T12:00:00Z", "2022-04-21T12:20:00Z"),
+            ("2022-04-21T12:20:00Z", "2022-04-21T12:30:00Z"),
+        )
+    )
+    assert not RetryStore(logger, str(tmp_path / "retry_store.json")).pop_failures("fetch", "mails")
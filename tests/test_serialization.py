@@ -0,0 +1,71 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import datetime
+import json
+from unittest.mock import patch
+
+import pytest
+from ees_microsoft_outlook import serialization
+from ees_microsoft_outlook.document_record import DocumentRecord
+
+DOCUMENT = {
+    "_allow_permissions": ["user@xyz.com"],
+    "type": "Inbox Mails",
+    "id": "AAMkAGQ2ZTc0",
+    "title": "Café ☕",
+    "body": 'Body: "quoted"\n\ttabbed \U0001F600',
+    "created_at": datetime.datetime(2022, 4, 21, 12, 12, 30, tzinfo=datetime.timezone.utc),
+}
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_encode_document(use_orjson):
+    """Test method to check that a document is encoded to the same compact UTF-8 JSON with or without orjson"""
+    # Setup
+    orjson = serialization.orjson if use_orjson else None
+    if use_orjson and not orjson:
+        pytest.skip("orjson is not installed")
+    expected = json.dumps(DOCUMENT, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+    # Execute
+    with patch.object(serialization, "orjson", orjson):
+        encoded_dict = serialization.encode_document(DOCUMENT)
+        encoded_record = serialization.encode_document(DocumentRecord.from_dict(DOCUMENT))
+        encoded_surrogate = serialization.encode_document({"id": "1", "body": "\ud800"})
+
+    # Assert
+    assert encoded_dict == encoded_record == expected
+    assert encoded_surrogate == b'{"id":"1","body":"\xed\xa0\x80"}'
+
+
+def test_join_encoded_documents():
+    """Test method to check that the encoded documents are joined into the JSON array of the request body"""
+    # Setup
+    documents = [{"id": "1"}, {"id": "2", "body": "é"}]
+
+    # Execute
+    body = serialization.join_encoded_documents([serialization.encode_document(document) for document in documents])
+
+    # Assert
+    assert json.loads(body) == documents
+    assert serialization.join_encoded_documents([]) == b"[]"
+
+
+def test_estimate_document_size():
+    """Test method to check that a record is estimated from its fields, like the dictionary of the document"""
+    # Setup
+    record = DocumentRecord.from_dict(DOCUMENT)
+
+    # Execute
+    with patch.object(DocumentRecord, "to_dict", side_effect=AssertionError("The record is converted")):
+        record_size = serialization.estimate_document_size(record)
+    dict_size = serialization.estimate_document_size(DOCUMENT)
+
+    # Assert
+    text_fields = ("user@xyz.com", "Inbox Mails", "AAMkAGQ2ZTc0", DOCUMENT["title"], DOCUMENT["body"])
+    assert record_size == dict_size == sum(len(text) for text in text_fields)
+    assert serialization.estimate_document_size("AAMkAGQ2ZTc0") == 12
@@ -4,10 +4,12 @@
 # you may not use this file except in compliance with the Elastic License 2.0.
 #
 
+import json
 import logging
 import os
 import sys
-from unittest.mock import Mock
+import threading
+from unittest.mock import Mock, patch
 
 import pytest
 
@@ -17,6 +19,7 @@ from ees_microsoft_outlook.configuration import Configuration  # noqa
 from ees_microsoft_outlook.connector_queue import ConnectorQueue  # noqa
 from ees_microsoft_outlook.sync_enterprise_search import SyncEnterpriseSearch  # noqa
 from elastic_enterprise_search import WorkplaceSearch  # noqa
+from elastic_transport.exceptions import BadGatewayError, ConnectionTimeout  # noqa
 
 
 def settings():
@@ -107,3 +110,189 @@ def test_get_records_by_types():
 
     # Assert
     assert {"text": [0]} == target_response
+
+
+def test_perform_sync_batches_across_checkpoints():
+    """Test method to check that a checkpoint does not close the batch being assembled, that it is released
+    once the documents of its object type received before it are indexed, and that the documents of each object
+    type are batched apart"""
+    # Setup
+    configs, logger = settings()
+    queue = ConnectorQueue(logger)
+    client = Mock()
+    indexer_obj = SyncEnterpriseSearch(configs, logger, client, queue)
+    # Documents of each request and number of the checkpoints released when it is sent
+    requests = []
+    client.index_documents = Mock(
+        side_effect=lambda body, timeout: requests.append((json.loads(body), len(indexer_obj.checkpoint_list)))
+    )
+    queue.append_to_queue("mails", [{"id": str(index), "type": "Inbox Mails"} for index in range(2)])
+    queue.append_to_queue("calendar", [{"id": "3", "type": "Calendar"}])
+    queue.put_checkpoint("mails", "2022-04-21T12:12:30Z", "full")
+    queue.append_to_queue("mails", [{"id": "2", "type": "Inbox Mails"}])
+    queue.put_checkpoint("calendar", "2022-04-21T12:12:30Z", "full")
+    queue.end_signal()
+
+    # Execute
+    indexer_obj.perform_sync()
+
+    # Assert
+    assert [([document["id"] for document in documents], count) for documents, count in requests] == [
+        (["0", "1", "2"], 0),
+        (["3"], 1),
+    ]
+    assert [checkpoint["object_type"] for checkpoint in indexer_obj.checkpoint_list] == ["mails", "calendar"]
+
+
+@patch("ees_microsoft_outlook.retry_queue.get_backoff_delay", Mock(return_value=0))
+def test_retried_batch_sends_the_same_body():
+    """Test method to check that a batch is sent as the JSON bytes of its documents, and that a retry sends the
+    same buffer again"""
+    # Setup
+    indexer_obj = create_enterprise_search_obj()
+    documents = [{"id": "0", "type": "Inbox Mails", "body": "caf\u00e9"}, {"id": "1", "type": "Inbox Mails"}]
+    response = {"results": [{"id": "0", "errors": []}, {"id": "1", "errors": []}]}
+    indexer_obj.workplace_search_custom_client.index_documents = Mock(
+        side_effect=[BadGatewayError(502, "Bad Gateway"), response]
+    )
+
+    # Execute
+    indexer_obj.index_batch(documents)
+    indexer_obj.process_retry_queue(block=True)
+
+    # Assert
+    calls = indexer_obj.workplace_search_custom_client.index_documents.call_args_list
+    assert len(calls) == 2
+    assert calls[0].args[0] is calls[1].args[0]
+    assert json.loads(calls[0].args[0]) == documents
+
+
+def test_overloaded_requests_shrink_the_batches_of_their_object_type():
+    """Test method to check that a request failing with a gateway error halves the next batches of its object
+    type only, and that the current sizes are exposed as metrics"""
+    # Setup
+    indexer_obj = create_enterprise_search_obj()
+    indexer_obj.workplace_search_custom_client.index_documents = Mock(side_effect=BadGatewayError(502, "Bad Gateway"))
+    batchers = {}
+
+    # Execute
+    with pytest.raises(BadGatewayError):
+        indexer_obj.index_documents([{"id": "0", "type": "Inbox Mails"}], object_type="mails")
+    mails_batcher = indexer_obj.get_batcher(batchers, "mails")
+    tasks_batcher = indexer_obj.get_batcher(batchers, "tasks")
+    metrics = indexer_obj.get_batch_size_metrics()
+
+    # Assert
+    assert (mails_batcher.max_documents, mails_batcher.max_bytes) == (50, 5000000)
+    assert mails_batcher.max_document_bytes == 10000000
+    assert (tasks_batcher.max_documents, tasks_batcher.max_bytes) == (100, 10000000)
+    assert metrics["mails"]["max_documents"] == 50
+    assert metrics["mails"]["error_rate"] == 1
+
+
+@patch("ees_microsoft_outlook.retry_queue.get_backoff_delay", Mock(return_value=0))
+def test_timed_out_batch_is_retried_and_shrinks_the_next_batches():
+    """Test method to check that a batch whose request timed out is retried instead of being dropped, and that
+    the next batches of its object type are halved"""
+    # Setup
+    indexer_obj = create_enterprise_search_obj()
+    documents = [{"id": "0", "type": "Inbox Mails"}]
+    indexer_obj.workplace_search_custom_client.index_documents = Mock(
+        side_effect=[ConnectionTimeout("Connection timed out"), {"results": [{"id": "0", "errors": []}]}]
+    )
+
+    # Execute
+    indexer_obj.index_batch(documents, object_type="mails")
+    indexer_obj.process_retry_queue(block=True)
+
+    # Assert
+    assert indexer_obj.workplace_search_custom_client.index_documents.call_count == 2
+    assert indexer_obj.retry_queue.failed_units == 0
+    assert indexer_obj.get_batch_size("mails").max_documents == 50
+
+
+@patch("ees_microsoft_outlook.retry_queue.get_backoff_delay", Mock(return_value=0.05))
+def test_checkpoint_waits_for_the_retried_batches_of_its_object_type():
+    """Test method to check that a checkpoint is saved only once the batches before it are indexed or recorded
+    for the next run, and dropped if a batch could neither be indexed nor recorded"""
+    # Setup
+    configs, logger = settings()
+    configs._Configuration__configurations["retry_count"] = 2
+    indexer_obj = SyncEnterpriseSearch(configs, logger, Mock(), ConnectorQueue(logger))
+    indexer_obj.workplace_search_custom_client.index_documents = Mock(
+        side_effect=[BadGatewayError(502, "Bad Gateway"), {"results": []}] + [BadGatewayError(502, "Bad Gateway")] * 2
+    )
+    batcher = indexer_obj.get_batcher({}, "mails")
+    contacts_batcher = indexer_obj.get_batcher({}, "contacts")
+
+    # Execute
+    batcher.add({"id": "0", "type": "Inbox Mails"})
+    batcher.add_checkpoint({"object_type": "mails"})
+    indexer_obj.index_closed_batch(batcher.flush(), "mails")
+    released_during_back_off = list(indexer_obj.checkpoint_list)
+    indexer_obj.process_retry_queue(block=True)
+    released_once_indexed = list(indexer_obj.checkpoint_list)
+    contacts_batcher.add({"id": "1", "type": "Contacts"})
+    contacts_batcher.add_checkpoint({"object_type": "contacts"})
+    indexer_obj.index_closed_batch(contacts_batcher.flush(), "contacts")
+    indexer_obj.process_retry_queue(block=True)
+
+    # Assert
+    assert released_during_back_off == []
+    assert released_once_indexed == [{"object_type": "mails"}]
+    assert indexer_obj.retry_queue.failed_units == 1
+    assert indexer_obj.checkpoint_list == [{"object_type": "mails"}]
+
+
+def test_checkpoint_waits_for_the_batch_open_on_another_consumer_thread():
+    """Test method to check that a checkpoint dequeued by a consumer thread is not saved while the documents of its
+    object type dequeued before it are still in a batch assembled by another consumer thread"""
+    # Setup
+    configs, logger = settings()
+    client = Mock()
+    indexer_obj = SyncEnterpriseSearch(configs, logger, client, Mock())
+    checkpoint = {"current_time": "2022-04-21T12:12:30Z", "index_type": "full", "object_type": "mails"}
+    items = {
+        "first": [{"type": "mails", "data": [{"id": "0", "type": "Inbox Mails"}]}, {"type": "signal_close"}],
+        "second": [
+            {"type": "checkpoint", "data": ["mails", "2022-04-21T12:12:30Z", "full"]},
+            {"type": "signal_close"},
+        ],
+    }
+    documents_dequeued = threading.Event()
+    checkpoint_handled = threading.Event()
+
+    def get():
+        thread_name = threading.current_thread().name
+        if thread_name == "second" and len(items["second"]) == 1:
+            checkpoint_handled.set()
+        item = items[thread_name].pop(0)
+        if thread_name == "first":
+            documents_dequeued.set()
+        return item
+
+    def truncate_documents(documents):
+        # Logic to hold the documents of the first consumer until the second one handled the checkpoint
+        checkpoint_handled.wait(timeout=5)
+        return documents
+
+    indexer_obj.queue.get = get
+    indexer_obj.truncate_documents = truncate_documents
+    # Number of the checkpoints released when each request is sent
+    released_checkpoints = []
+    client.index_documents = Mock(
+        side_effect=lambda body, timeout: released_checkpoints.append(len(indexer_obj.checkpoint_list))
+    )
+
+    # Execute
+    first_consumer = threading.Thread(target=indexer_obj.perform_sync, name="first")
+    first_consumer.start()
+    documents_dequeued.wait(timeout=5)
+    second_consumer = threading.Thread(target=indexer_obj.perform_sync, name="second")
+    second_consumer.start()
+    second_consumer.join(timeout=5)
+    first_consumer.join(timeout=5)
+
+    # Assert
+    assert released_checkpoints == [0]
+    assert indexer_obj.checkpoint_list == [checkpoint]
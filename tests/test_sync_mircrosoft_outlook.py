@@ -58,3 +58,23 @@ def test_workplace_add_permission(mock_response, caplog):
 
     # Assert
     sync_outlook.workplace_search_custom_client.add_permissions.assert_called_with("dummy_user", ["permission1"])
+
+
+def test_append_to_queue_drops_documents_fetched_by_several_work_units():
+    """Test method to check that a document fetched by the overlapping time ranges of two work units is
+    appended to the queue once"""
+    # Setup
+    sync_outlook = create_object_of_sync_microsoft_outlook()
+    sync_outlook.queue = Mock()
+    first_slice = [{"type": "Calendar", "id": "1"}, {"type": "Calendar", "id": "2"}]
+    second_slice = [{"type": "Calendar", "id": "2"}, {"type": "Calendar Attachments", "id": "2"}]
+
+    # Execute
+    sync_outlook.append_to_queue("calendar", first_slice)
+    sync_outlook.append_to_queue("calendar", second_slice)
+
+    # Assert
+    assert [call.args for call in sync_outlook.queue.append_to_queue.call_args_list] == [
+        ("calendar", first_slice),
+        ("calendar", [{"type": "Calendar Attachments", "id": "2"}]),
+    ]
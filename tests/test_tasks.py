@@ -32,8 +32,8 @@ def create_task_obj():
     return MicrosoftOutlookTasks(logger, config)
 
 
-def test_get_tasks():
-    """Test method to get tasks from Microsoft Outlook"""
+def test_get_account_tasks():
+    """Test method to get the tasks of an account from Microsoft Outlook"""
     task_response = {
         "_allow_permissions": [],
         "type": "Tasks",
@@ -75,7 +75,6 @@ Complete Date: None\n Body: demo task for test\r\n\n Companies: None\n Categorie
     account = Mock()
     account.tasks = MagicMock()
     account.primary_smtp_address = "abc@xyz.com"
-    account_list = [account]
     ms_outlook_task_obj = create_task_obj()
     ms_outlook_task_obj.tasks_to_docs = Mock(
         return_value=(task_response, task_attachments_response)
@@ -83,7 +82,7 @@ Complete Date: None\n Body: demo task for test\r\n\n Companies: None\n Categorie
     start_date = "2022-04-21T12:10:00Z"
     end_date = "2022-04-21T12:13:00Z"
     account.tasks.all().filter().only = Mock(return_value=[Mock()])
-    source_tasks = ms_outlook_task_obj.get_tasks([], account_list, start_date, end_date)
+    source_tasks = ms_outlook_task_obj.get_account_tasks([], account, start_date, end_date)
     assert expected_tasks == source_tasks
 
 
@@ -126,7 +125,6 @@ def test_tasks_to_docs():
         }
     ]
     ms_outlook_task_obj = create_task_obj()
-    ms_outlook_task_obj.time_zone = EWSTimeZone("Asia/Calcutta")
     tasks_obj = Task(
         last_modified_time=EWSDate(2022, 4, 11),
         id="123456789",
@@ -147,6 +145,7 @@ def test_tasks_to_docs():
         tasks_obj,
         [],
         "abc@xyz.com",
+        EWSTimeZone("Asia/Calcutta"),
         tasks_obj.start_date,
         EWSDate(2022, 4, 16),
     )
@@ -0,0 +1,106 @@
+#
+# Copyright Elasticsearch B.V. and/or licensed to Elasticsearch B.V. under one
+# or more contributor license agreements. Licensed under the Elastic License 2.0;
+# you may not use this file except in compliance with the Elastic License 2.0.
+#
+
+import logging
+import subprocess
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+import requests_mock
+
+from ees_microsoft_outlook.tika_pool import MAX_CONSECUTIVE_FAILURES, TikaPool
+
+logger = logging.getLogger("unit_test_tika_pool")
+
+TIKA_RESPONSE = '[{"X-TIKA:content": "attachment body"}]'
+
+
+def test_requests_are_balanced_by_requests_in_flight():
+    """Test method to check that a request is sent to the server with the fewest requests in flight"""
+    # Setup
+    with requests_mock.Mocker() as mocker:
+        mocker.put("http://tika-1:9998/rmeta/text", text=TIKA_RESPONSE)
+        mocker.put("http://tika-2:9998/rmeta/text", text=TIKA_RESPONSE)
+        pool = TikaPool(logger, ["http://tika-1:9998", "http://tika-2:9998"], 0, 9998, 5)
+        busy_server = pool.acquire()
+
+        # Execute
+        text = pool.extract(b"attachment content", 60)
+
+        # Assert
+        assert text == "attachment body"
+        assert mocker.request_history[-1].url.startswith(
+            "http://tika-2:9998" if busy_server.endpoint == "http://tika-1:9998" else "http://tika-1:9998"
+        )
+        pool.close()
+
+
+def test_failing_server_is_ejected():
+    """Test method to check that a server failing several requests in a row is ejected from the pool"""
+    # Setup
+    with requests_mock.Mocker() as mocker:
+        mocker.put(
+            "http://tika-1:9998/rmeta/text",
+            [{"text": TIKA_RESPONSE}] + [{"exc": requests.exceptions.ConnectTimeout}] * MAX_CONSECUTIVE_FAILURES,
+        )
+        pool = TikaPool(logger, ["http://tika-1:9998"], 0, 9998, 5)
+
+        # Execute
+        for _ in range(MAX_CONSECUTIVE_FAILURES):
+            with pytest.raises(requests.exceptions.ConnectTimeout):
+                pool.extract(b"attachment content", 60)
+
+        # Assert
+        assert not pool.servers[0].healthy
+        pool.close()
+
+
+@patch("ees_microsoft_outlook.tika_pool.HEALTH_CHECK_INTERVAL", 0.01)
+def test_ejected_servers_are_restarted_in_the_background():
+    """Test method to check that a server slow to restart does not delay bringing the other servers back into
+    the pool, and that it stays out of the pool until it answers the probe"""
+    # Setup
+    with requests_mock.Mocker() as mocker:
+        mocker.put("http://tika-1:9998/rmeta/text", text=TIKA_RESPONSE)
+        mocker.put("http://tika-2:9998/rmeta/text", text=TIKA_RESPONSE)
+        pool = TikaPool(logger, ["http://tika-1:9998", "http://tika-2:9998"], 0, 9998, 5)
+    slow_server, fast_server = pool.servers
+    slow_server_started = threading.Event()
+    pool.probe = Mock(side_effect=lambda server: server is slow_server and slow_server_started.wait())
+
+    # Execute
+    slow_server.healthy = fast_server.healthy = False
+    deadline = time.time() + 5
+    while not fast_server.healthy and time.time() < deadline:
+        time.sleep(0.01)
+
+    # Assert
+    assert fast_server.healthy
+    assert not slow_server.healthy and slow_server.restarting
+    slow_server_started.set()
+    pool.close()
+
+
+def test_close_reaps_the_local_servers():
+    """Test method to check that the local servers are waited for once terminated, and killed if they hang"""
+    # Setup
+    with requests_mock.Mocker() as mocker:
+        mocker.put("http://tika-1:9998/rmeta/text", text=TIKA_RESPONSE)
+        pool = TikaPool(logger, ["http://tika-1:9998"], 0, 9998, 5)
+    process = Mock()
+    process.wait.side_effect = [subprocess.TimeoutExpired("tika", 10), 0]
+    pool.servers[0].process = process
+
+    # Execute
+    pool.close()
+
+    # Assert
+    process.terminate.assert_called_once()
+    process.kill.assert_called_once()
+    assert process.wait.call_count == 2
@@ -202,12 +202,12 @@ def test_split_documents_into_equal_bytes_with_lowest_possible_size():
     ]
     allowed_size = 1
     expected_output = [
-        [{"name": "dummy1", "body": None}],
-        [{"name": "dummy2", "body": None}],
-        [{"name": "dummy3", "body": None}],
-        [{"name": "dummy4", "body": None}],
-        [{"name": "dummy5", "body": None}],
-        [{"name": "dummy6", "body": None}],
+        [{"name": "dummy1", "body": None, "body_truncated": "true"}],
+        [{"name": "dummy2", "body": None, "body_truncated": "true"}],
+        [{"name": "dummy3", "body": None, "body_truncated": "true"}],
+        [{"name": "dummy4", "body": None, "body_truncated": "true"}],
+        [{"name": "dummy5", "body": None, "body_truncated": "true"}],
+        [{"name": "dummy6", "body": None, "body_truncated": "true"}],
     ]
 
     # Execute
@@ -217,3 +217,34 @@ def test_split_documents_into_equal_bytes_with_lowest_possible_size():
 
     # Assert
     assert returned_document == expected_output
+
+
+def test_truncate_document_body_at_character_boundary():
+    """Tests that a body is truncated to its byte budget without splitting a multi-byte character"""
+    # Setup
+    head_document = {"id": "1", "body": "é" * 10}
+    tail_document = {"id": "2", "body": "a" * 10 + "é" * 10}
+    short_document = {"id": "3", "body": "short"}
+
+    # Execute
+    utils.truncate_document_body(head_document, 7)
+    utils.truncate_document_body(tail_document, 17, keep_tail=True)
+    utils.truncate_document_body(short_document, 7)
+
+    # Assert
+    assert head_document == {"id": "1", "body": "ééé", "body_truncated": "true"}
+    assert tail_document == {"id": "2", "body": "aaaaa\n[...]\néé", "body_truncated": "true"}
+    assert short_document == {"id": "3", "body": "short"}
+
+
+def test_split_documents_into_equal_bytes_truncates_large_body():
+    """Tests that the body of a document larger than a request is truncated to fit instead of being dropped"""
+    # Setup
+    document = {"id": "1", "body": "a" * 100}
+
+    # Execute
+    returned_document = utils.split_documents_into_equal_bytes([document], 60)
+
+    # Assert
+    assert returned_document == [[{"id": "1", "body": "a" * 16, "body_truncated": "true"}]]
+    assert utils.get_document_size(returned_document[0][0]) == 60